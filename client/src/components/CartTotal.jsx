@@ -6,7 +6,8 @@ import { ShopContext } from "../context/ShopContext"; // Truy cập dữ liệu
 import { useLocation } from "react-router-dom";
 
 // Truy cập dữ liệu giỏ hàng và các hàm từ ShopContext
-const CartTotal = ({method, setMethod}) => { // Nhận method và setMethod từ component cha để quản lý phương thức thanh toán
+const CartTotal = ({method, setMethod, quote}) => { // Nhận method và setMethod từ component cha để quản lý phương thức thanh toán
+  // quote: kết quả /api/cart/priced (nếu có) → hiển thị đúng số tiền server sẽ tính khi đặt hàng
 
   //Lấy các hàm và giá trị tính toán sẵn từ ShopContext
   // currency: đơn vị tiền tệ hiện tại
@@ -20,11 +21,18 @@ const CartTotal = ({method, setMethod}) => { // Nhận method và setMethod từ
   const location = useLocation();
   const isOrderPage = location.pathname.includes("place-order");
 
+  const subtotal = quote ? quote.subtotal : getCartAmount();
+  const shippingFee = quote ? quote.shippingFee : getShippingFee();
+  const taxRate = quote ? quote.taxRate : getTaxRate();
+  const tax = quote ? quote.tax : subtotal * taxRate;
+  const total = quote ? quote.total : subtotal + shippingFee + tax;
+  const itemCount = quote ? quote.itemCount : getCartCount();
+
   return (
     <div>
       <h3 className="bold-22">
         Tóm tắt đơn hàng{" "} {/* Hiển thị tiêu đề "Tóm tắt đơn hàng" */}
-        <span className="bold-14 text-secondary">({getCartCount()} sản phẩm)</span> {/* Hiển thị số lượng mặt hàng trong giỏ hàng mà 
+        <span className="bold-14 text-secondary">({itemCount} sản phẩm)</span> {/* Hiển thị số lượng mặt hàng trong giỏ hàng mà 
         ng dùng đã thêm */}
       </h3>
       <hr className="border-gray-300 my-5" />
@@ -74,32 +82,37 @@ const CartTotal = ({method, setMethod}) => { // Nhận method và setMethod từ
         <div className="flex justify-between">
           <h5 className="h5">Giá sản phẩm</h5>
           <p className="font-bold">
-            {formatCurrency(getCartAmount())}
+            {formatCurrency(subtotal)}
           </p>
         </div>
         <div className="flex justify-between">
           <h5 className="h5">Phí vận chuyển</h5>
           <p className="font-bold">
-            {getCartAmount() === 0
+            {subtotal === 0
               ? "0₫"
-              : formatCurrency(getShippingFee())}
+              : formatCurrency(shippingFee)}
           </p>
         </div>
         <div className="flex justify-between">
-          <h5 className="h5">Thuế ({(getTaxRate() * 100).toFixed(0)}%)</h5>
+          <h5 className="h5">Thuế ({(taxRate * 100).toFixed(0)}%)</h5>
           <p className="font-bold">
-            {formatCurrency(getCartAmount() * getTaxRate())}
+            {formatCurrency(tax)}
           </p>
         </div>
         <div className="flex justify-between text-lg font-medium mt-3">
           <h4 className="h4">Tổng cộng:</h4>
           <p className="bold-18">
-            {getCartAmount() === 0
+            {subtotal === 0
               ? "0₫"
-              : formatCurrency(getCartAmount() + getShippingFee() + (getCartAmount() * getTaxRate()))}
+              : formatCurrency(total)}
           </p>
         </div>
       </div>
+      {quote && !quote.purchasable && (
+        <p className="text-red-500 text-sm mt-4">
+          Một số sản phẩm trong giỏ đã hết hàng hoặc ngừng bán và không được tính vào tổng tiền
+        </p>
+      )}
     </div>
   );
 };
@@ -5,7 +5,7 @@
 đều có thể dễ dàng truy cập và thay đổi dữ liệu (như sản phẩm, giỏ hàng, người dùng) mà không cần truyền prop qua lại. */
 
 // Import các thư viện và công cụ cần thiết
-import React, { createContext, useEffect, useState } from "react"; //Các công cụ cơ bản để tạo Context, quản lý vòng đời và trạng thái.
+import React, { createContext, useEffect, useRef, useState } from "react"; //Các công cụ cơ bản để tạo Context, quản lý vòng đời và trạng thái.
 import { useNavigate } from "react-router-dom"; // Dùng để điều hướng giữa các trang trong ứng dụng React.
 import toast from "react-hot-toast"; // Thư viện để hiển thị các thông báo nhỏ (notification) ở góc màn hình.
 import axios from "axios"; //Thư viện để thực hiện các yêu cầu HTTP (gọi API) đến máy chủ (backend).
@@ -228,6 +228,7 @@ const ShopContextProvider = ({ children }) => {
   // Xóa phiên đăng nhập của người dùng và giỏ hàng
   const logoutUser = async () => {
     try {
+      await flushCartOperations(); // Gửi nốt các thay đổi giỏ hàng đang chờ trước khi mất token
       const { data } = await axios.post("/api/user/logout"); // Gửi yêu cầu POST đến endpoint /api/user/logout để đăng xuất
       if (data.success) { /*Nếu thành công, hiển thị thông báo đặt state user về null,
         đặt cartItems về rỗng, và chuyển hướng người dùng về trang chủ (/). */
@@ -407,6 +408,11 @@ const ShopContextProvider = ({ children }) => {
     try {
       const { data } = await axios.post("/api/cart/add", { itemId, size });
       if (data.success) {
+        // Đồng bộ số lượng thật trên server (tab khác có thể vừa thêm cùng sản phẩm)
+        setCartItems((prev) => ({
+          ...prev,
+          [itemId]: { ...(prev[itemId] || {}), [size]: data.quantity },
+        }));
         toast.success(data.message || "Đã thêm sản phẩm vào giỏ hàng thành công");
       } else {
         toast.error(data.message || "Không thể thêm sản phẩm");
@@ -419,22 +425,73 @@ const ShopContextProvider = ({ children }) => {
     }
   };
 
+  // Hàng đợi thao tác giỏ hàng chưa gửi lên server (bấm +/- liên tục chỉ gửi 1 request /api/cart/batch)
+  const pendingCartOps = useRef([]);
+  const cartFlushTimer = useRef(null);
+  const cartFlushChain = useRef(Promise.resolve()); // Các batch gửi lần lượt, không chạy song song
+  const cartFlushCount = useRef(0);
+  const CART_FLUSH_DELAY = 400; // ms chờ sau lần bấm cuối cùng
+
+  // Gửi toàn bộ thao tác đang chờ trong 1 request, server gộp và áp dụng atomic
+  // Promise trả về xong khi server đã nhận mọi thay đổi trước đó (dùng trước khi sang trang đặt hàng)
+  const flushCartOperations = () => {
+    clearTimeout(cartFlushTimer.current);
+    cartFlushTimer.current = null;
+    const operations = pendingCartOps.current;
+    pendingCartOps.current = [];
+    if (operations.length === 0) return cartFlushChain.current; // Chỉ chờ batch đang gửi (nếu có)
+    const flushId = ++cartFlushCount.current;
+
+    cartFlushChain.current = cartFlushChain.current.then(async () => {
+      // Chỉ đồng bộ giỏ từ server khi không còn thao tác mới (tránh ghi đè số lượng vừa bấm)
+      const isLatest = () => flushId === cartFlushCount.current && pendingCartOps.current.length === 0;
+
+      try {
+        const { data } = await axios.post("/api/cart/batch", { operations });
+        if (data.success) {
+          if (isLatest()) {
+            setCartItems(data.cartData);
+          }
+          toast.success(data.message);
+        } else {
+          toast.error(data.message);
+          if (isLatest()) await reloadCart();
+        }
+      } catch (err) {
+        toast.error(err.response?.data?.detail || err.message);
+        if (isLatest()) await reloadCart();
+      }
+    });
+    return cartFlushChain.current;
+  };
+
+  // Batch bị từ chối → giỏ local đang hiển thị số lượng server không nhận, lấy lại giỏ từ server
+  const reloadCart = async () => {
+    try {
+      const { data } = await axios.get("/api/cart/get");
+      if (data.success) {
+        setCartItems(data.cartData);
+      }
+    } catch (err) {
+      console.error("Error reloading cart:", err);
+    }
+  };
+
   // Hàm quản lý việc cập nhật số lượng sản phẩm trong giỏ hàng
-  // Cập nhật số lượng sản phẩm trong giỏ hàng
-  const updateQuantity = async (itemId, size, quantity) => {
+  // Cập nhật số lượng sản phẩm trong giỏ hàng (local ngay lập tức, server sau khi debounce)
+  const updateQuantity = (itemId, size, quantity) => {
     let cartData = structuredClone(cartItems); // Tạo bản sao sâu (deep clone) của cartItems để tránh thay đổi trực tiếp state
     cartData[itemId][size] = quantity; // Gán giá trị quantity mới cho sản phẩm và size tương ứng
     setCartItems(cartData); // Cập nhật state cartItems với dữ liệu giỏ hàng mới
 
 
-    // Nếu người dùng đã đăng nhập, gửi yêu cầu đến backend để cập nhật giỏ hàng trên server  
+    // Nếu người dùng đã đăng nhập, đưa thao tác vào hàng đợi và hẹn giờ gửi lên backend
     if (user) {
-      try {
-        const { data } = await axios.post("/api/cart/update", { itemId, size, quantity });
-        data.success ? toast.success(data.message) : toast.error(data.message);
-      } catch (err) {
-        toast.error(err.message);
-      }
+      pendingCartOps.current.push(
+        quantity > 0 ? { op: "set", itemId, size, quantity } : { op: "remove", itemId, size }
+      );
+      clearTimeout(cartFlushTimer.current);
+      cartFlushTimer.current = setTimeout(flushCartOperations, CART_FLUSH_DELAY);
     }
   };
 
@@ -520,6 +577,7 @@ const ShopContextProvider = ({ children }) => {
     setSearchQuery,
     addToCart,
     updateQuantity,
+    flushCartOperations,
     getCartCount,
     getCartAmount,
     logoutUser,
@@ -14,6 +14,7 @@ const Cart = () => {
     formatCurrency,
     cartItems,
     updateQuantity,
+    flushCartOperations,
   } = useContext(ShopContext);
   const [cartData, setCartData] = useState([]); // lưu trữ dữ liệu sản phẩm trong giỏ hàng
 
@@ -156,7 +157,11 @@ const Cart = () => {
             {!isOrderPage ? ( //quyết định nên hiển thị nút nào, check xem ng dùng có đang ở trang Place Order hay là ở trang Cart
               // Nếu false thì hiển thị nút "Proceed to Delivery"
               <button
-                onClick={() => navigate("/place-order")} /* Khi nhấn, nó gọi hàm Maps
+                onClick={async () => {
+                  // Gửi nốt thay đổi số lượng đang chờ debounce → PlaceOrder lấy giá theo giỏ mới nhất
+                  await flushCartOperations();
+                  navigate("/place-order");
+                }} /* Khi nhấn, nó gọi hàm Maps
                 để chuyển hướng người dùng đến URL /place-order (Trang thanh toán/đặt hàng). */
                 className="btn-dark w-full mt-8"
               >
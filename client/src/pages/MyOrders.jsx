@@ -4,6 +4,8 @@ import Title from "../components/Title";
 import { FaStar } from "react-icons/fa";
 import OrderTrackingModal from "../components/OrderTrackingModal";
 
+const ORDERS_PAGE_SIZE = 10;
+
 const MyOrders = () => {
   const { currency, formatCurrency, user, axios, navigate, translateStatus } = useContext(ShopContext);
   const [orders, setOrders] = useState([]);
@@ -11,11 +13,19 @@ const MyOrders = () => {
   const [showTracking, setShowTracking] = useState(false); // State for tracking modal
   const [selectedOrder, setSelectedOrder] = useState(null); // Selected order for tracking
 
-  const loadOrderData = async () => {
+  const [nextCursor, setNextCursor] = useState(null); // Cursor trang tiếp theo (null = hết)
+
+  // Lấy đơn hàng theo trang (cursor = null → trang đầu)
+  const loadOrderData = async (cursor = null) => {
     if (!user) return;
     try {
-      const { data } = await axios.post("/api/order/userorders");
-      if (data.success) setOrders(data.orders);
+      const { data } = await axios.post("/api/order/userorders", null, {
+        params: { limit: ORDERS_PAGE_SIZE, ...(cursor && { cursor }) },
+      });
+      if (data.success) {
+        setOrders((prev) => (cursor ? [...prev, ...data.orders] : data.orders));
+        setNextCursor(data.nextCursor);
+      }
     } catch (error) {
       console.log(error);
     }
@@ -169,6 +179,14 @@ const MyOrders = () => {
         </div>
       ))}
 
+      {nextCursor && (
+        <div className="flexCenter mt-6">
+          <button onClick={() => loadOrderData(nextCursor)} className="btn-secondary !py-2 !text-xs rounded-sm">
+            Xem thêm đơn hàng
+          </button>
+        </div>
+      )}
+
       {/* Order Tracking Modal */}
       <OrderTrackingModal 
         isOpen={showTracking}
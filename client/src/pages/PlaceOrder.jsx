@@ -1,4 +1,4 @@
-import React, { useContext, useState } from "react";
+import React, { useContext, useEffect, useRef, useState } from "react";
 import Title from "../components/Title";
 import CartTotal from "../components/CartTotal";
 import { ShopContext } from "../context/ShopContext";
@@ -13,9 +13,24 @@ const PlaceOrder = () => {
     products,
     axios,
     currentSettings,
+    user,
   } = useContext(ShopContext);
   const [method, setMethod] = useState("COD");
 
+  // Giỏ hàng đã tính giá trên server (dòng, tổng tiền, phí, trạng thái tồn kho + quoteHash)
+  const [quote, setQuote] = useState(null);
+
+  useEffect(() => {
+    if (!user) return;
+    axios
+      .get("/api/cart/priced")
+      .then(({ data }) => data.success && setQuote(data))
+      .catch(() => setQuote(null));
+  }, [user, cartItems]);
+
+  // Idempotency-Key: double-click / retry cùng 1 lần đặt hàng dùng chung key → server không tạo đơn trùng
+  const idempotencyKey = useRef(crypto.randomUUID());
+
   const location = useLocation();
   const isOrderPage = location.pathname.includes("place-order");
 
@@ -40,6 +55,11 @@ const PlaceOrder = () => {
 
   const onSubmitHandler = async (e) => {
     e.preventDefault();
+
+    // Có dòng hết hàng / ngừng bán / sai size → không cho đặt
+    if (quote && !quote.purchasable) {
+      return toast.error("Giỏ hàng có sản phẩm đã hết hàng hoặc ngừng bán, vui lòng cập nhật giỏ hàng");
+    }
     
     try {
       let orderItems = [];
@@ -59,11 +79,18 @@ const PlaceOrder = () => {
       }
 
       // Convert orderItems to items array for backend
-      let items = orderItems.map(item => ({
-        product: item._id,
-        quantity: item.quantity,
-        size: item.size
-      }));
+      // Có quote từ server → đặt đúng các dòng đã tính giá, gửi kèm quoteHash để server không tính lại
+      let items = quote
+        ? quote.lines.map(line => ({
+            product: line.itemId,
+            quantity: line.quantity,
+            size: line.size
+          }))
+        : orderItems.map(item => ({
+            product: item._id,
+            quantity: item.quantity,
+            size: item.size
+          }));
 
       // Snapshot fees tại thời điểm đặt hàng từ settings
       const fees = {
@@ -71,6 +98,7 @@ const PlaceOrder = () => {
         taxRate: currentSettings.taxRate,
         year: currentSettings.year
       };
+      const requestConfig = { headers: { "Idempotency-Key": idempotencyKey.current } };
 
       if (method === "COD") {
         // Place order using COD
@@ -78,8 +106,10 @@ const PlaceOrder = () => {
             items,
             address: formData,
             fees, // Thêm fees snapshot
-        });
+            quoteHash: quote?.quoteHash,
+        }, requestConfig);
         if (data.success) {
+            idempotencyKey.current = crypto.randomUUID();
             toast.success(data.message);
             setCartItems({});
             navigate("/my-orders");
@@ -92,7 +122,8 @@ const PlaceOrder = () => {
             items,
             address: formData,
             fees, // Thêm fees snapshot
-        });
+            quoteHash: quote?.quoteHash,
+        }, requestConfig);
         if (data.success) {
            window.location.replace(data.url)
         } else {
@@ -104,7 +135,8 @@ const PlaceOrder = () => {
             items,
             address: formData,
             fees, // Thêm fees snapshot
-        });
+            quoteHash: quote?.quoteHash,
+        }, requestConfig);
         if (data.success) {
             window.location.replace(data.url);
         } else {
@@ -112,6 +144,11 @@ const PlaceOrder = () => {
         }
     }
 } catch (error) {
+    // Server đã trả lỗi (hết hàng, dữ liệu sai...) → lần bấm sau là request mới
+    // Lỗi mạng thì giữ key để retry không tạo đơn trùng
+    if (error.response) {
+        idempotencyKey.current = crypto.randomUUID();
+    }
     console.log(error)
     toast.error(error.message)
 }
@@ -221,7 +258,7 @@ return (
           {/* Right Side */}
           <div className="flex flex-1 flex-col">
             <div className="max-w-[360px] w-full bg-white p-5 py-10 max-md:mt-16">
-              <CartTotal method={method} setMethod={setMethod} />
+              <CartTotal method={method} setMethod={setMethod} quote={quote} />
               {!isOrderPage ? (
                 <button
                   onClick={() => navigate("/place-order")}
@@ -3,12 +3,19 @@ import { toast } from "react-hot-toast" // import toast để hiển thị thôn
 import { ShopContext } from "../../context/ShopContext" // import ShopContext để sử dụng axios và currency
 import { FiEdit2, FiTrash2, FiX } from "react-icons/fi" // import icons
 
+// Số đơn hàng mỗi trang
+const ORDERS_PAGE_SIZE = 20
+
 // Component hiển thị danh sách đơn hàng (Admin)
 const Orders = () => {
   const { currency, formatCurrency, axios, products } = useContext(ShopContext) // lấy currency, formatCurrency, axios và products từ context
   const [orders, setOrders] = useState([]) // state chứa mảng đơn hàng
   const [loading, setLoading] = useState(true) // state để hiển thị trạng thái đang tải
   const [error, setError] = useState(null) // state lưu lỗi nếu có
+  const [nextCursor, setNextCursor] = useState(null) // cursor trang tiếp theo (null = hết đơn)
+  const [loadingMore, setLoadingMore] = useState(false) // đang tải thêm trang
+  const [selectedIds, setSelectedIds] = useState([]) // các đơn được chọn để cập nhật hàng loạt
+  const [bulkStatus, setBulkStatus] = useState("Shipped") // trạng thái áp dụng cho các đơn đã chọn
   
   // States cho Edit Order Modal
   const [showEditModal, setShowEditModal] = useState(false)
@@ -34,10 +41,12 @@ const Orders = () => {
       setLoading(true) // bắt đầu loading
       setError(null) // reset error
       console.log("🔄 Fetching orders...")
-      const { data } = await axios.post("/api/order/list") // gọi API /api/order/list
+      // gọi API /api/order/list - chỉ lấy trang đầu (summary), trang sau tải bằng nút "Tải thêm"
+      const { data } = await axios.post("/api/order/list", null, { params: { limit: ORDERS_PAGE_SIZE } })
       console.log("📦 Response:", data)
       if (data.success) {
         setOrders(data.orders) // lưu orders vào state
+        setNextCursor(data.nextCursor) // lưu cursor trang sau
         console.log("✅ Loaded orders:", data.orders.length) // log số lượng orders
       } else {
         const errorMsg = data.message || "Unknown error"
@@ -56,6 +65,27 @@ const Orders = () => {
     }
   }
 
+  // Hàm loadMoreOrders: tải trang tiếp theo và nối vào danh sách
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      const { data } = await axios.post("/api/order/list", null, {
+        params: { limit: ORDERS_PAGE_SIZE, cursor: nextCursor }
+      })
+      if (data.success) {
+        setOrders(prev => [...prev, ...data.orders])
+        setNextCursor(data.nextCursor)
+      } else {
+        toast.error(data.message)
+      }
+    } catch (error) {
+      toast.error(error.response?.data?.message || error.message)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   // Hàm statusHandler: thay đổi trạng thái đơn hàng (Processing, Shipped, Delivered...)
   const statusHandler = async (e, orderId) => {
     try {
@@ -73,6 +103,33 @@ const Orders = () => {
     }
   }
 
+  // Hàm toggleSelect: chọn / bỏ chọn 1 đơn hàng
+  const toggleSelect = (orderId) => {
+    setSelectedIds(prev => prev.includes(orderId) ? prev.filter(id => id !== orderId) : [...prev, orderId])
+  }
+
+  // Hàm bulkStatusHandler: cập nhật trạng thái tất cả đơn đã chọn bằng 1 request
+  const bulkStatusHandler = async () => {
+    try {
+      const { data } = await axios.post("/api/order/bulk-status", {
+        orderIds: selectedIds,
+        status: bulkStatus,
+      })
+      if (data.success) {
+        const skipped = data.results.filter(r => r.outcome !== "updated" && r.outcome !== "unchanged").length
+        toast.success(data.message)
+        if (skipped > 0) {
+          toast.error(`${skipped} đơn không thể chuyển sang trạng thái này`)
+        }
+        setSelectedIds([])
+        await fetchAllOrders()
+      }
+    } catch (error) {
+      console.log(error)
+      toast.error(error.response?.data?.message || error.message)
+    }
+  }
+
   // Hàm deleteOrder: xóa đơn hàng
   const deleteOrder = async (orderId) => {
     // Xác nhận trước khi xóa
@@ -180,9 +237,47 @@ const Orders = () => {
         <h2 className="text-2xl font-bold text-gray-800">Quản Lý Đơn Hàng</h2>
       </div>
 
+      {/* Thanh cập nhật hàng loạt: hiện khi có đơn được chọn */}
+      {selectedIds.length > 0 && (
+        <div className="sticky top-0 z-10 flex flex-wrap items-center gap-3 bg-white p-3 mb-4 rounded shadow-sm">
+          <p className="text-sm font-medium">Đã chọn {selectedIds.length} đơn</p>
+          <select
+            value={bulkStatus}
+            onChange={(e) => setBulkStatus(e.target.value)}
+            className="text-xs font-semibold p-1 ring-1 ring-slate-900/5 rounded"
+          >
+            <option value="Processing">Đang xử lý</option>
+            <option value="Shipped">Đang giao</option>
+            <option value="Delivered">Đã giao</option>
+            <option value="Cancelled">Đã hủy</option>
+          </select>
+          <button
+            onClick={bulkStatusHandler}
+            className="px-3 py-1.5 bg-blue-50 hover:bg-blue-100 text-blue-700 rounded-lg text-xs font-medium"
+          >
+            Cập nhật
+          </button>
+          <button
+            onClick={() => setSelectedIds([])}
+            className="px-3 py-1.5 hover:bg-gray-100 text-gray-600 rounded-lg text-xs font-medium"
+          >
+            Bỏ chọn
+          </button>
+        </div>
+      )}
+
       {/* Lặp qua từng đơn hàng và hiển thị */}
       {orders.map((order) => (
         <div key={order._id} className="bg-white p-3 mb-4 rounded">
+          {/* Checkbox chọn đơn để cập nhật hàng loạt */}
+          <label className="flex items-center gap-2 mb-2 text-xs text-gray-500 cursor-pointer w-fit">
+            <input
+              type="checkbox"
+              checked={selectedIds.includes(order._id)}
+              onChange={() => toggleSelect(order._id)}
+            />
+            Chọn
+          </label>
           {/* Products List: các sản phẩm trong đơn hàng */}
           {order.items.map((item, idx) => (
             <div
@@ -324,6 +419,19 @@ const Orders = () => {
         </div>
       ))}
 
+      {/* Nút tải thêm đơn hàng (keyset pagination) */}
+      {nextCursor && (
+        <div className="flex justify-center mt-2 mb-4">
+          <button
+            onClick={loadMoreOrders}
+            disabled={loadingMore}
+            className="px-4 py-2 bg-white hover:bg-gray-50 text-gray-700 rounded-lg text-sm font-medium disabled:opacity-50"
+          >
+            {loadingMore ? "Đang tải..." : "Tải thêm đơn hàng"}
+          </button>
+        </div>
+      )}
+
       {/* Edit Order Modal */}
       {showEditModal && editingOrder && (
         <div className="fixed inset-0 bg-black/50 flex items-center justify-center z-50 p-4">
@@ -1,3 +1,8 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List
+
 import cloudinary
 import cloudinary.uploader
 from app.config.settings import settings
@@ -10,27 +15,66 @@ cloudinary.config(
     secure=True
 )
 
+# SDK của Cloudinary là blocking → chạy trong thread pool riêng (giới hạn số thread)
+# để không chặn event loop của worker trong lúc upload
+_executor = ThreadPoolExecutor(
+    max_workers=settings.UPLOAD_MAX_WORKERS,
+    thread_name_prefix="cloudinary"
+)
+
+# Số slot = số thread: chờ slot ở đây (không tính vào timeout) thay vì chờ trong hàng đợi của pool
+_slots = asyncio.Semaphore(settings.UPLOAD_MAX_WORKERS)
+
+async def _run_blocking(func, *args, **kwargs):
+    """
+    Chạy hàm blocking của SDK trong thread pool
+    Timeout chỉ tính từ lúc thread bắt đầu chạy; slot chỉ được trả khi thread chạy xong
+    (hết timeout thread vẫn chạy tới khi SDK tự timeout → không nhận thêm việc vào pool đang đầy)
+    """
+    await _slots.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return await asyncio.wait_for(asyncio.shield(future), timeout=settings.UPLOAD_TIMEOUT_SECONDS)
+
 async def upload_image(file_content: bytes, folder: str = "veloura") -> str:
     """
     Upload image to Cloudinary
     Returns the secure URL of uploaded image
     """
     try:
-        result = cloudinary.uploader.upload(
+        result = await _run_blocking(
+            cloudinary.uploader.upload,
             file_content,
             folder=folder,
-            resource_type="image"
+            resource_type="image",
+            timeout=settings.UPLOAD_TIMEOUT_SECONDS  # Timeout của HTTP request → thread cũng được giải phóng
         )
         return result.get("secure_url")
+    except asyncio.TimeoutError:
+        raise Exception(f"Failed to upload image: timed out after {settings.UPLOAD_TIMEOUT_SECONDS}s")
     except Exception as e:
         raise Exception(f"Failed to upload image: {str(e)}")
 
+async def upload_images(file_contents: List[bytes], folder: str = "veloura") -> List[str]:
+    """
+    Upload nhiều ảnh song song (tối đa UPLOAD_MAX_WORKERS ảnh cùng lúc)
+    Returns list URL theo đúng thứ tự file_contents
+    """
+    return list(await asyncio.gather(
+        *(upload_image(content, folder=folder) for content in file_contents)
+    ))
+
 async def delete_image(public_id: str) -> bool:
     """
     Delete image from Cloudinary
     """
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = await _run_blocking(cloudinary.uploader.destroy, public_id)
         return result.get("result") == "ok"
     except Exception as e:
         raise Exception(f"Failed to delete image: {str(e)}")
@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config.settings import settings
+from app.config.indexes import ensure_indexes, report_query_plans
 from typing import Optional
 
 class Database:
@@ -21,14 +22,16 @@ async def connect_to_mongo():
     await create_indexes()
 
 async def create_indexes():
-    """Create database indexes for better performance and constraints"""
+    """Create database indexes from the registry and report query plans"""
     try:
         database = await get_database()
         
-        # Create unique index on testimonials.userId to ensure one review per user
-        testimonials_collection = database["testimonials"]
-        await testimonials_collection.create_index("userId", unique=True)
-        print("✅ Created unique index on testimonials.userId")
+        # Build index trong app/config/indexes.py (bỏ qua nếu registry không đổi)
+        await ensure_indexes(database, force=settings.FORCE_INDEX_BUILD)
+        
+        # Kiểm tra các query nóng có dùng index không
+        if settings.INDEX_PLAN_REPORT:
+            await report_query_plans(database)
         
     except Exception as e:
         print(f"⚠️ Index creation info: {str(e)}")
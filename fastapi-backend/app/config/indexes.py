@@ -0,0 +1,367 @@
+"""
+Index Registry
+- Khai báo tập trung tất cả index của các collection
+- Build index idempotent (chỉ gọi create_indexes khi registry thay đổi)
+- Báo cáo lúc startup: kiểm tra explain() của các query nóng có dùng IXSCAN không
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Collection lưu metadata nội bộ (fingerprint index, version...)
+META_COLLECTION = "app_meta"
+INDEX_META_ID = "indexes"
+
+# Giá trị mẫu dùng cho explain() (không cần tồn tại trong DB)
+_SAMPLE_ID = "000000000000000000000000"
+
+# ============================================================================
+# INDEX REGISTRY - Mỗi collection một danh sách IndexModel
+# ============================================================================
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "products": [
+        # /api/product/list và /api/product/category/{category} (keyset pagination)
+        # Partial index: chỉ index sản phẩm đang inStock (sản phẩm xóa mềm không chiếm chỗ)
+        # Mỗi kiểu sort có 1 index không filter category và 1 index có category
+        IndexModel(
+            [("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="products_instock_createdAt_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        IndexModel(
+            [("category", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="products_instock_category_createdAt_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        IndexModel(
+            [("offerPrice", ASCENDING), ("_id", ASCENDING)],
+            name="products_instock_offerPrice_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        IndexModel(
+            [("category", ASCENDING), ("offerPrice", ASCENDING), ("_id", ASCENDING)],
+            name="products_instock_category_offerPrice_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        IndexModel(
+            [("soldCount", DESCENDING), ("_id", DESCENDING)],
+            name="products_instock_soldCount_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        IndexModel(
+            [("category", ASCENDING), ("soldCount", DESCENDING), ("_id", DESCENDING)],
+            name="products_instock_category_soldCount_id",
+            partialFilterExpression={"inStock": True},
+        ),
+        # /api/product/list?popular=true
+        IndexModel(
+            [("popular", ASCENDING), ("createdAt", DESCENDING)],
+            name="products_instock_popular_createdAt",
+            partialFilterExpression={"inStock": True},
+        ),
+        # apply/remove discount theo category
+        IndexModel(
+            [("category", ASCENDING), ("hasDiscount", ASCENDING)],
+            name="products_category_hasDiscount",
+        ),
+        # Discount scheduler: tìm discount tới ngày bắt đầu / hết hạn
+        # Sparse: chỉ sản phẩm có lịch giảm giá mới nằm trong index
+        IndexModel(
+            [("discountStartDate", ASCENDING)],
+            name="products_discountStartDate",
+            sparse=True,
+        ),
+        IndexModel(
+            [("discountEndDate", ASCENDING)],
+            name="products_discountEndDate",
+            sparse=True,
+        ),
+        # Search index: mỗi worker đồng bộ incremental find({"updatedAt": {"$gte": watermark}})
+        IndexModel([("updatedAt", ASCENDING)], name="products_updatedAt"),
+    ],
+    "orders": [
+        # /api/order/userorders: find({"userId"}).sort(createdAt -1, _id -1) (keyset pagination)
+        IndexModel(
+            [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="orders_userId_createdAt_id",
+        ),
+        # /api/order/list: find({}).sort(createdAt -1, _id -1), lọc theo khoảng createdAt
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="orders_createdAt_id"),
+        # /api/order/list?status=... (duyệt ngược cho sort giảm dần)
+        # Stock hold reaper: find({"status": "Pending Payment", "createdAt": {"$lte": cutoff}})
+        IndexModel(
+            [("status", ASCENDING), ("createdAt", ASCENDING), ("_id", ASCENDING)],
+            name="orders_status_createdAt_id",
+        ),
+        # /api/order/list?paymentMethod=... / ?isPaid=...
+        IndexModel(
+            [("paymentMethod", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="orders_paymentMethod_createdAt_id",
+        ),
+        IndexModel(
+            [("isPaid", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="orders_isPaid_createdAt_id",
+        ),
+        # verify-stripe: find_one({"stripeSessionId"})
+        IndexModel(
+            [("stripeSessionId", ASCENDING)],
+            name="orders_stripeSessionId",
+            partialFilterExpression={"stripeSessionId": {"$type": "string"}},
+        ),
+        # Multikey index: kiểm tra verified purchase khi viết review
+        IndexModel(
+            [("items.product._id", ASCENDING), ("userId", ASCENDING)],
+            name="orders_itemsProductId_userId",
+        ),
+    ],
+    "reviews": [
+        # /api/review/product/{id}: find({"productId"}).sort(...)
+        IndexModel(
+            [("productId", ASCENDING), ("createdAt", DESCENDING)],
+            name="reviews_productId_createdAt",
+        ),
+        IndexModel(
+            [("productId", ASCENDING), ("rating", DESCENDING), ("createdAt", DESCENDING)],
+            name="reviews_productId_rating_createdAt",
+        ),
+        # Mỗi user chỉ review 1 lần cho 1 sản phẩm (unique; dữ liệu cũ bị trùng thì
+        # chạy scripts/dedupe_reviews.py trước, nếu không index này build lỗi và được thử lại mỗi lần boot)
+        IndexModel(
+            [("userId", ASCENDING), ("productId", ASCENDING)],
+            name="reviews_userId_productId_unique",
+            unique=True,
+        ),
+    ],
+    "wishlists": [
+        IndexModel([("userId", ASCENDING)], name="wishlists_userId", unique=True),
+    ],
+    "carts": [
+        # Mỗi user 1 giỏ hàng; mọi thao tác giỏ hàng: find_one / update({"userId"})
+        IndexModel([("userId", ASCENDING)], name="carts_userId", unique=True),
+    ],
+    "users": [
+        # Login / register: find_one({"email"})
+        IndexModel([("email", ASCENDING)], name="users_email", unique=True),
+        IndexModel([("name", ASCENDING)], name="users_name"),
+        IndexModel([("role", ASCENDING)], name="users_role"),
+    ],
+    "testimonials": [
+        # Mỗi user chỉ có 1 testimonial
+        IndexModel([("userId", ASCENDING)], name="userId_1", unique=True),
+        IndexModel(
+            [("status", ASCENDING), ("createdAt", DESCENDING)],
+            name="testimonials_status_createdAt",
+        ),
+    ],
+    "categories": [
+        IndexModel([("slug", ASCENDING)], name="categories_slug"),
+        IndexModel([("inStock", ASCENDING), ("order", ASCENDING)], name="categories_inStock_order"),
+    ],
+    "blogs": [
+        IndexModel(
+            [("isPublished", ASCENDING), ("createdAt", DESCENDING)],
+            name="blogs_isPublished_createdAt",
+        ),
+    ],
+    "settings": [
+        IndexModel([("year", ASCENDING)], name="settings_year"),
+    ],
+    "stripe_events": [
+        # Webhook event: _id = event id (chống xử lý trùng), TTL theo expiresAt
+        IndexModel([("expiresAt", ASCENDING)], name="stripe_events_expiresAt", expireAfterSeconds=0),
+        # Retry event lỗi / bị bỏ dở: find({"status": {"$in": [...]}, "updatedAt": {"$lt": cutoff}})
+        IndexModel([("status", ASCENDING), ("updatedAt", ASCENDING)], name="stripe_events_status_updatedAt"),
+    ],
+    "idempotency_keys": [
+        # TTL index: MongoDB tự xóa key khi quá expiresAt (IDEMPOTENCY_TTL_HOURS)
+        IndexModel([("expiresAt", ASCENDING)], name="idempotency_keys_expiresAt", expireAfterSeconds=0),
+    ],
+}
+
+# Index cũ đã được thay bằng index mới trong registry → drop khi build
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    "orders": ["orders_userId_createdAt", "orders_createdAt", "orders_status_createdAt"],
+    "reviews": ["reviews_userId_productId"],
+}
+
+# ============================================================================
+# QUERY SHAPES - Các query nóng của route, kiểm tra bằng explain() lúc startup
+# ============================================================================
+# Mỗi entry: (tên route, collection, filter, sort)
+QUERY_SHAPES = [
+    ("GET /api/product/list", "products",
+     {"inStock": True}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/product/list?sort=price_asc", "products",
+     {"inStock": True}, [("offerPrice", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /api/product/list?sort=best_selling", "products",
+     {"inStock": True}, [("soldCount", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/product/list?category", "products",
+     {"inStock": True, "category": "Men"}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/product/list?category&sort=price_desc", "products",
+     {"inStock": True, "category": "Men"}, [("offerPrice", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/product/list?popular", "products",
+     {"inStock": True, "popular": True}, None),
+    ("GET /api/product/category/{category}", "products",
+     {"category": "Men", "inStock": True}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("search index refresh", "products",
+     {"updatedAt": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("discount scheduler (activate)", "products",
+     {"discountStartDate": {"$lte": datetime(2000, 1, 1)}, "discountPercent": {"$gt": 0},
+      "hasDiscount": {"$ne": True}}, None),
+    ("discount scheduler (expire)", "products",
+     {"discountEndDate": {"$lte": datetime(2000, 1, 1)}, "hasDiscount": True}, None),
+    ("POST /api/order/userorders", "orders",
+     {"userId": _SAMPLE_ID}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("POST /api/order/list", "orders",
+     {}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("POST /api/order/list?status", "orders",
+     {"status": "Processing"}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("POST /api/order/list?paymentMethod", "orders",
+     {"paymentMethod": "COD"}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("POST /api/order/list?isPaid", "orders",
+     {"isPaid": True}, [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("stripe event retry", "stripe_events",
+     {"status": {"$in": ["pending", "failed", "processing"]}, "updatedAt": {"$lt": datetime(2000, 1, 1)},
+      "attempts": {"$lt": 5}}, None),
+    ("GET /api/order/export", "orders",
+     {"createdAt": {"$gte": datetime(2000, 1, 1)}}, [("createdAt", ASCENDING), ("_id", ASCENDING)]),
+    ("stock hold reaper", "orders",
+     {"status": "Pending Payment", "createdAt": {"$lte": datetime(2000, 1, 1)}}, [("createdAt", ASCENDING)]),
+    ("POST /api/order/verify-stripe", "orders",
+     {"stripeSessionId": "cs_test"}, None),
+    ("POST /api/review/create (verified purchase)", "orders",
+     {"userId": _SAMPLE_ID, "status": "Delivered",
+      "items": {"$elemMatch": {"product._id": _SAMPLE_ID}}}, None),
+    ("GET /api/review/product/{id}", "reviews",
+     {"productId": ObjectId(_SAMPLE_ID)}, [("createdAt", DESCENDING)]),
+    ("GET /api/wishlist", "wishlists",
+     {"userId": _SAMPLE_ID}, None),
+    ("GET /api/cart/get", "carts",
+     {"userId": _SAMPLE_ID}, None),
+    ("POST /api/user/login", "users",
+     {"email": "user@example.com"}, None),
+    ("GET /api/testimonial/list", "testimonials",
+     {"status": "approved"}, [("createdAt", DESCENDING)]),
+    ("GET /api/category/list", "categories",
+     {"inStock": True}, [("order", ASCENDING)]),
+    ("GET /api/blog/list", "blogs",
+     {"isPublished": True}, [("createdAt", DESCENDING)]),
+]
+
+
+def registry_fingerprint() -> str:
+    """
+    Tính fingerprint của INDEX_REGISTRY
+
+    Returns:
+        SHA1 hex string - thay đổi khi thêm/sửa/xóa index spec
+    """
+    spec = {
+        collection: [model.document for model in models]
+        for collection, models in sorted(INDEX_REGISTRY.items())
+    }
+    payload = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+async def ensure_indexes(database, force: bool = False) -> bool:
+    """
+    Build tất cả index trong registry (idempotent)
+
+    Args:
+        database: Motor database
+        force: True để build lại kể cả khi fingerprint không đổi
+
+    Returns:
+        True nếu đã gọi create_indexes, False nếu bỏ qua (registry không đổi)
+    """
+    meta_collection = database[META_COLLECTION]
+    fingerprint = registry_fingerprint()
+
+    if not force:
+        meta = await meta_collection.find_one({"_id": INDEX_META_ID})
+        if meta and meta.get("fingerprint") == fingerprint:
+            print("✅ Indexes up to date (registry unchanged)")
+            return False
+
+    failed = 0
+    for collection_name, models in INDEX_REGISTRY.items():
+        # Tạo từng index riêng để 1 index lỗi (vd: dữ liệu trùng với unique) không chặn các index khác
+        for model in models:
+            try:
+                await database[collection_name].create_indexes([model])
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ Index {collection_name}.{model.document['name']} failed: {str(e)}")
+
+    # Drop index cũ (không tồn tại thì bỏ qua)
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        existing = await database[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                await database[collection_name].drop_index(name)
+                print(f"🗑️ Dropped obsolete index {collection_name}.{name}")
+
+    # Chỉ lưu fingerprint khi build thành công toàn bộ, lần boot sau sẽ thử lại nếu có lỗi
+    if failed == 0:
+        await meta_collection.update_one(
+            {"_id": INDEX_META_ID},
+            {"$set": {"fingerprint": fingerprint, "updatedAt": datetime.utcnow()}},
+            upsert=True
+        )
+
+    print(f"✅ Built {sum(len(m) for m in INDEX_REGISTRY.values()) - failed} indexes ({failed} failed)")
+    return True
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Lấy danh sách stage (IXSCAN, COLLSCAN, FETCH...) trong winningPlan"""
+    stages = []
+    if not isinstance(plan, dict):
+        return stages
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def report_query_plans(database) -> List[str]:
+    """
+    Chạy explain() cho từng query trong QUERY_SHAPES và in báo cáo
+
+    Returns:
+        Danh sách tên route có plan không dùng IXSCAN
+    """
+    flagged = []
+    print("📋 Query plan report:")
+
+    for route, collection_name, query, sort in QUERY_SHAPES:
+        try:
+            cursor = database[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.explain()
+            stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        except Exception as e:
+            print(f"   ⚠️ {route}: explain failed ({str(e)})")
+            continue
+
+        if "IXSCAN" in stages or "IDHACK" in stages or "EXPRESS_IXSCAN" in stages:
+            print(f"   ✅ {route}: {' <- '.join(stages)}")
+        else:
+            flagged.append(route)
+            print(f"   ❌ {route}: {' <- '.join(stages) or 'unknown plan'} (not an IXSCAN)")
+
+    if flagged:
+        print(f"⚠️ {len(flagged)} route queries are not served by an index")
+
+    return flagged
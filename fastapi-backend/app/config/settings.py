@@ -5,6 +5,49 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str
     DATABASE_NAME: str = "veloura"
+    FORCE_INDEX_BUILD: bool = False  # Build lại index kể cả khi registry không đổi
+    INDEX_PLAN_REPORT: bool = True  # In báo cáo explain() của các query nóng lúc startup
+    
+    # Search
+    SEARCH_REFRESH_SECONDS: float = 5.0  # Chu kỳ tối thiểu đồng bộ search index với MongoDB
+    SEARCH_REBUILD_SECONDS: float = 600.0  # Build lại toàn bộ index (bỏ sản phẩm bị xóa hẳn khỏi DB)
+    
+    # Catalog cache
+    CATALOG_CACHE_ENABLED: bool = True  # Đọc /api/product/list, /{id}, /category/{category} từ snapshot
+    CATALOG_MAX_AGE_SECONDS: float = 60.0  # Build lại snapshot sau thời gian này (cập nhật tồn kho)
+    VERSION_CHECK_SECONDS: float = 1.0  # Chu kỳ tối thiểu đọc version collection từ MongoDB
+    PRODUCT_BATCH_MAX_IDS: int = 100  # Số productIds tối đa mỗi request POST /api/product/batch
+    
+    # Principal cache (user đang đăng nhập, dùng trong auth_user / auth_admin)
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000  # Số user tối đa giữ trong cache mỗi worker
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0  # Độ trễ tối đa khi đổi role / khóa user ở worker khác
+    
+    # Discount scheduler (bật/tắt discount theo discountStartDate / discountEndDate)
+    DISCOUNT_SCHEDULER_ENABLED: bool = True
+    DISCOUNT_SCHEDULER_INTERVAL_SECONDS: float = 60.0  # Độ trễ tối đa so với mốc thời gian
+    
+    # Giữ kho cho đơn Stripe / VNPay chờ thanh toán
+    STOCK_HOLD_MINUTES: int = 35  # Quá thời gian này chưa thanh toán → hủy đơn, hoàn kho (>= 31: Stripe session sống tối thiểu 30 phút)
+    STOCK_HOLD_REAPER_INTERVAL_SECONDS: float = 60.0
+    STOCK_HOLD_REAPER_BATCH_SIZE: int = 200
+    
+    # Idempotency-Key cho POST /api/order/cod, /stripe, /vnpay
+    IDEMPOTENCY_TTL_HOURS: int = 24  # Thời gian lưu response để replay
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0  # Request đầu chạy quá lâu (worker chết) → cho phép chạy lại
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # Request trùng chờ request đầu tối đa bao lâu rồi trả 409
+    
+    # Export đơn hàng (GET /api/order/export)
+    ORDER_EXPORT_BATCH_SIZE: int = 500  # Số đơn mỗi batch đọc từ MongoDB / mỗi chunk ghi ra response
+    ORDER_BULK_MAX_IDS: int = 200  # Số orderIds tối đa mỗi request POST /api/order/bulk-status
+    
+    # Giỏ hàng
+    CART_QUOTE_TTL_SECONDS: float = 120.0  # /api/cart/priced dùng lại quote đã tính; checkout nhận quoteHash trong thời gian này
+    CART_BATCH_MAX_OPERATIONS: int = 100  # Số thao tác tối đa mỗi request POST /api/cart/batch
+    
+    # HTTP caching cho endpoint public (ETag / Last-Modified)
+    HTTP_CACHE_MAX_AGE: int = 60  # Giây browser/proxy dùng lại response không cần hỏi lại
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = 600  # Giây được dùng bản cũ trong lúc revalidate
     
     # JWT
     JWT_SECRET: str
@@ -15,10 +58,22 @@ class Settings(BaseSettings):
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
+    UPLOAD_MAX_WORKERS: int = 8  # Số ảnh upload song song tối đa mỗi worker
+    UPLOAD_TIMEOUT_SECONDS: float = 30.0  # Timeout mỗi ảnh
     
     # Stripe
     STRIPE_SECRET_KEY: str
     STRIPE_WEBHOOK_SECRET: Optional[str] = None
+    STRIPE_API_BASE: Optional[str] = None  # vd http://localhost:12111 (scripts/stripe_stub_server.py)
+    STRIPE_MAX_WORKERS: int = 8  # Số request Stripe song song tối đa mỗi worker
+    STRIPE_TIMEOUT_SECONDS: float = 10.0  # Timeout mỗi lần gọi Stripe
+    STRIPE_MAX_RETRIES: int = 2  # Số lần retry lỗi tạm thời (mất kết nối, timeout, 429, 5xx)
+    STRIPE_RETRY_BASE_SECONDS: float = 0.25  # Backoff: random(0, base * 2^lần_retry)
+    STRIPE_BREAKER_FAILURES: int = 5  # Số lần lỗi liên tiếp để mở circuit breaker
+    STRIPE_BREAKER_RESET_SECONDS: float = 30.0  # Thời gian breaker mở trước khi cho 1 request thử lại
+    STRIPE_EVENT_RETRY_INTERVAL_SECONDS: float = 60.0  # Chu kỳ xử lý lại webhook event lỗi / bị bỏ dở
+    STRIPE_EVENT_MAX_ATTEMPTS: int = 5  # Số lần xử lý tối đa mỗi event
+    STRIPE_EVENT_TTL_DAYS: int = 30  # Giữ event id để chống xử lý trùng (Stripe retry tối đa 3 ngày)
     
     # Email Configuration (SMTP)
     SMTP_HOST: str = "smtp.gmail.com"
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Dict
+from typing import Dict, List, Literal, Optional
+from datetime import datetime
 
 class CartAdd(BaseModel):
     itemId: str
@@ -10,6 +11,27 @@ class CartUpdate(BaseModel):
     size: str
     quantity: int = Field(..., ge=0)
 
+class CartOperation(BaseModel):
+    """1 thao tác trong POST /api/cart/batch"""
+    op: Literal["add", "set", "remove"]
+    itemId: str
+    size: str
+    quantity: Optional[int] = Field(None, ge=0)  # add: số lượng cộng thêm (mặc định 1), set: số lượng mới
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1)
+
 class CartResponse(BaseModel):
     cartData: Dict[str, Dict[str, int]]
     message: str
+
+class Cart(BaseModel):
+    """Document trong collection carts (1 giỏ / user, unique userId)"""
+    id: str = Field(alias="_id")
+    userId: str
+    items: Dict[str, Dict[str, int]] = Field(default_factory=dict)  # {itemId: {size: quantity}}
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
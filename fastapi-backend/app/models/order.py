@@ -28,7 +28,13 @@ class OrderAddress(BaseModel):
 class OrderCreate(BaseModel):
     items: List[OrderItem]
     address: OrderAddress
-    fees: OrderFees  # Snapshot fees tại thời điểm đặt hàng
+    # Client cũ vẫn gửi fees; server luôn tính lại từ settings hiện hành (app/utils/pricing.py)
+    fees: Optional[OrderFees] = None
+    # quoteHash từ GET /api/cart/priced: còn hiệu lực thì dùng lại quote đó, không tính giá lại
+    quoteHash: Optional[str] = None
+
+class QuoteRequest(BaseModel):
+    items: List[OrderItem]
 
 class Order(BaseModel):
     id: str = Field(alias="_id")
@@ -76,3 +82,52 @@ class OrderUpdate(BaseModel):
     orderId: str
     status: Optional[str] = None
     address: Optional[OrderAddress] = None
+
+class OrderBulkStatusUpdate(BaseModel):
+    orderIds: List[str] = Field(..., min_length=1)
+    status: str
+
+# State machine trạng thái đơn hàng: trạng thái hiện tại → các trạng thái được chuyển sang
+# (dùng cho POST /api/order/bulk-status; đơn chờ thanh toán chỉ được hủy, chuyển tiếp khi đã thanh toán)
+ORDER_TRANSITIONS = {
+    "Pending Payment": {"Cancelled"},
+    "Order Placed": {"Processing", "Shipped", "Cancelled"},
+    "Processing": {"Shipped", "Cancelled"},
+    "Shipped": {"Delivered"},
+    "Delivered": set(),
+    "Cancelled": set(),
+}
+
+# Các kiểu xem danh sách đơn hàng
+ORDER_LIST_VIEWS = ("summary", "full")
+
+# Thứ tự danh sách đơn hàng (mới nhất trước, _id để thứ tự ổn định cho keyset pagination)
+ORDER_SORT = [("createdAt", -1), ("_id", -1)]
+
+# Projection cho danh sách đơn hàng: bỏ fees / thông tin thanh toán nội bộ,
+# mỗi dòng hàng chỉ giữ 1 ảnh (đủ cho trang My Orders / admin Orders)
+ORDER_SUMMARY_PROJECTION = {
+    "userId": 1,
+    "amount": 1,
+    "address": 1,
+    "status": 1,
+    "paymentMethod": 1,
+    "isPaid": 1,
+    "paidAt": 1,
+    "createdAt": 1,
+    "updatedAt": 1,  # OrderTrackingModal: ngày cập nhật / ngày hủy
+    "items": {"$map": {
+        "input": {"$ifNull": ["$items", []]},
+        "as": "item",
+        "in": {
+            "product": {
+                "_id": "$$item.product._id",
+                "name": "$$item.product.name",
+                "offerPrice": "$$item.product.offerPrice",
+                "image": {"$slice": [{"$ifNull": ["$$item.product.image", []]}, 1]},
+            },
+            "quantity": "$$item.quantity",
+            "size": "$$item.size",
+        },
+    }},
+}
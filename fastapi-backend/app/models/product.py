@@ -77,3 +77,65 @@ class ProductResponse(BaseModel):
     class Config:
         populate_by_name = True
         json_encoders = {ObjectId: str}
+
+# Projection cho product card (grid sản phẩm) - chỉ các field mà grid render
+PRODUCT_CARD_PROJECTION = {
+    "name": 1,
+    "image": {"$slice": 2},
+    "description": {"$substrCP": [{"$ifNull": ["$description", ""]}, 0, 160]},
+    "price": 1,
+    "offerPrice": 1,
+    "hasDiscount": 1,
+    "discountPercent": 1,
+    "category": 1,
+    "sizes": 1,
+    "popular": 1,
+    "quantity": 1,
+    "soldCount": 1,
+    "isActive": 1,
+    "createdAt": 1,
+}
+
+# Cùng projection nhưng cho $project trong aggregation ($slice ở find() có cú pháp khác)
+PRODUCT_CARD_PIPELINE_PROJECTION = {**PRODUCT_CARD_PROJECTION, "image": {"$slice": ["$image", 2]}}
+
+# Mốc giá (VND) cho histogram ở trang collection
+PRICE_HISTOGRAM_BOUNDARIES = [0, 100000, 200000, 300000, 500000, 1000000, 2000000]
+
+# Sản phẩm được bán: isActive phải đúng True (thiếu field = không bán)
+# Dùng chung cho thêm vào giỏ, /api/cart/priced và checkout để các nơi không lệch nhau
+PURCHASABLE_FILTER = {"isActive": True}
+
+def is_purchasable(product: dict) -> bool:
+    """Cùng điều kiện với PURCHASABLE_FILTER, cho document đã đọc về Python"""
+    return product.get("isActive") is True
+
+# Các kiểu sắp xếp cho danh sách sản phẩm (luôn có _id để thứ tự ổn định cho keyset pagination)
+PRODUCT_SORT_OPTIONS = {
+    "newest": [("createdAt", -1), ("_id", -1)],
+    "price_asc": [("offerPrice", 1), ("_id", 1)],
+    "price_desc": [("offerPrice", -1), ("_id", -1)],
+    "best_selling": [("soldCount", -1), ("_id", -1)],
+}
+
+
+def offer_price_expression(discount_percent):
+    """
+    Biểu thức aggregation tính offerPrice từ "$price" (giống calculate_offer_price
+    trong product_routes) để dùng trong update pipeline - cả collection chỉ 1 lệnh.
+    $round của MongoDB cũng làm tròn half-to-even như round() của Python.
+
+    Args:
+        discount_percent: % giảm giá (số), hoặc field path như "$discountPercent"
+            để mỗi sản phẩm dùng % của chính nó
+    """
+    if isinstance(discount_percent, str):
+        factor = {"$subtract": [1, {"$divide": [discount_percent, 100]}]}
+        return {"$cond": [
+            {"$gt": [{"$ifNull": [discount_percent, 0]}, 0]},
+            {"$round": [{"$multiply": ["$price", factor]}, -3]},
+            "$price"
+        ]}
+    if discount_percent == 0:
+        return "$price"
+    return {"$round": [{"$multiply": ["$price", 1 - round(discount_percent, 2) / 100]}, -3]}
@@ -42,7 +42,6 @@ class User(BaseModel):
     address: Optional[str] = None
     dateOfBirth: Optional[date] = None
     gender: Optional[str] = None
-    cartData: Dict[str, Dict[str, int]] = Field(default_factory=dict)
     role: str = "customer"  # customer, staff, admin
     emailVerified: bool = False  # 👈 Thêm field xác thực email
     isActive: bool = True
@@ -71,6 +70,19 @@ class UserResponse(BaseModel):
         populate_by_name = True
         json_encoders = {ObjectId: str}
 
+# Projection cho profile / is-auth: bỏ password, mã OTP và giỏ hàng cũ (giỏ ở collection carts)
+AUTH_USER_PROJECTION = {
+    "password": 0,
+    "cartData": 0,
+    "verificationCode": 0,
+    "codeExpiry": 0,
+    "codeAttempts": 0,
+    "lastCodeSentAt": 0,
+}
+
+# Projection cho principal cache: chỉ các field auth_user / auth_admin và route cần
+PRINCIPAL_PROJECTION = {"email": 1, "name": 1, "role": 1, "isActive": 1}
+
 class UserUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -28,6 +28,12 @@ from app.middleware.auth_admin import auth_admin, auth_admin_only, auth_staff
 # - auth_admin_only: Chỉ cho phép admin truy cập (không cho staff)
 # - auth_staff: Cho phép cả admin và staff truy cập (giống auth_admin)
 
+# Collection giỏ hàng (xóa kèm khi xóa khách hàng)
+from app.utils.cart_store import CARTS_COLLECTION
+
+# Principal cache của auth_user / auth_admin (evict khi khóa / xóa user)
+from app.utils.principal_cache import principal_cache
+
 # Import ObjectId để chuyển đổi string ID thành MongoDB ObjectId
 from bson import ObjectId
 
@@ -268,6 +274,7 @@ async def toggle_customer_status(customer_id: str, admin: dict = Depends(auth_ad
         {"_id": ObjectId(customer_id)},  # Điều kiện tìm khách hàng
         {"$set": {"isActive": new_status, "updatedAt": datetime.utcnow()}}  # Cập nhật isActive và updatedAt
     )
+    principal_cache.evict(customer_id)  # Khách bị khóa → request tiếp theo bị chặn ngay (worker này)
     
     # Bước 6: Trả về thông báo thành công
     return {
@@ -301,7 +308,12 @@ async def delete_customer(customer_id: str, admin: dict = Depends(auth_admin_onl
             detail="Không tìm thấy khách hàng"
         )
     
-    # Bước 4: Trả về thông báo xóa thành công
+    # Bước 4: Bỏ khỏi principal cache và xóa giỏ hàng của khách hàng (collection carts)
+    principal_cache.evict(customer_id)
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    await carts_collection.delete_one({"userId": customer_id})
+    
+    # Bước 5: Trả về thông báo xóa thành công
     return {
         "success": True,
         "message": "Xóa khách hàng thành công"
@@ -352,6 +364,9 @@ from datetime import datetime
 # Import Settings models
 from app.models.settings import SettingsCreate, SettingsUpdate, SettingsResponse
 
+# Import bump_version để /api/settings/current đổi ETag khi settings thay đổi
+from app.utils.versioning import bump_version
+
 # GET /api/admin/settings - List all settings (all years)
 @router.get("/settings", response_model=dict, dependencies=[Depends(auth_admin)])
 async def get_all_settings():
@@ -412,6 +427,9 @@ async def create_settings(settings: SettingsCreate):
         result = await settings_collection.insert_one(new_settings)
         new_settings["_id"] = str(result.inserted_id)
         
+        # Đổi version → ETag của /api/settings/current đổi theo
+        await bump_version("settings")
+        
         return {
             "success": True,
             "message": f"Cài đặt cho năm {settings.year} đã được tạo thành công",
@@ -463,6 +481,9 @@ async def update_settings(year: int, settings: SettingsUpdate):
         updated_settings = await settings_collection.find_one({"year": year})
         updated_settings["_id"] = str(updated_settings["_id"])
         
+        # Đổi version → ETag của /api/settings/current đổi theo
+        await bump_version("settings")
+        
         return {
             "success": True,
             "message": f"Cài đặt cho năm {year} đã được cập nhật thành công",
@@ -505,6 +526,9 @@ async def delete_settings(year: int):
             }}
         )
         
+        # Đổi version → ETag của /api/settings/current đổi theo
+        await bump_version("settings")
+        
         return {
             "success": True,
             "message": f"Cài đặt cho năm {year} đã được vô hiệu hóa thành công"
@@ -516,3 +540,21 @@ async def delete_settings(year: int):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting settings: {str(e)}"
         )
+
+# ========================================
+# ENDPOINT: THỐNG KÊ CACHE CỦA WORKER
+# ========================================
+
+# Import các cache in-process
+from app.utils.catalog_cache import catalog_cache
+
+@router.get("/cache-stats", response_model=dict)
+# Endpoint GET /api/admin/cache-stats để xem hit/miss của các cache trong worker
+async def get_cache_stats(admin: dict = Depends(auth_admin)):
+    """Get in-process cache statistics (Admin/Staff)"""
+    # Mỗi worker có cache riêng → số liệu chỉ của worker xử lý request này
+    return {
+        "success": True,
+        "catalog": catalog_cache.stats(),  # Catalog snapshot: hits, misses, version, size...
+        "principal": principal_cache.stats()  # User của auth_user / auth_admin: hits, misses, evictions, size...
+    }
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from app.models.blog import BlogCreate, BlogUpdate
 from app.config.database import get_collection
 from app.middleware.auth_admin import auth_staff
 from app.config.cloudinary import upload_image
+from app.utils.http_cache import conditional_get
+from app.utils.versioning import bump_version
 from bson import ObjectId
 from datetime import datetime
 from typing import Optional
@@ -10,8 +12,13 @@ from typing import Optional
 router = APIRouter()
 
 @router.get("/list", response_model=dict)
-async def get_all_blogs(published_only: bool = True):
+async def get_all_blogs(request: Request, response: Response, published_only: bool = True):
     """Get all blogs"""
+    # ETag theo version của blogs → client đã có bản mới nhất thì trả 304
+    not_modified = await conditional_get(request, response, ["blogs"], variant=f"published_only={published_only}")
+    if not_modified:
+        return not_modified
+    
     blogs_collection = await get_collection("blogs")
     
     query = {"isPublished": True} if published_only else {}
@@ -77,6 +84,9 @@ async def add_blog(
     
     result = await blogs_collection.insert_one(blog_doc)
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("blogs")
+    
     return {
         "success": True,
         "message": "Thêm bài viết thành công",
@@ -128,6 +138,9 @@ async def update_blog(
         {"$set": update_data}
     )
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("blogs")
+    
     return {
         "success": True,
         "message": "Cập nhật bài viết thành công"
@@ -146,6 +159,9 @@ async def delete_blog(blog_id: str, staff: dict = Depends(auth_staff)):
             detail="Không tìm thấy bài viết"
         )
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("blogs")
+    
     return {
         "success": True,
         "message": "Xóa bài viết thành công"
@@ -170,6 +186,9 @@ async def toggle_publish_blog(blog_id: str, staff: dict = Depends(auth_staff)):
         {"$set": {"isPublished": new_status, "updatedAt": datetime.utcnow()}}
     )
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("blogs")
+    
     return {
         "success": True,
         "message": f"Blog {'published' if new_status else 'unpublished'} successfully"
@@ -1,112 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from app.models.cart import CartAdd, CartUpdate
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from app.models.cart import CartAdd, CartUpdate, CartBatch
+from app.models.product import PURCHASABLE_FILTER
 from app.config.database import get_collection
+from app.config.settings import settings
 from app.middleware.auth_user import auth_user
+from app.utils import cart_store
+from app.utils.pricing import price_cart
 from bson import ObjectId
-from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/add")
 async def add_to_cart(cart_item: CartAdd, request: Request, user: dict = Depends(auth_user)):
-    """Add item to cart"""
-    try:
-        print("="*80)
-        print("🎯 ADD_TO_CART FUNCTION CALLED!")
-        print(f"📦 cart_item: itemId={cart_item.itemId}, size={cart_item.size}")
-        print(f"👤 user: {user.get('email')}")
-        print("="*80)
-        
-        users_collection = await get_collection("users")
-        products_collection = await get_collection("products")
-        
-        print(f"🔍 Looking for product: {cart_item.itemId}")
-        # Check if product exists
-        product = await products_collection.find_one({"_id": ObjectId(cart_item.itemId), "isActive": True})
-        print(f"🔍 Product found: {product is not None}")
-        
-        if not product:
-            print("❌ Product not found!")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không tìm thấy sản phẩm"
-            )
-        
-        print(f"🔍 Product sizes: {product.get('sizes', [])}")
-        # Check if size is valid
-        if cart_item.size not in product.get("sizes", []):
-            print(f"❌ Invalid size: {cart_item.size}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Kích cỡ không hợp lệ"
-            )
-        
-        # Get current cart
-        cart_data = user.get("cartData", {})
-        print(f"🔍 Current cart: {cart_data}")
-        
-        # Add/update item in cart
-        if cart_item.itemId not in cart_data:
-            cart_data[cart_item.itemId] = {}
-        
-        if cart_item.size not in cart_data[cart_item.itemId]:
-            cart_data[cart_item.itemId][cart_item.size] = 0
-        
-        cart_data[cart_item.itemId][cart_item.size] += 1
-        print(f"🔍 Updated cart: {cart_data}")
-        
-        # Update user's cart in database
-        result = await users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"cartData": cart_data, "updatedAt": datetime.utcnow()}}
+    """Add item to cart ($inc atomic đúng 1 dòng, trả về số lượng mới của dòng)"""
+    products_collection = await get_collection("products")
+    
+    # Check if product exists (chỉ lấy sizes)
+    product = None
+    if ObjectId.is_valid(cart_item.itemId):
+        product = await products_collection.find_one(
+            {"_id": ObjectId(cart_item.itemId), **PURCHASABLE_FILTER},
+            {"sizes": 1}
         )
-        print(f"✅ DB update result: modified_count={result.modified_count}")
-        
-        return {
-            "success": True,
-            "message": "Đã thêm sản phẩm vào giỏ hàng"
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ UNEXPECTED ERROR: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Không tìm thấy sản phẩm"
+        )
+    
+    # Check if size is valid
+    if cart_item.size not in product.get("sizes", []):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal server error: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Kích cỡ không hợp lệ"
         )
+    
+    quantity = await cart_store.increment_line(user["_id"], cart_item.itemId, cart_item.size)
+    
+    return {
+        "success": True,
+        "message": "Đã thêm sản phẩm vào giỏ hàng",
+        "itemId": cart_item.itemId,
+        "size": cart_item.size,
+        "quantity": quantity
+    }
 
 @router.post("/update")
 async def update_cart(cart_item: CartUpdate, request: Request, user: dict = Depends(auth_user)):
-    """Update cart item quantity"""
-    users_collection = await get_collection("users")
+    """Update cart item quantity (quantity = 0 → xóa dòng)"""
+    quantity = await cart_store.set_line(user["_id"], cart_item.itemId, cart_item.size, cart_item.quantity)
+    
+    return {
+        "success": True,
+        "message": "Cập nhật giỏ hàng thành công",
+        "itemId": cart_item.itemId,
+        "size": cart_item.size,
+        "quantity": quantity
+    }
+
+@router.post("/batch")
+async def batch_update_cart(batch: CartBatch, request: Request, user: dict = Depends(auth_user)):
+    """
+    Áp dụng nhiều thao tác add / set / remove trong 1 request (client debounce + gộp các lần bấm +/-)
+    - Các thao tác cùng 1 dòng được gộp theo thứ tự → 1 update atomic duy nhất cho cả giỏ
+    - Sản phẩm / size kiểm tra bằng 1 query $in; 1 thao tác không hợp lệ → từ chối cả batch
+    """
+    if len(batch.operations) > settings.CART_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {settings.CART_BATCH_MAX_OPERATIONS} thao tác mỗi lần"
+        )
     
-    # Get current cart
-    cart_data = user.get("cartData", {})
+    # Bước 1: Gộp thao tác theo từng dòng (itemId, size)
+    lines = cart_store.fold_operations(batch.operations)
+    for item_id, size in lines:
+        cart_store.line_path(item_id, size)
     
-    # Update quantity
-    if cart_item.quantity == 0:
-        # Remove item if quantity is 0
-        if cart_item.itemId in cart_data and cart_item.size in cart_data[cart_item.itemId]:
-            del cart_data[cart_item.itemId][cart_item.size]
-            if not cart_data[cart_item.itemId]:
-                del cart_data[cart_item.itemId]
-    else:
-        # Update quantity
-        if cart_item.itemId not in cart_data:
-            cart_data[cart_item.itemId] = {}
-        cart_data[cart_item.itemId][cart_item.size] = cart_item.quantity
+    # Bước 2: Kiểm tra sản phẩm / size của các dòng còn số lượng > 0 (xóa dòng thì không cần)
+    item_ids = {item_id for (item_id, _), (_, quantity) in lines.items() if quantity > 0}
+    if item_ids:
+        products_collection = await get_collection("products")
+        products = {
+            str(product["_id"]): product
+            async for product in products_collection.find(
+                {"_id": {"$in": [ObjectId(item_id) for item_id in item_ids]}, **PURCHASABLE_FILTER},
+                {"sizes": 1}
+            )
+        }
+        for (item_id, size), (_, quantity) in lines.items():
+            if quantity <= 0:
+                continue
+            product = products.get(item_id)
+            if not product:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Không tìm thấy sản phẩm"
+                )
+            if size not in product.get("sizes", []):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Kích cỡ không hợp lệ"
+                )
     
-    # Update user's cart in database
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"cartData": cart_data, "updatedAt": datetime.utcnow()}}
-    )
+    # Bước 3: 1 update duy nhất cho cả batch
+    cart_data = await cart_store.apply_operations(user["_id"], lines)
     
     return {
         "success": True,
-        "message": "Cập nhật giỏ hàng thành công"
+        "message": "Cập nhật giỏ hàng thành công",
+        "cartData": cart_data
     }
 
 @router.get("/get")
@@ -114,18 +116,34 @@ async def get_cart(request: Request, user: dict = Depends(auth_user)):
     """Get user's cart"""
     return {
         "success": True,
-        "cartData": user.get("cartData", {})
+        "cartData": await cart_store.get_cart(user["_id"])
+    }
+
+@router.get("/priced")
+async def get_priced_cart(request: Request, response: Response, user: dict = Depends(auth_user)):
+    """
+    Giỏ hàng đã tính giá: từng dòng (sản phẩm, thành tiền, trạng thái tồn kho / ngừng bán),
+    tổng tiền, phí vận chuyển + thuế theo settings hiện hành và quoteHash
+    - quoteHash gửi kèm khi đặt hàng → checkout dùng lại quote, không tính giá lại
+    - ETag = quoteHash: If-None-Match khớp → 304
+    """
+    priced = await price_cart(user["_id"])
+    
+    etag = f'"{priced["quoteHash"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    
+    return {
+        "success": True,
+        **priced
     }
 
 @router.delete("/clear")
 async def clear_cart(request: Request, user: dict = Depends(auth_user)):
     """Clear user's cart"""
-    users_collection = await get_collection("users")
-    
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"cartData": {}, "updatedAt": datetime.utcnow()}}
-    )
+    await cart_store.clear_cart(user["_id"])
     
     return {
         "success": True,
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from app.models.category import CategoryCreate, CategoryUpdate
 from app.config.database import get_collection
 from app.middleware.auth_admin import auth_staff
 from app.config.cloudinary import upload_image
+from app.utils.http_cache import conditional_get
+from app.utils.versioning import bump_version
 from bson import ObjectId
 from datetime import datetime
 from typing import Optional
@@ -10,8 +12,13 @@ from typing import Optional
 router = APIRouter()
 
 @router.get("/list", response_model=dict)
-async def get_all_categories():
+async def get_all_categories(request: Request, response: Response):
     """Get all active categories"""
+    # ETag theo version của categories → client đã có bản mới nhất thì trả 304
+    not_modified = await conditional_get(request, response, ["categories"])
+    if not_modified:
+        return not_modified
+    
     categories_collection = await get_collection("categories")
     
     # Query categories có inStock=True (database dùng inStock thay vì isActive)
@@ -112,6 +119,9 @@ async def add_category(
     
     result = await categories_collection.insert_one(category_doc)
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("categories")
+    
     return {
         "success": True,
         "message": "Thêm danh mục thành công",
@@ -159,6 +169,9 @@ async def update_category(
         {"$set": update_data}
     )
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("categories")
+    
     return {
         "success": True,
         "message": "Cập nhật danh mục thành công"
@@ -181,6 +194,9 @@ async def delete_category(category_id: str, staff: dict = Depends(auth_staff)):
             detail="Không tìm thấy danh mục"
         )
     
+    # Đổi version → ETag của endpoint public đổi theo
+    await bump_version("categories")
+    
     return {
         "success": True,
         "message": "Xóa danh mục thành công"
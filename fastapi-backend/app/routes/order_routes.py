@@ -1,113 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import RedirectResponse
-from app.models.order import OrderCreate, OrderStatusUpdate, OrderUpdate
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Header, Query
+from fastapi.responses import RedirectResponse, StreamingResponse
+from app.models.order import OrderCreate, OrderStatusUpdate, OrderUpdate, OrderBulkStatusUpdate, QuoteRequest
+from app.models.order import ORDER_LIST_VIEWS, ORDER_SORT, ORDER_SUMMARY_PROJECTION
 from app.config.database import get_collection
 from app.middleware.auth_user import auth_user
 from app.middleware.auth_admin import auth_staff
 from app.config.settings import settings
 from app.utils.vnpay_helper import create_payment_url, verify_payment_signature, get_client_ip
+from app.utils.pricing import build_quote, checkout_quote
+from app.utils import cart_store
+from app.utils.inventory import reserve_stock, release_stock
+from app.utils.stock_holds import confirm_order_payment, hold_expires_at, release_order_stock
+from app.utils.idempotency import run_idempotent
+from app.utils.pagination import apply_cursor, encode_cursor
+from app.utils.order_export import EXPORT_FORMATS, stream_orders_export
+from app.utils.order_transitions import bulk_transition_orders
+from app.utils.stripe_gateway import PaymentGatewayUnavailable, create_checkout_session, retrieve_checkout_session
+from app.utils.stripe_gateway import session_expires_at
+from app.utils.stripe_gateway import WEBHOOK_ERRORS, construct_webhook_event
+from app.utils.stripe_events import HANDLED_EVENT_TYPES, process_event, record_event
+from app.utils.vnpay_payments import apply_payment_result, ipn_response, is_successful_payment
+from app.utils.discount_scheduler import to_utc_naive
 from bson import ObjectId
 from datetime import datetime
-import stripe
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from typing import Optional
 
 router = APIRouter()
 
-# Helper function to update product quantity
-async def update_product_quantity(product_id: str, quantity_change: int):
-    """
-    Update product quantity in database.
-    
-    Args:
-        product_id: Product ID to update
-        quantity_change: Amount to change (negative for decrease, positive for increase)
-    
-    Returns:
-        Updated product document or None if not found
-    """
-    products_collection = await get_collection("products")
-    
-    # Use atomic $inc operation to safely update quantity
-    result = await products_collection.find_one_and_update(
-        {"_id": ObjectId(product_id)},
-        {
-            "$inc": {"quantity": quantity_change},
-            "$set": {"updatedAt": datetime.utcnow()}
-        },
-        return_document=True
+@router.post("/cod", response_model=dict)
+async def place_cod_order(
+    order_data: OrderCreate,
+    request: Request,
+    user: dict = Depends(auth_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Place order with Cash on Delivery (Idempotency-Key: retry / double-click trả lại đúng kết quả lần đầu)"""
+    return await run_idempotent(
+        idempotency_key,
+        scope=f"order:cod:{user['_id']}",
+        payload=order_data.model_dump(),
+        handler=lambda: _create_cod_order(order_data, request, user)
     )
-    
-    return result
 
-@router.post("/cod", response_model=dict)
-async def place_cod_order(order_data: OrderCreate, request: Request, user: dict = Depends(auth_user)):
-    """Place order with Cash on Delivery"""
-    products_collection = await get_collection("products")
+async def _create_cod_order(order_data: OrderCreate, request: Request, user: dict) -> dict:
     orders_collection = await get_collection("orders")
-    users_collection = await get_collection("users")
     
-    # Get product details and calculate total
-    order_items = []
-    total_amount = 0
+    # Tính giá + snapshot sản phẩm (quoteHash còn hiệu lực → dùng lại, không thì 1 query cho cả giỏ)
+    quote = await checkout_quote(user["_id"], order_data.items, order_data.quoteHash)
     
-    for item in order_data.items:
-        product = await products_collection.find_one({"_id": ObjectId(item.product), "isActive": True})
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Sản phẩm {item.product} không tồn tại"
-            )
-        
-        # Kiểm tra số lượng tồn kho
-        if product.get("quantity", 0) < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Sản phẩm '{product['name']}' chỉ còn {product.get('quantity', 0)} sản phẩm trong kho"
-            )
-        
-        item_total = product["offerPrice"] * item.quantity
-        total_amount += item_total
-        
-        order_items.append({
-            "product": {
-                "_id": str(product["_id"]),
-                "name": product["name"],
-                "image": product["image"],
-                "offerPrice": product["offerPrice"]
-            },
-            "quantity": item.quantity,
-            "size": item.size
-        })
-    
-    # Add delivery charges
-    total_amount += settings.DELIVERY_CHARGES
+    # Trừ kho có điều kiện TRƯỚC khi tạo đơn (không đủ hàng → 400, kho không bị âm)
+    reservations = await reserve_stock(order_data.items)
     
     # Create order
     order_doc = {
         "userId": str(user["_id"]),
-        "items": order_items,
-        "amount": total_amount,
+        "items": quote["items"],
+        "amount": quote["total"],
         "address": order_data.address.model_dump(),
+        "fees": quote["fees"],
         "status": "Order Placed",
         "paymentMethod": "COD",
         "isPaid": False,
         "paidAt": None,
+        "stockHeld": True,
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow()
     }
     
-    result = await orders_collection.insert_one(order_doc)
-    
-    # Trừ số lượng sản phẩm trong kho
-    for item in order_data.items:
-        await update_product_quantity(item.product, -item.quantity)
+    try:
+        result = await orders_collection.insert_one(order_doc)
+    except Exception:
+        # Không tạo được đơn → hoàn kho đã trừ
+        await release_stock(reservations)
+        raise
     
     # Clear user's cart
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"cartData": {}, "updatedAt": datetime.utcnow()}}
-    )
+    await cart_store.clear_cart(user["_id"])
     
     return {
         "success": True,
@@ -116,95 +84,100 @@ async def place_cod_order(order_data: OrderCreate, request: Request, user: dict
     }
 
 @router.post("/stripe", response_model=dict)
-async def place_stripe_order(order_data: OrderCreate, request: Request, user: dict = Depends(auth_user)):
-    """Place order with Stripe payment"""
-    products_collection = await get_collection("products")
+async def place_stripe_order(
+    order_data: OrderCreate,
+    request: Request,
+    user: dict = Depends(auth_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Place order with Stripe payment (Idempotency-Key: retry / double-click trả lại đúng kết quả lần đầu)"""
+    return await run_idempotent(
+        idempotency_key,
+        scope=f"order:stripe:{user['_id']}",
+        payload=order_data.model_dump(),
+        handler=lambda: _create_stripe_order(order_data, request, user)
+    )
+
+async def _create_stripe_order(order_data: OrderCreate, request: Request, user: dict) -> dict:
     orders_collection = await get_collection("orders")
     
-    # Get product details and calculate total
-    order_items = []
-    total_amount = 0
-    line_items = []
+    # Tính giá + snapshot sản phẩm (quoteHash còn hiệu lực → dùng lại, không thì 1 query cho cả giỏ)
+    quote = await checkout_quote(user["_id"], order_data.items, order_data.quoteHash)
     
-    for item in order_data.items:
-        product = await products_collection.find_one({"_id": ObjectId(item.product), "isActive": True})
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product {item.product} not found"
-            )
-        
-        # Kiểm tra số lượng tồn kho
-        if product.get("quantity", 0) < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Sản phẩm '{product['name']}' chỉ còn {product.get('quantity', 0)} sản phẩm trong kho"
-            )
-        
-        item_total = product["offerPrice"] * item.quantity
-        total_amount += item_total
-        
-        order_items.append({
-            "product": {
-                "_id": str(product["_id"]),
-                "name": product["name"],
-                "image": product["image"],
-                "offerPrice": product["offerPrice"]
-            },
-            "quantity": item.quantity,
-            "size": item.size
-        })
-        
-        # Add to Stripe line items
-        line_items.append({
+    # Stripe line items: từng sản phẩm + phí vận chuyển + thuế (tổng = amount của order)
+    line_items = [
+        {
             "price_data": {
                 "currency": "usd",
                 "product_data": {
-                    "name": product["name"],
+                    "name": item["product"]["name"],
                 },
-                "unit_amount": int(product["offerPrice"] * 100),  # Convert to cents
+                "unit_amount": int(item["product"]["offerPrice"] * 100),  # Convert to cents
             },
-            "quantity": item.quantity,
-        })
-    
-    # Add delivery charges
-    total_amount += settings.DELIVERY_CHARGES
+            "quantity": item["quantity"],
+        }
+        for item in quote["items"]
+    ]
     line_items.append({
         "price_data": {
             "currency": "usd",
             "product_data": {
                 "name": "Delivery Charges",
             },
-            "unit_amount": int(settings.DELIVERY_CHARGES * 100),
+            "unit_amount": int(quote["shippingFee"] * 100),
         },
         "quantity": 1,
     })
+    if quote["tax"] > 0:
+        line_items.append({
+            "price_data": {
+                "currency": "usd",
+                "product_data": {
+                    "name": "Tax",
+                },
+                "unit_amount": int(quote["tax"] * 100),
+            },
+            "quantity": 1,
+        })
+    
+    # Giữ kho ngay lúc tạo đơn (hết STOCK_HOLD_MINUTES chưa thanh toán → reaper hủy đơn, hoàn kho)
+    reservations = await reserve_stock(order_data.items)
     
     # Create order (pending payment)
     order_doc = {
         "userId": str(user["_id"]),
-        "items": order_items,
-        "amount": total_amount,
+        "items": quote["items"],
+        "amount": quote["total"],
         "address": order_data.address.model_dump(),
+        "fees": quote["fees"],
         "status": "Pending Payment",
         "paymentMethod": "Stripe",
         "isPaid": False,
         "paidAt": None,
+        "stockHeld": True,
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow()
     }
     
-    result = await orders_collection.insert_one(order_doc)
+    try:
+        result = await orders_collection.insert_one(order_doc)
+    except Exception:
+        await release_stock(reservations)
+        raise
     order_id = str(result.inserted_id)
     
     # Create Stripe checkout session
     try:
-        session = stripe.checkout.Session.create(
+        # Gọi Stripe qua gateway (thread pool + timeout + retry); idempotency_key → retry không tạo session trùng
+        session = await create_checkout_session(
+            idempotency_key=f"checkout-session-{order_id}",
             payment_method_types=["card"],
             line_items=line_items,
             mode="payment",
             success_url=f"{settings.FRONTEND_URL}/my-orders?success=true&orderId={order_id}",
             cancel_url=f"{settings.FRONTEND_URL}/cart?cancelled=true",
+            # Session hết hạn cùng lúc với hạn giữ kho → khách không thanh toán được sau khi reaper đã hoàn kho
+            expires_at=session_expires_at(hold_expires_at(order_doc["createdAt"])),
             metadata={
                 "orderId": order_id,
                 "userId": str(user["_id"])
@@ -223,106 +196,93 @@ async def place_stripe_order(order_data: OrderCreate, request: Request, user: di
             "sessionId": session.id
         }
     except Exception as e:
-        # Delete order if Stripe session creation fails
+        # Delete order if Stripe session creation fails (và trả lại kho đã giữ)
         await orders_collection.delete_one({"_id": ObjectId(order_id)})
+        await release_stock(reservations)
+        if isinstance(e, PaymentGatewayUnavailable):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Cổng thanh toán Stripe tạm thời không khả dụng, vui lòng thử lại sau"
+            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Payment processing failed: {str(e)}"
         )
 
 @router.post("/vnpay", response_model=dict)
-async def place_vnpay_order(order_data: OrderCreate, request: Request, user: dict = Depends(auth_user)):
-    """Place order with VNPay payment"""
-    print("=" * 60)
-    print("🔍 VNPAY ORDER ENDPOINT CALLED")
-    print(f"   User: {user.get('email')}")
-    print(f"   Items count: {len(order_data.items)}")
-    print("=" * 60)
-    
-    products_collection = await get_collection("products")
+async def place_vnpay_order(
+    order_data: OrderCreate,
+    request: Request,
+    user: dict = Depends(auth_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Place order with VNPay payment (Idempotency-Key: retry / double-click trả lại đúng kết quả lần đầu)"""
+    return await run_idempotent(
+        idempotency_key,
+        scope=f"order:vnpay:{user['_id']}",
+        payload=order_data.model_dump(),
+        handler=lambda: _create_vnpay_order(order_data, request, user)
+    )
+
+async def _create_vnpay_order(order_data: OrderCreate, request: Request, user: dict) -> dict:
     orders_collection = await get_collection("orders")
     
     try:
-        # Get product details and calculate total
-        order_items = []
-        total_amount = 0
-        
-        for item in order_data.items:
-            product = await products_collection.find_one({"_id": ObjectId(item.product), "isActive": True})
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Product {item.product} not found"
-                )
-            
-            # Kiểm tra số lượng tồn kho
-            if product.get("quantity", 0) < item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Sản phẩm '{product['name']}' chỉ còn {product.get('quantity', 0)} sản phẩm trong kho"
-                )
-            
-            item_total = product["offerPrice"] * item.quantity
-            total_amount += item_total
-            
-            order_items.append({
-                "product": {
-                    "_id": str(product["_id"]),
-                    "name": product["name"],
-                    "image": product["image"],
-                    "offerPrice": product["offerPrice"]
-                },
-                "quantity": item.quantity,
-                "size": item.size
-            })
-        
-        # Add fees from snapshot
-        total_amount += order_data.fees.shippingFee
-        total_amount += total_amount * order_data.fees.taxRate
+        # Tính giá + snapshot sản phẩm (quoteHash còn hiệu lực → dùng lại, không thì 1 query cho cả giỏ)
+        quote = await checkout_quote(user["_id"], order_data.items, order_data.quoteHash)
+        total_amount = quote["total"]
         
         # Giá đã là VND, không cần convert
         # VNPay yêu cầu số tiền >= 5,000 VND
         total_amount_vnd = int(total_amount)
         
-        print(f"💰 Total amount: {total_amount} VND")
-        print(f"💰 Total amount VND for VNPay: {total_amount_vnd} VND")
-        
         if total_amount_vnd < 5000:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Số tiền giao dịch phải từ 5,000 VND trở lên (hiện tại: {total_amount_vnd} VND)"
             )
         
+        # Giữ kho ngay lúc tạo đơn (hết STOCK_HOLD_MINUTES chưa thanh toán → reaper hủy đơn, hoàn kho)
+        reservations = await reserve_stock(order_data.items)
+        
         # Create order (pending payment)
         order_doc = {
             "userId": str(user["_id"]),
-            "items": order_items,
+            "items": quote["items"],
             "amount": total_amount,
             "address": order_data.address.model_dump(),
-            "fees": order_data.fees.model_dump(),
+            "fees": quote["fees"],
             "status": "Pending Payment",
             "paymentMethod": "VNPay",
             "isPaid": False,
             "paidAt": None,
+            "stockHeld": True,
             "vnpayTransactionNo": None,
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         }
         
-        result = await orders_collection.insert_one(order_doc)
-        order_id = str(result.inserted_id)
-        
-        # Get client IP
-        ip_addr = get_client_ip(request)
-        
-        # Create VNPay payment URL
-        order_info = f"Thanh toan don hang #{order_id}"
-        payment_url = create_payment_url(
-            order_id=order_id,
-            amount=total_amount_vnd,
-            order_info=order_info,
-            ip_addr=ip_addr
-        )
+        try:
+            result = await orders_collection.insert_one(order_doc)
+            order_id = str(result.inserted_id)
+            
+            # Get client IP
+            ip_addr = get_client_ip(request)
+            
+            # Create VNPay payment URL
+            order_info = f"Thanh toan don hang #{order_id}"
+            payment_url = create_payment_url(
+                order_id=order_id,
+                amount=total_amount_vnd,
+                order_info=order_info,
+                ip_addr=ip_addr
+            )
+        except Exception:
+            # Không tạo được đơn / link thanh toán → xóa đơn (nếu có) và trả lại kho đã giữ
+            if "_id" in order_doc:
+                await orders_collection.delete_one({"_id": order_doc["_id"]})
+            await release_stock(reservations)
+            raise
         
         return {
             "success": True,
@@ -342,34 +302,214 @@ async def place_vnpay_order(order_data: OrderCreate, request: Request, user: dic
             detail=f"Payment processing failed: {str(e)}"
         )
 
-@router.post("/userorders", response_model=dict)
-async def get_user_orders(request: Request, user: dict = Depends(auth_user)):
-    """Get all orders for logged-in user"""
-    orders_collection = await get_collection("orders")
+@router.post("/quote", response_model=dict)
+async def quote_order(quote_request: QuoteRequest):
+    """Price a cart exactly as checkout will (no order is created)"""
+    quote = await build_quote(quote_request.items)
     
-    orders = await orders_collection.find({"userId": str(user["_id"])}).sort("createdAt", -1).to_list(length=None)
+    return {
+        "success": True,
+        "items": quote["items"],
+        "subtotal": quote["subtotal"],
+        "shippingFee": quote["shippingFee"],
+        "taxRate": quote["taxRate"],
+        "tax": quote["tax"],
+        "total": quote["total"]
+    }
+
+def build_order_filter(
+    query: dict,
+    order_status: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    is_paid: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> dict:
+    """Thêm các bộ lọc danh sách đơn hàng vào query (field nào None thì bỏ qua)"""
+    if order_status:
+        query["status"] = order_status
+    if payment_method:
+        query["paymentMethod"] = payment_method
+    if is_paid is not None:
+        query["isPaid"] = is_paid
+    if date_from or date_to:
+        query["createdAt"] = {}
+        if date_from:
+            query["createdAt"]["$gte"] = to_utc_naive(date_from)
+        if date_to:
+            query["createdAt"]["$lt"] = to_utc_naive(date_to)
+    return query
+
+async def find_orders_page(
+    query: dict,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    view: Optional[str] = None
+) -> dict:
+    """
+    Query danh sách đơn hàng (mới nhất trước) với keyset pagination trên createdAt/_id
+    
+    Args:
+        query: Filter MongoDB
+        limit: Số đơn mỗi trang (None = trả về tất cả như trước)
+        cursor: Cursor của trang trước (nextCursor)
+        view: "summary" | "full" (mặc định: full khi không có limit, summary khi có limit)
+        
+    Returns:
+        dict: {"orders", "nextCursor", "hasMore"}
+    """
+    view = view or ("full" if limit is None else "summary")
+    if view not in ORDER_LIST_VIEWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="view phải là 'summary' hoặc 'full'"
+        )
+    
+    orders_collection = await get_collection("orders")
+    projection = ORDER_SUMMARY_PROJECTION if view == "summary" else None
+    find_cursor = orders_collection.find(apply_cursor(query, ORDER_SORT, cursor), projection).sort(ORDER_SORT)
+    
+    # Không có limit → giữ hành vi cũ (trả về toàn bộ)
+    if limit is None:
+        orders = await find_cursor.to_list(length=None)
+        has_more = False
+    else:
+        # Lấy dư 1 document để biết còn trang sau không
+        orders = await find_cursor.limit(limit + 1).to_list(length=limit + 1)
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+    
+    # Cursor phải tạo từ document gốc (trước khi đổi _id sang string)
+    next_cursor = encode_cursor(orders[-1], ORDER_SORT) if has_more else None
     
     for order in orders:
         order["_id"] = str(order["_id"])
     
+    return {
+        "orders": orders,
+        "nextCursor": next_cursor,
+        "hasMore": has_more
+    }
+
+async def find_order_detail(query: dict) -> dict:
+    """Lấy toàn bộ document của 1 đơn hàng (404 nếu không có)"""
+    orders_collection = await get_collection("orders")
+    order = await orders_collection.find_one(query)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Không tìm thấy đơn hàng"
+        )
+    order["_id"] = str(order["_id"])
+    return order
+
+@router.post("/userorders", response_model=dict)
+async def get_user_orders(
+    request: Request,
+    user: dict = Depends(auth_user),
+    limit: Optional[int] = Query(None, ge=1, le=100),  # ?limit=10 → Số đơn mỗi trang
+    cursor: Optional[str] = None,                      # ?cursor=... → nextCursor của trang trước
+    status_filter: Optional[str] = Query(None, alias="status"),  # ?status=Delivered
+    view: Optional[str] = None                         # ?view=summary|full
+):
+    """Get orders for logged-in user (keyset pagination khi có limit)"""
+    query = build_order_filter({"userId": str(user["_id"])}, order_status=status_filter)
+    page = await find_orders_page(query, limit=limit, cursor=cursor, view=view)
+    
     return {
         "success": True,
-        "orders": orders
+        **page
+    }
+
+@router.get("/detail/{order_id}", response_model=dict)
+async def get_user_order_detail(order_id: str, user: dict = Depends(auth_user)):
+    """Get full order document (chỉ đơn của chính user)"""
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Không tìm thấy đơn hàng"
+        )
+    order = await find_order_detail({"_id": ObjectId(order_id), "userId": str(user["_id"])})
+    
+    return {
+        "success": True,
+        "order": order
     }
 
 @router.post("/list", response_model=dict)
-async def get_all_orders(staff: dict = Depends(auth_staff)):
-    """Get all orders (Staff/Admin only)"""
-    orders_collection = await get_collection("orders")
+async def get_all_orders(
+    staff: dict = Depends(auth_staff),
+    limit: Optional[int] = Query(None, ge=1, le=100),  # ?limit=20 → Số đơn mỗi trang
+    cursor: Optional[str] = None,                      # ?cursor=... → nextCursor của trang trước
+    status_filter: Optional[str] = Query(None, alias="status"),  # ?status=Processing
+    paymentMethod: Optional[str] = None,               # ?paymentMethod=COD | Stripe | VNPay
+    isPaid: Optional[bool] = None,                     # ?isPaid=true
+    dateFrom: Optional[datetime] = None,               # ?dateFrom=2025-01-01 → createdAt >= dateFrom
+    dateTo: Optional[datetime] = None,                 # ?dateTo=2025-02-01 → createdAt < dateTo
+    view: Optional[str] = None                         # ?view=summary|full
+):
+    """Get orders (Staff/Admin only) - không có limit thì trả về tất cả như trước"""
+    query = build_order_filter(
+        {},
+        order_status=status_filter,
+        payment_method=paymentMethod,
+        is_paid=isPaid,
+        date_from=dateFrom,
+        date_to=dateTo
+    )
+    page = await find_orders_page(query, limit=limit, cursor=cursor, view=view)
     
-    orders = await orders_collection.find({}).sort("createdAt", -1).to_list(length=None)
+    return {
+        "success": True,
+        **page
+    }
+
+@router.get("/export")
+async def export_orders(
+    staff: dict = Depends(auth_staff),
+    format: str = "csv",                               # ?format=csv | ndjson
+    dateFrom: Optional[datetime] = None,               # ?dateFrom=2025-01-01 → createdAt >= dateFrom
+    dateTo: Optional[datetime] = None,                 # ?dateTo=2025-02-01 → createdAt < dateTo
+    status_filter: Optional[str] = Query(None, alias="status"),
+    paymentMethod: Optional[str] = None,
+    isPaid: Optional[bool] = None
+):
+    """Export orders (1 row / item) as streamed CSV or NDJSON (Staff/Admin only)"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format phải là 'csv' hoặc 'ndjson'"
+        )
     
-    for order in orders:
-        order["_id"] = str(order["_id"])
+    query = build_order_filter(
+        {},
+        order_status=status_filter,
+        payment_method=paymentMethod,
+        is_paid=isPaid,
+        date_from=dateFrom,
+        date_to=dateTo
+    )
+    filename = f"orders-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{format}"
+    
+    return StreamingResponse(
+        stream_orders_export(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/admin/detail/{order_id}", response_model=dict)
+async def get_order_detail(order_id: str, staff: dict = Depends(auth_staff)):
+    """Get full order document (Staff/Admin only)"""
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Không tìm thấy đơn hàng"
+        )
+    order = await find_order_detail({"_id": ObjectId(order_id)})
     
     return {
         "success": True,
-        "orders": orders
+        "order": order
     }
 
 @router.post("/status", response_model=dict)
@@ -385,22 +525,43 @@ async def update_order_status(status_update: OrderStatusUpdate, staff: dict = De
             detail="Trạng thái không hợp lệ"
         )
     
-    result = await orders_collection.update_one(
+    order = await orders_collection.find_one_and_update(
         {"_id": ObjectId(status_update.orderId)},
         {"$set": {"status": status_update.status, "updatedAt": datetime.utcnow()}}
     )
     
-    if result.matched_count == 0:
+    if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy đơn hàng"
         )
     
+    # Hủy đơn → hoàn kho (đúng 1 lần, kể cả đơn đang giữ kho chờ thanh toán)
+    if status_update.status == "Cancelled":
+        await release_order_stock(order)
+    
     return {
         "success": True,
         "message": "Cập nhật trạng thái đơn hàng thành công"
     }
 
+@router.post("/bulk-status", response_model=dict)
+async def bulk_update_order_status(bulk_update: OrderBulkStatusUpdate, staff: dict = Depends(auth_staff)):
+    """Update status of many orders at once (Staff/Admin only)"""
+    if len(bulk_update.orderIds) > settings.ORDER_BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {settings.ORDER_BULK_MAX_IDS} đơn hàng mỗi lần"
+        )
+    
+    result = await bulk_transition_orders(bulk_update.orderIds, bulk_update.status)
+    
+    return {
+        "success": True,
+        "message": f"Đã cập nhật {result['updated']}/{len(result['results'])} đơn hàng",
+        **result
+    }
+
 @router.post("/update", response_model=dict)
 async def update_order(order_update: OrderUpdate, staff: dict = Depends(auth_staff)):
     """Update order details (Staff/Admin only)"""
@@ -426,13 +587,10 @@ async def update_order(order_update: OrderUpdate, staff: dict = Depends(auth_sta
                 detail="Trạng thái không hợp lệ"
             )
         
-        # Hoàn lại quantity nếu đổi sang Cancelled từ trạng thái khác
-        old_status = current_order.get("status")
-        if order_update.status == "Cancelled" and old_status != "Cancelled":
-            # Hoàn lại số lượng sản phẩm vào kho
-            for item in current_order["items"]:
-                product_id = item["product"]["_id"]
-                await update_product_quantity(product_id, item["quantity"])
+        # Hoàn lại quantity nếu đổi sang Cancelled
+        # release_order_stock chỉ hoàn kho nếu đơn đang giữ kho và chưa được hoàn (stockHeld)
+        if order_update.status == "Cancelled":
+            await release_order_stock(current_order)
         
         update_data["status"] = order_update.status
     
@@ -455,44 +613,82 @@ async def update_order(order_update: OrderUpdate, staff: dict = Depends(auth_sta
         "message": "Cập nhật đơn hàng thành công"
     }
 
+@router.post("/stripe-webhook", response_model=dict)
+async def stripe_webhook(request: Request, background_tasks: BackgroundTasks):
+    """
+    Stripe webhook (checkout.session.*) - verify chữ ký, lưu event rồi trả 200 ngay,
+    xác nhận thanh toán / hủy đơn chạy nền sau khi trả response
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chưa cấu hình STRIPE_WEBHOOK_SECRET"
+        )
+    
+    # Bước 1: Verify chữ ký trên raw body (không gọi mạng)
+    payload = await request.body()
+    try:
+        event = construct_webhook_event(payload, request.headers.get("Stripe-Signature"))
+    except WEBHOOK_ERRORS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chữ ký webhook không hợp lệ"
+        )
+    
+    # Bước 2: Bỏ qua event không xử lý (vẫn trả 200 để Stripe không gửi lại)
+    if event["type"] not in HANDLED_EVENT_TYPES:
+        return {"received": True}
+    
+    # Bước 3: Lưu event (_id = event id) - Stripe gửi lại cùng event thì không xử lý lần 2
+    is_new = await record_event(event)
+    if is_new:
+        background_tasks.add_task(process_event, event["id"])
+    
+    return {
+        "received": True,
+        "duplicate": not is_new
+    }
+
 @router.post("/verify-stripe", response_model=dict)
 async def verify_stripe_payment(session_id: str, request: Request, user: dict = Depends(auth_user)):
     """Verify Stripe payment and update order"""
     orders_collection = await get_collection("orders")
-    users_collection = await get_collection("users")
+    
+    # Webhook đã xác nhận thanh toán → trả kết quả luôn, không gọi Stripe
+    paid_order = await orders_collection.find_one(
+        {"stripeSessionId": session_id, "userId": str(user["_id"]), "isPaid": True},
+        {"_id": 1}
+    )
+    if paid_order:
+        return {
+            "success": True,
+            "message": "Xác minh thanh toán thành công"
+        }
     
     try:
-        # Retrieve session from Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
+        # Webhook chưa tới → hỏi Stripe (fallback)
+        session = await retrieve_checkout_session(session_id)
         
         if session.payment_status == "paid":
             # Get order to retrieve items
             order = await orders_collection.find_one({"stripeSessionId": session_id})
             
-            if order:
-                # Trừ số lượng sản phẩm trong kho
-                for item in order["items"]:
-                    product_id = item["product"]["_id"]
-                    await update_product_quantity(product_id, -item["quantity"])
+            if not order:
+                return {
+                    "success": False,
+                    "message": "Không tìm thấy đơn hàng"
+                }
             
-            # Update order
-            result = await orders_collection.update_one(
-                {"stripeSessionId": session_id},
-                {
-                    "$set": {
-                        "isPaid": True,
-                        "paidAt": datetime.utcnow(),
-                        "status": "Order Placed",
-                        "updatedAt": datetime.utcnow()
-                    }
+            # Update order (kho đã được giữ lúc tạo đơn → không trừ kho lần 2)
+            outcome = await confirm_order_payment(order, {})
+            if outcome == "out_of_stock":
+                return {
+                    "success": False,
+                    "message": "Sản phẩm đã hết hàng sau khi hết thời gian giữ đơn, đơn hàng sẽ được hoàn tiền"
                 }
-            )
             
             # Clear cart
-            await users_collection.update_one(
-                {"_id": user["_id"]},
-                {"$set": {"cartData": {}, "updatedAt": datetime.utcnow()}}
-            )
+            await cart_store.clear_cart(user["_id"])
             
             return {
                 "success": True,
@@ -503,109 +699,57 @@ async def verify_stripe_payment(session_id: str, request: Request, user: dict =
                 "success": False,
                 "message": "Thanh toán chưa hoàn tất"
             }
+    except PaymentGatewayUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cổng thanh toán Stripe tạm thời không khả dụng, vui lòng thử lại sau"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Payment verification failed: {str(e)}"
         )
 
-@router.get("/vnpay-return")
-async def vnpay_return(request: Request):
-    """Handle VNPay payment callback"""
-    orders_collection = await get_collection("orders")
-    users_collection = await get_collection("users")
+@router.get("/vnpay-ipn")
+async def vnpay_ipn(request: Request):
+    """
+    VNPay IPN (server-to-server): xác nhận / hủy đơn theo kết quả giao dịch
+    Idempotent theo vnp_TxnRef, luôn trả HTTP 200 với RspCode cho VNPay
+    """
+    params = dict(request.query_params)
+    if not verify_payment_signature(params):
+        return ipn_response("97")
     
     try:
-        # Lấy tất cả query params từ VNPay
-        params = dict(request.query_params)
-        
-        # Verify signature từ VNPay
-        if not verify_payment_signature(params):
-            return RedirectResponse(
-                url=f"{settings.FRONTEND_URL}/cart?error=invalid_signature",
-                status_code=status.HTTP_303_SEE_OTHER
-            )
-        
-        # Lấy thông tin từ params
-        vnp_response_code = params.get('vnp_ResponseCode')
-        order_id = params.get('vnp_TxnRef')
-        vnp_transaction_no = params.get('vnp_TransactionNo')
-        vnp_amount = params.get('vnp_Amount')
-        
-        # Kiểm tra order tồn tại
-        order = await orders_collection.find_one({"_id": ObjectId(order_id)})
-        if not order:
-            return RedirectResponse(
-                url=f"{settings.FRONTEND_URL}/cart?error=order_not_found",
-                status_code=status.HTTP_303_SEE_OTHER
-            )
-        
-        # Kiểm tra ResponseCode
-        if vnp_response_code == '00':
-            # Thanh toán thành công
-            
-            # Kiểm tra duplicate callback (idempotency)
-            if order.get("isPaid"):
-                # Order đã được thanh toán rồi, chỉ redirect
-                return RedirectResponse(
-                    url=f"{settings.FRONTEND_URL}/my-orders?success=true&orderId={order_id}",
-                    status_code=status.HTTP_303_SEE_OTHER
-                )
-            
-            # Trừ số lượng sản phẩm trong kho
-            for item in order["items"]:
-                product_id = item["product"]["_id"]
-                await update_product_quantity(product_id, -item["quantity"])
-            
-            # Update order status
-            await orders_collection.update_one(
-                {"_id": ObjectId(order_id)},
-                {
-                    "$set": {
-                        "status": "Order Placed",
-                        "isPaid": True,
-                        "paidAt": datetime.utcnow(),
-                        "vnpayTransactionNo": vnp_transaction_no,
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Clear user's cart
-            user_id = order.get("userId")
-            if user_id:
-                await users_collection.update_one(
-                    {"_id": ObjectId(user_id)},
-                    {"$set": {"cartData": {}, "updatedAt": datetime.utcnow()}}
-                )
-            
-            # Redirect về My Orders với success message
-            return RedirectResponse(
-                url=f"{settings.FRONTEND_URL}/my-orders?success=true&orderId={order_id}",
-                status_code=status.HTTP_303_SEE_OTHER
-            )
-        else:
-            # Thanh toán thất bại
-            # Xóa order hoặc update status = Cancelled
-            await orders_collection.update_one(
-                {"_id": ObjectId(order_id)},
-                {
-                    "$set": {
-                        "status": "Cancelled",
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Redirect về Cart với error message
-            return RedirectResponse(
-                url=f"{settings.FRONTEND_URL}/cart?cancelled=true&code={vnp_response_code}",
-                status_code=status.HTTP_303_SEE_OTHER
-            )
-            
+        code, _ = await apply_payment_result(params)
     except Exception as e:
-        print(f"VNPay callback error: {str(e)}")
+        print(f"❌ VNPay IPN error ({params.get('vnp_TxnRef')}): {str(e)}")
+        code = "99"
+    return ipn_response(code)
+
+@router.get("/vnpay-return")
+async def vnpay_return(request: Request, background_tasks: BackgroundTasks):
+    """
+    Handle VNPay browser redirect: chỉ verify chữ ký rồi redirect ngay
+    Xác nhận đơn do IPN làm; ở đây chỉ chạy nền cùng logic đó làm dự phòng (IPN không tới được
+    localhost khi dev) - apply_payment_result idempotent nên chạy cả 2 nơi cũng không xử lý lần 2
+    """
+    params = dict(request.query_params)
+    if not verify_payment_signature(params):
         return RedirectResponse(
-            url=f"{settings.FRONTEND_URL}/cart?error=processing_failed",
+            url=f"{settings.FRONTEND_URL}/cart?error=invalid_signature",
             status_code=status.HTTP_303_SEE_OTHER
         )
+    
+    background_tasks.add_task(apply_payment_result, params)
+    
+    order_id = params.get('vnp_TxnRef')
+    if is_successful_payment(params):
+        return RedirectResponse(
+            url=f"{settings.FRONTEND_URL}/my-orders?success=true&orderId={order_id}",
+            status_code=status.HTTP_303_SEE_OTHER
+        )
+    return RedirectResponse(
+        url=f"{settings.FRONTEND_URL}/cart?cancelled=true&code={params.get('vnp_ResponseCode')}",
+        status_code=status.HTTP_303_SEE_OTHER
+    )
@@ -1,16 +1,23 @@
 # ===== IMPORT CÁC THƯ VIỆN VÀ MODULE CẦN THIẾT =====
 
 # Import các class và function từ FastAPI
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
 # - APIRouter: Tạo router để định nghĩa các endpoint API
 # - Depends: Dependency injection (tiêm phụ thuộc) để xác thực user
 # - HTTPException: Ném lỗi HTTP khi có vấn đề
 # - status: Các mã trạng thái HTTP chuẩn (200, 404, 401,...)
 # - UploadFile, File, Form: Xử lý upload file và form data
+# - Query: Validate tham số query string (limit, cursor...)
+# - Request, Response: Đọc/gắn header cache (ETag, Last-Modified)
 
 # Import models sản phẩm (không sử dụng trong code này nhưng có sẵn để mở rộng)
 from app.models.product import ProductCreate, ProductResponse, ProductUpdate
 
+# Import projection "card" và các kiểu sắp xếp danh sách sản phẩm
+from app.models.product import PRODUCT_CARD_PROJECTION, PRODUCT_SORT_OPTIONS
+from app.models.product import PRODUCT_CARD_PIPELINE_PROJECTION, PRICE_HISTOGRAM_BOUNDARIES
+from app.models.product import offer_price_expression
+
 # Import hàm kết nối MongoDB
 from app.config.database import get_collection
 
@@ -18,7 +25,27 @@ from app.config.database import get_collection
 from app.middleware.auth_admin import auth_staff
 
 # Import hàm upload ảnh lên Cloudinary
-from app.config.cloudinary import upload_image
+from app.config.cloudinary import upload_images
+
+# Import helper keyset pagination
+from app.utils.pagination import apply_cursor, encode_cursor, encode_offset_cursor, decode_offset_cursor
+from app.utils.pagination import decode_cursor, keyset_filter
+
+# Import search engine (inverted index in-process)
+from app.utils.search import product_search
+
+# Import catalog snapshot cache và bộ đếm version
+from app.utils.catalog_cache import catalog_cache
+from app.utils.versioning import bump_version
+
+# Import helper chuẩn hóa ngày của lịch giảm giá
+from app.utils.discount_scheduler import to_utc_naive, window_filter
+
+# Import helper conditional GET (ETag / 304)
+from app.utils.http_cache import conditional_get
+
+# Import settings (bật/tắt catalog cache)
+from app.config.settings import settings
 
 # Import ObjectId của MongoDB để làm việc với _id
 from bson import ObjectId
@@ -27,7 +54,7 @@ from bson import ObjectId
 from datetime import datetime
 
 # Import kiểu dữ liệu List và Optional
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # Import Pydantic BaseModel để define request schemas
 from pydantic import BaseModel, Field
@@ -82,18 +109,171 @@ def calculate_offer_price(price: float, discount_percent: float) -> float:
     
     return offer_price
 
+# ===== HELPER FUNCTION: KIỂM TRA THAM SỐ SORT / VIEW =====
+def check_list_options(sort: str, view: str) -> None:
+    """Raise HTTP 400 nếu sort hoặc view không hợp lệ"""
+    if sort not in PRODUCT_SORT_OPTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Kiểu sắp xếp không hợp lệ. Hỗ trợ: {', '.join(PRODUCT_SORT_OPTIONS)}"
+        )
+    if view not in ("full", "card"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="view phải là 'full' hoặc 'card'"
+        )
+
+# ===== HELPER FUNCTION: QUERY DANH SÁCH SẢN PHẨM (KEYSET PAGINATION) =====
+async def find_products_page(
+    query: dict,
+    sort: str = "newest",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    view: str = "full"
+) -> dict:
+    """
+    Query danh sách sản phẩm với sort ổn định và keyset pagination.
+    
+    Args:
+        query: Filter MongoDB
+        sort: Tên kiểu sắp xếp trong PRODUCT_SORT_OPTIONS
+        limit: Số sản phẩm mỗi trang (None = trả về tất cả như trước)
+        cursor: Cursor của trang trước (nextCursor)
+        view: "full" (toàn bộ document) hoặc "card" (chỉ field grid cần)
+        
+    Returns:
+        dict: {"products", "nextCursor", "hasMore"}
+    """
+    check_list_options(sort, view)
+    
+    products_collection = await get_collection("products")
+    sort_spec = PRODUCT_SORT_OPTIONS[sort]
+    projection = PRODUCT_CARD_PROJECTION if view == "card" else None
+    
+    # Gộp điều kiện "sau cursor" vào query
+    query = apply_cursor(query, sort_spec, cursor)
+    find_cursor = products_collection.find(query, projection).sort(sort_spec)
+    
+    # Không có limit → giữ hành vi cũ (trả về toàn bộ)
+    if limit is None:
+        products = await find_cursor.to_list(length=None)
+        has_more = False
+    else:
+        # Lấy dư 1 document để biết còn trang sau không
+        products = await find_cursor.limit(limit + 1).to_list(length=limit + 1)
+        has_more = len(products) > limit
+        products = products[:limit]
+    
+    # Cursor phải tạo từ document gốc (trước khi đổi _id sang string)
+    next_cursor = encode_cursor(products[-1], sort_spec) if has_more else None
+    
+    for product in products:
+        product["_id"] = str(product["_id"])
+    
+    return {
+        "products": products,
+        "nextCursor": next_cursor,
+        "hasMore": has_more
+    }
+
+# ===== HELPER FUNCTION: TÌM KIẾM SẢN PHẨM =====
+async def search_products_page(
+    search: str,
+    category: Optional[str] = None,
+    popular: Optional[bool] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    view: str = "full"
+) -> dict:
+    """
+    Tìm kiếm sản phẩm qua inverted index, xếp theo relevance + độ phổ biến.
+    
+    Returns:
+        dict: {"products", "total", "nextCursor", "hasMore"}
+    """
+    check_list_options("newest", view)
+    
+    # Bước 1: Đồng bộ index với các thay đổi mới (tối đa 1 lần mỗi vài giây)
+    await product_search.ensure_fresh()
+    
+    # Bước 2: Lấy danh sách hit đã xếp hạng, cắt theo trang
+    # id không còn trong DB (index của worker chưa kịp đồng bộ) → bỏ khỏi index và cắt trang lại,
+    # để total / hasMore / cursor không đếm sản phẩm đã mất
+    offset = decode_offset_cursor(cursor)
+    while True:
+        hits = product_search.search(search, category=category, popular=popular)
+        end = offset + limit if limit is not None else len(hits)
+        page_ids = [pid for pid, _ in hits[offset:end]]
+        
+        # Bước 3: Lấy document của trang hiện tại
+        by_id = await hydrate_search_page(page_ids, view)
+        missing = [pid for pid in page_ids if pid not in by_id]
+        if not missing:
+            break
+        for pid in missing:
+            product_search.remove(pid)
+    
+    has_more = end < len(hits)
+    return {
+        "products": [by_id[pid] for pid in page_ids],
+        "total": len(hits),
+        "nextCursor": encode_offset_cursor(end) if has_more else None,
+        "hasMore": has_more
+    }
+
+
+async def hydrate_search_page(page_ids: List[str], view: str) -> Dict[str, dict]:
+    """
+    Document của các sản phẩm trong trang tìm kiếm: {product_id: document}
+    Đọc từ catalog snapshot; id snapshot chưa có (sản phẩm mới) hoặc cache tắt → 1 query $in
+    Id không có trong kết quả = sản phẩm không còn inStock
+    """
+    by_id: Dict[str, dict] = {}
+    if page_ids and settings.CATALOG_CACHE_ENABLED:
+        snapshot = await catalog_cache.get_snapshot()
+        by_id = {product["_id"]: product for product in snapshot.hydrate(page_ids, view=view)}
+    
+    remaining = [pid for pid in page_ids if pid not in by_id and ObjectId.is_valid(pid)]
+    if remaining:
+        products_collection = await get_collection("products")
+        projection = PRODUCT_CARD_PROJECTION if view == "card" else None
+        async for doc in products_collection.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in remaining]}, "inStock": True},
+            projection
+        ):
+            doc["_id"] = str(doc["_id"])
+            by_id[doc["_id"]] = doc
+    return by_id
+
 # ===== ENDPOINT 1: LẤY DANH SÁCH TẤT CẢ SẢN PHẨM =====
 # Route: GET /api/product/list
 # Công khai (không cần đăng nhập)
 @router.get("/list", response_model=dict)  # Định nghĩa endpoint GET, trả về dictionary
 async def get_all_products(
+    request: Request,
+    response: Response,
     # Các tham số query string (tùy chọn)
     category: Optional[str] = None,      # ?category=Men → Lọc theo danh mục
     popular: Optional[bool] = None,      # ?popular=true → Lọc sản phẩm phổ biến
-    search: Optional[str] = None         # ?search=shirt → Tìm kiếm theo tên/mô tả
+    search: Optional[str] = None,        # ?search=shirt → Tìm kiếm theo tên/mô tả
+    sort: str = "newest",                # ?sort=price_asc → newest | price_asc | price_desc | best_selling
+    limit: Optional[int] = Query(None, ge=1, le=100),  # ?limit=24 → Số sản phẩm mỗi trang
+    cursor: Optional[str] = None,        # ?cursor=... → nextCursor của trang trước
+    view: str = "full"                   # ?view=card → Chỉ trả về field grid cần
 ):
     """Get all active products with optional filters"""
     
+    # Bước 0: Client đã có bản mới nhất (If-None-Match khớp ETag) → 304, không query gì
+    # Đặt hàng đổi tồn kho / soldCount mà không bump version "products"
+    # → ETag đổi sau mỗi CATALOG_MAX_AGE_SECONDS (cùng chu kỳ build lại snapshot)
+    not_modified = await conditional_get(
+        request, response, ["products"],
+        variant=str(request.query_params),
+        refresh_seconds=settings.CATALOG_MAX_AGE_SECONDS
+    )
+    if not_modified:
+        return not_modified
+    
     # Bước 1: Kết nối đến collection "products" trong MongoDB
     products_collection = await get_collection("products")
     
@@ -109,30 +289,250 @@ async def get_all_products(
     if popular is not None:  # Kiểm tra is not None vì popular có thể là False
         query["popular"] = popular  # Ví dụ: {"isActive": True, "popular": True}
     
-    # Bước 5: Thêm filter tìm kiếm (nếu có)
+    # Bước 5: Tìm kiếm (nếu có) qua inverted index
+    # Bỏ dấu tiếng Việt, xếp theo relevance + độ phổ biến (không dùng $regex quét toàn collection)
     if search:
-        # Sử dụng $or để tìm trong cả name VÀ description
-        # $regex: tìm kiếm theo pattern (giống LIKE trong SQL)
-        # $options: "i" → không phân biệt hoa thường (case-insensitive)
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},        # Tìm trong tên
-            {"description": {"$regex": search, "$options": "i"}}  # Tìm trong mô tả
-        ]
-    
-    # Bước 6: Thực hiện query và chuyển kết quả thành list
-    # find(query): Tìm tất cả document phù hợp
-    # to_list(length=None): Chuyển cursor thành list, None = không giới hạn
-    products = await products_collection.find(query).to_list(length=None)
-    
-    # Bước 7: Chuyển ObjectId thành string để có thể serialize thành JSON
-    # MongoDB dùng ObjectId cho _id, nhưng JSON không hỗ trợ ObjectId
+        page = await search_products_page(
+            search, category=category, popular=popular,
+            limit=limit, cursor=cursor, view=view
+        )
+        return {
+            "success": True,
+            "products": page["products"],
+            "total": page["total"],
+            "nextCursor": page["nextCursor"],
+            "hasMore": page["hasMore"]
+        }
+    
+    # Bước 6: Thực hiện query với sort ổn định + keyset pagination
+    # Không truyền limit → trả về tất cả sản phẩm (tương thích client cũ)
+    # Catalog cache bật → đọc từ snapshot trong bộ nhớ, không query MongoDB
+    if settings.CATALOG_CACHE_ENABLED:
+        check_list_options(sort, view)
+        snapshot = await catalog_cache.get_snapshot()
+        page = snapshot.page(category=category, popular=popular, sort=sort, limit=limit, cursor=cursor, view=view)
+    else:
+        page = await find_products_page(query, sort=sort, limit=limit, cursor=cursor, view=view)
+    
+    # Bước 7: Trả về response với format chuẩn
+    return {
+        "success": True,                   # Đánh dấu thành công
+        "products": page["products"],      # Danh sách sản phẩm
+        "nextCursor": page["nextCursor"],  # Cursor cho trang tiếp theo (None nếu hết)
+        "hasMore": page["hasMore"]
+    }
+
+# ===== ENDPOINT 1B: LỌC SẢN PHẨM + ĐẾM FACET =====
+# Route: GET /api/product/facets
+# Ví dụ: GET /api/product/facets?category=Men&sizes=M&sizes=L&minPrice=100000&discount=true
+# Công khai (không cần đăng nhập)
+# Lưu ý: phải khai báo trước /{product_id} để "facets" không bị hiểu là product_id
+@router.get("/facets", response_model=dict)
+async def get_product_facets(
+    category: Optional[List[str]] = Query(None),   # ?category=Men&category=Women
+    sizes: Optional[List[str]] = Query(None),      # ?sizes=M&sizes=L
+    colors: Optional[List[str]] = Query(None),     # ?colors=Đen
+    minPrice: Optional[float] = Query(None, ge=0), # Lọc theo offerPrice
+    maxPrice: Optional[float] = Query(None, ge=0),
+    discount: Optional[bool] = None,               # ?discount=true → chỉ sản phẩm đang giảm giá
+    sort: str = "newest",
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Filter products and return per-facet counts in one $facet aggregation.
+    
+    Mỗi facet đếm trên tập sản phẩm khớp mọi filter KHÁC filter của chính nó
+    (chọn size M vẫn thấy số lượng của size L), nên thêm filter không tốn thêm round trip.
+    """
+    if sort not in PRODUCT_SORT_OPTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Kiểu sắp xếp không hợp lệ. Hỗ trợ: {', '.join(PRODUCT_SORT_OPTIONS)}"
+        )
+    
+    products_collection = await get_collection("products")
+    sort_spec = PRODUCT_SORT_OPTIONS[sort]
+    
+    # Bước 1: Mỗi filter là 1 điều kiện riêng (để bỏ ra khi đếm facet của chính nó)
+    filters = {}
+    if category:
+        filters["category"] = {"category": {"$in": category}}
+    if sizes:
+        filters["sizes"] = {"sizes": {"$in": sizes}}
+    if colors:
+        filters["colors"] = {"colors": {"$in": colors}}
+    if minPrice is not None or maxPrice is not None:
+        price_range = {}
+        if minPrice is not None:
+            price_range["$gte"] = minPrice
+        if maxPrice is not None:
+            price_range["$lte"] = maxPrice
+        filters["price"] = {"offerPrice": price_range}
+    if discount is not None:
+        filters["discount"] = {"hasDiscount": True} if discount else {"hasDiscount": {"$ne": True}}
+    
+    def match_except(facet_name: Optional[str] = None) -> dict:
+        """$match gồm tất cả filter trừ filter của facet_name"""
+        conditions = [cond for name, cond in filters.items() if name != facet_name]
+        return {"$match": {"$and": conditions}} if conditions else {"$match": {}}
+    
+    # Bước 2: Sub-pipeline trang sản phẩm (keyset pagination như /list)
+    products_pipeline = [match_except()]
+    if cursor:
+        products_pipeline.append({"$match": keyset_filter(sort_spec, decode_cursor(cursor, sort_spec))})
+    products_pipeline += [
+        {"$sort": dict(sort_spec)},
+        {"$limit": limit + 1},
+        {"$project": PRODUCT_CARD_PIPELINE_PROJECTION}
+    ]
+    
+    # Bước 3: 1 aggregation duy nhất: $match dùng index, $facet tính song song mọi facet
+    pipeline = [
+        # Chỉ sản phẩm đang inStock (dùng partial index), các filter còn lại nằm trong $facet
+        {"$match": {"inStock": True}},
+        {"$facet": {
+            "products": products_pipeline,
+            "total": [match_except(), {"$count": "count"}],
+            "category": [
+                match_except("category"),
+                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "sizes": [
+                match_except("sizes"),
+                {"$unwind": "$sizes"},
+                {"$group": {"_id": "$sizes", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "colors": [
+                match_except("colors"),
+                {"$unwind": "$colors"},
+                {"$group": {"_id": "$colors", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "discount": [
+                match_except("discount"),
+                {"$group": {"_id": {"$eq": ["$hasDiscount", True]}, "count": {"$sum": 1}}}
+            ],
+            "priceHistogram": [
+                match_except("price"),
+                {"$bucket": {
+                    "groupBy": {"$ifNull": ["$offerPrice", 0]},
+                    "boundaries": PRICE_HISTOGRAM_BOUNDARIES,
+                    "default": "over",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "priceRange": [
+                match_except("price"),
+                {"$group": {"_id": None, "min": {"$min": "$offerPrice"}, "max": {"$max": "$offerPrice"}}}
+            ]
+        }}
+    ]
+    result = (await products_collection.aggregate(pipeline).to_list(length=1))[0]
+    
+    # Bước 4: Định dạng kết quả
+    products = result["products"]
+    has_more = len(products) > limit
+    products = products[:limit]
+    next_cursor = encode_cursor(products[-1], sort_spec) if has_more else None
     for product in products:
-        product["_id"] = str(product["_id"])  # ObjectId("abc123") → "abc123"
+        product["_id"] = str(product["_id"])
+    
+    discount_counts = {str(bool(row["_id"])).lower(): row["count"] for row in result["discount"]}
+    
+    # Histogram: đổi boundary thành khoảng [min, max)
+    histogram = []
+    bounds = PRICE_HISTOGRAM_BOUNDARIES
+    for row in result["priceHistogram"]:
+        if row["_id"] == "over":
+            histogram.append({"min": bounds[-1], "max": None, "count": row["count"]})
+        else:
+            upper_index = bounds.index(row["_id"]) + 1
+            histogram.append({"min": row["_id"], "max": bounds[upper_index], "count": row["count"]})
+    
+    price_range = result["priceRange"][0] if result["priceRange"] else {"min": None, "max": None}
     
-    # Bước 8: Trả về response với format chuẩn
     return {
-        "success": True,      # Đánh dấu thành công
-        "products": products  # Danh sách sản phẩm
+        "success": True,
+        "products": products,
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "nextCursor": next_cursor,
+        "hasMore": has_more,
+        "facets": {
+            "category": [{"value": row["_id"], "count": row["count"]} for row in result["category"]],
+            "sizes": [{"value": row["_id"], "count": row["count"]} for row in result["sizes"]],
+            "colors": [{"value": row["_id"], "count": row["count"]} for row in result["colors"]],
+            "discount": {"true": discount_counts.get("true", 0), "false": discount_counts.get("false", 0)},
+            "priceHistogram": histogram,
+            "priceRange": {"min": price_range.get("min"), "max": price_range.get("max")}
+        }
+    }
+
+# ===== ENDPOINT 1C: LẤY NHIỀU SẢN PHẨM THEO DANH SÁCH ID =====
+# Route: POST /api/product/batch
+# Công khai - dùng cho trang giỏ hàng / wishlist (chỉ có ID sản phẩm)
+class ProductBatchRequest(BaseModel):
+    productIds: List[str] = Field(..., min_length=1)
+
+@router.post("/batch", response_model=dict)
+async def get_products_batch(data: ProductBatchRequest):
+    """Get card view of many products in one request, in request order"""
+    
+    # Bước 1: Bỏ ID trùng (giữ thứ tự) và giới hạn số lượng
+    product_ids = list(dict.fromkeys(data.productIds))
+    if len(product_ids) > settings.PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {settings.PRODUCT_BATCH_MAX_IDS} sản phẩm mỗi request"
+        )
+    
+    # ID không đúng định dạng ObjectId → coi như không tồn tại
+    missing = [pid for pid in product_ids if not ObjectId.is_valid(pid)]
+    valid_ids = [pid for pid in product_ids if ObjectId.is_valid(pid)]
+    
+    # Bước 2: Lấy card của các sản phẩm đang bán
+    # Catalog cache bật → đọc từ snapshot, chỉ query MongoDB cho ID không có trong snapshot
+    found = {}
+    lookup_ids = valid_ids
+    if settings.CATALOG_CACHE_ENABLED:
+        snapshot = await catalog_cache.get_snapshot()
+        found = {pid: snapshot.card_by_id[pid] for pid in valid_ids if pid in snapshot.card_by_id}
+        lookup_ids = [pid for pid in valid_ids if pid not in found]
+    
+    # Bước 3: 1 query $in duy nhất cho phần còn lại (projection card)
+    if lookup_ids:
+        products_collection = await get_collection("products")
+        docs = await products_collection.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in lookup_ids]}},
+            {**PRODUCT_CARD_PROJECTION, "inStock": 1}
+        ).to_list(length=len(lookup_ids))
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+            # Sản phẩm đã xóa mềm → chỉ báo inactive, không trả về
+            if doc.pop("inStock", True):
+                found[doc["_id"]] = doc
+            else:
+                found[doc["_id"]] = None
+    
+    # Bước 4: Giữ đúng thứ tự request, phân loại ID không trả về được
+    # inactive = đã xóa mềm (inStock=False) hoặc đang bị ẩn (isActive=False)
+    products = []
+    inactive = []
+    for pid in valid_ids:
+        if pid not in found:
+            missing.append(pid)
+        elif found[pid] is None or not found[pid].get("isActive", True):
+            inactive.append(pid)
+        else:
+            products.append(found[pid])
+    
+    return {
+        "success": True,
+        "products": products,  # Card view, cùng thứ tự với productIds
+        "missing": missing,    # ID không tồn tại / sai định dạng
+        "inactive": inactive   # ID sản phẩm đã ngừng bán
     }
 
 # ===== ENDPOINT 2: LẤY CHI TIẾT MỘT SẢN PHẨM =====
@@ -142,6 +542,20 @@ async def get_all_products(
 async def get_product(product_id: str):  # product_id lấy từ URL path
     """Get single product by ID"""
     
+    # Catalog cache bật → lấy từ snapshot (chỉ chứa sản phẩm đang inStock)
+    if settings.CATALOG_CACHE_ENABLED:
+        snapshot = await catalog_cache.get_snapshot()
+        product = snapshot.get(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Không tìm thấy sản phẩm"
+            )
+        return {
+            "success": True,
+            "product": product
+        }
+    
     # Bước 1: Kết nối đến collection "products"
     products_collection = await get_collection("products")
     
@@ -189,18 +603,13 @@ async def add_product(
     # json.loads(): Chuyển string → dict
     product_dict = json.loads(productData)
     
-    # Bước 3: Upload từng ảnh lên Cloudinary
-    image_urls = []  # Mảng chứa các URL ảnh đã upload
-    for image in images:
-        # Đọc nội dung file ảnh (binary data)
-        content = await image.read()
-        
-        # Upload lên Cloudinary folder "veloura/products"
-        # Trả về URL ảnh đã upload: https://res.cloudinary.com/.../image.jpg
-        url = await upload_image(content, folder="veloura/products")
-        
-        # Thêm URL vào mảng
-        image_urls.append(url)
+    # Bước 3: Upload các ảnh lên Cloudinary
+    # Đọc nội dung file ảnh (binary data)
+    contents = [await image.read() for image in images]
+    
+    # Upload song song lên folder "veloura/products" (chạy trong thread pool, không chặn server)
+    # Trả về mảng URL ảnh đã upload theo đúng thứ tự: https://res.cloudinary.com/.../image.jpg
+    image_urls = await upload_images(contents, folder="veloura/products")
     
     # Bước 4: Tạo document sản phẩm để lưu vào MongoDB
     # Xử lý giá khuyến mãi: nếu rỗng hoặc không hợp lệ thì dùng giá gốc
@@ -223,6 +632,9 @@ async def add_product(
         # Số lượng tồn kho
         "quantity": int(product_dict.get("quantity", 0)),
         
+        # Số lượng đã bán (dùng cho sort best_selling)
+        "soldCount": 0,
+        
         # Mảng URL ảnh đã upload ở bước 3
         "image": image_urls,
         
@@ -242,6 +654,12 @@ async def add_product(
     # Trả về object chứa inserted_id (ID của document vừa tạo)
     result = await products_collection.insert_one(product_doc)
     
+    # Cập nhật search index của worker này ngay (worker khác đồng bộ qua updatedAt)
+    product_search.upsert({**product_doc, "_id": result.inserted_id})
+    
+    # Báo catalog cache của mọi worker build lại snapshot
+    await bump_version("products")
+    
     # Bước 6: Trả về response thành công
     return {
         "success": True,
@@ -303,12 +721,9 @@ async def update_product(
     
     # Bước 5: Upload ảnh mới (nếu có)
     if images:
-        image_urls = []
-        for image in images:
-            # Đọc và upload từng ảnh
-            content = await image.read()
-            url = await upload_image(content, folder="veloura/products")
-            image_urls.append(url)
+        # Đọc tất cả ảnh rồi upload song song
+        contents = [await image.read() for image in images]
+        image_urls = await upload_images(contents, folder="veloura/products")
         
         # Thay thế mảng ảnh cũ bằng ảnh mới
         update_data["image"] = image_urls
@@ -324,6 +739,10 @@ async def update_product(
         {"$set": update_data}            # Cập nhật các field trong update_data
     )
     
+    # Cập nhật search index (name/description/category có thể đã đổi)
+    product_search.upsert({**product, **update_data})
+    await bump_version("products")
+    
     # Bước 8: Trả về response thành công
     return {
         "success": True,
@@ -359,6 +778,10 @@ async def delete_product(product_id: str, staff: dict = Depends(auth_staff)):
             detail="Không tìm thấy sản phẩm"
         )
     
+    # Sản phẩm đã ẩn → bỏ khỏi search index và catalog cache
+    product_search.remove(product_id)
+    await bump_version("products")
+    
     # Bước 4: Trả về response thành công
     return {
         "success": True,
@@ -371,26 +794,33 @@ async def delete_product(product_id: str, staff: dict = Depends(auth_staff)):
 # Route: GET /api/product/category/{category}
 # Ví dụ: GET /api/product/category/Men
 @router.get("/category/{category}", response_model=dict)
-async def get_products_by_category(category: str):  # category từ URL path
+async def get_products_by_category(
+    category: str,                       # category từ URL path
+    sort: str = "newest",
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: str = "full"
+):
     """Get products by category"""
     
-    # Bước 1: Kết nối đến collection "products"
-    products_collection = await get_collection("products")
-    
-    # Bước 2: Tìm sản phẩm theo 2 điều kiện
-    products = await products_collection.find({
-        "category": category,   # Điều kiện 1: Danh mục phải khớp
-        "inStock": True        # Điều kiện 2: Sản phẩm đang inStock
-    }).to_list(length=None)     # Chuyển cursor thành list
-    
-    # Bước 3: Chuyển ObjectId thành string cho tất cả sản phẩm
-    for product in products:
-        product["_id"] = str(product["_id"])
+    # Bước 1: Query theo 2 điều kiện (danh mục khớp + đang inStock)
+    # Từ catalog snapshot nếu bật cache, nếu không dùng partial index products_instock_category_*
+    if settings.CATALOG_CACHE_ENABLED:
+        check_list_options(sort, view)
+        snapshot = await catalog_cache.get_snapshot()
+        page = snapshot.page(category=category, sort=sort, limit=limit, cursor=cursor, view=view)
+    else:
+        page = await find_products_page(
+            {"category": category, "inStock": True},
+            sort=sort, limit=limit, cursor=cursor, view=view
+        )
     
-    # Bước 4: Trả về danh sách sản phẩm
+    # Bước 2: Trả về danh sách sản phẩm
     return {
         "success": True,
-        "products": products
+        "products": page["products"],
+        "nextCursor": page["nextCursor"],
+        "hasMore": page["hasMore"]
     }
 
 # ===== PYDANTIC SCHEMAS CHO DISCOUNT ENDPOINTS =====
@@ -449,6 +879,9 @@ async def toggle_discount(
         {"$set": update_data}
     )
     
+    # Báo catalog cache build lại snapshot (giá/trạng thái đã đổi)
+    await bump_version("products")
+    
     return {
         "success": True,
         "message": f"Discount {'enabled' if data.hasDiscount else 'disabled'} successfully"
@@ -478,45 +911,52 @@ async def apply_discount(
             detail="Phải cung cấp productIds hoặc (category với applyToAll=true)"
         )
     
-    # Find products
-    products = await products_collection.find(query).to_list(length=None)
-    if not products:
+    # Validate lịch giảm giá (so sánh theo UTC như dữ liệu trong MongoDB)
+    now = datetime.utcnow()
+    start_date = to_utc_naive(data.startDate)
+    end_date = to_utc_naive(data.endDate)
+    if end_date and (end_date <= now or (start_date and end_date <= start_date)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ngày kết thúc phải sau ngày bắt đầu và sau thời điểm hiện tại"
+        )
+    
+    # Chưa tới ngày bắt đầu → chỉ lưu lịch, discount scheduler sẽ bật đúng giờ
+    pending = start_date is not None and start_date > now
+    
+    # Prepare update data - offerPrice tính ngay trên server từ price của từng sản phẩm
+    update_data = {
+        "hasDiscount": not pending,
+        "discountPercent": round(data.discountPercent, 2),
+        "offerPrice": "$price" if pending else offer_price_expression(data.discountPercent),
+        "updatedAt": now,
+        # Lịch mới thay lịch cũ: không truyền ngày → xóa field ($$REMOVE)
+        "discountStartDate": start_date or "$$REMOVE",
+        "discountEndDate": end_date or "$$REMOVE"
+    }
+    
+    # Update toàn bộ sản phẩm khớp query bằng 1 lệnh (update pipeline)
+    # thay vì find() rồi update_one() từng sản phẩm
+    result = await products_collection.update_many(query, [{"$set": update_data}])
+    if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy sản phẩm nào"
         )
     
-    # Update each product
-    updated_count = 0
-    for product in products:
-        # Calculate new offer price
-        offer_price = calculate_offer_price(product["price"], data.discountPercent)
-        
-        # Prepare update data
-        update_data = {
-            "hasDiscount": True,
-            "discountPercent": round(data.discountPercent, 2),
-            "offerPrice": offer_price,
-            "updatedAt": datetime.utcnow()
-        }
-        
-        # Add dates if provided
-        if data.startDate:
-            update_data["discountStartDate"] = data.startDate
-        if data.endDate:
-            update_data["discountEndDate"] = data.endDate
-        
-        # Update product
-        await products_collection.update_one(
-            {"_id": product["_id"]},
-            {"$set": update_data}
-        )
-        updated_count += 1
+    # Báo catalog cache build lại snapshot (giá/trạng thái đã đổi)
+    await bump_version("products")
     
     return {
         "success": True,
-        "message": f"Applied {data.discountPercent}% discount to {updated_count} products",
-        "updatedCount": updated_count
+        "message": (
+            f"Scheduled {data.discountPercent}% discount for {result.matched_count} products"
+            if pending else
+            f"Applied {data.discountPercent}% discount to {result.matched_count} products"
+        ),
+        "updatedCount": result.matched_count,
+        "matchedCount": result.matched_count,
+        "modifiedCount": result.modified_count
     }
 
 # ===== ENDPOINT 9: REMOVE DISCOUNT =====
@@ -543,36 +983,31 @@ async def remove_discount(
             detail="Phải cung cấp productIds hoặc (category với removeAll=true)"
         )
     
-    # Find products
-    products = await products_collection.find(query).to_list(length=None)
-    if not products:
+    # Reset về giá gốc cho toàn bộ sản phẩm khớp query bằng 1 lệnh (update pipeline)
+    result = await products_collection.update_many(query, [
+        {"$set": {
+            "hasDiscount": False,
+            "discountPercent": 0.0,
+            "offerPrice": "$price",
+            "updatedAt": datetime.utcnow()
+        }},
+        {"$unset": ["discountStartDate", "discountEndDate"]}
+    ])
+    if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy sản phẩm nào"
         )
     
-    # Update each product
-    updated_count = 0
-    for product in products:
-        # Reset to original price
-        update_data = {
-            "hasDiscount": False,
-            "discountPercent": 0.0,
-            "offerPrice": product["price"],
-            "updatedAt": datetime.utcnow()
-        }
-        
-        # Update product
-        await products_collection.update_one(
-            {"_id": product["_id"]},
-            {"$set": update_data, "$unset": {"discountStartDate": "", "discountEndDate": ""}}
-        )
-        updated_count += 1
+    # Báo catalog cache build lại snapshot (giá/trạng thái đã đổi)
+    await bump_version("products")
     
     return {
         "success": True,
-        "message": f"Removed discount from {updated_count} products",
-        "updatedCount": updated_count
+        "message": f"Removed discount from {result.matched_count} products",
+        "updatedCount": result.matched_count,
+        "matchedCount": result.matched_count,
+        "modifiedCount": result.modified_count
     }
 
 # ===== ENDPOINT 9B: TOGGLE PRODUCT ACTIVE STATUS =====
@@ -606,6 +1041,9 @@ async def toggle_product_active(
         }
     )
     
+    # Báo catalog cache build lại snapshot (giá/trạng thái đã đổi)
+    await bump_version("products")
+    
     status_text = "hiển thị" if new_status else "ẩn"
     return {
         "success": True,
@@ -623,43 +1061,53 @@ async def update_discount(
     
     products_collection = await get_collection("products")
     
-    # Find products
-    query = {"_id": {"$in": [ObjectId(pid) for pid in data.productIds]}}
-    products = await products_collection.find(query).to_list(length=None)
+    # Update % discount cho toàn bộ sản phẩm (update pipeline, không load sản phẩm về Python)
+    now = datetime.utcnow()
+    discount_percent = round(data.newDiscountPercent, 2)
+    product_ids = [ObjectId(pid) for pid in data.productIds]
+    
+    # Đang trong thời gian giảm giá → tính lại offerPrice ngay
+    active = await products_collection.update_many(
+        {"_id": {"$in": product_ids}, **window_filter(now)},
+        [{"$set": {
+            "discountPercent": discount_percent,
+            "offerPrice": offer_price_expression(data.newDiscountPercent),
+            "hasDiscount": True,
+            "updatedAt": now
+        }}]
+    )
+    
+    # Chưa tới ngày bắt đầu / đã hết hạn → chỉ lưu % mới, discount scheduler bật / gỡ đúng giờ
+    scheduled = await products_collection.update_many(
+        {"_id": {"$in": product_ids}, "$nor": [window_filter(now)]},
+        {"$set": {"discountPercent": discount_percent, "updatedAt": now}}
+    )
+    
+    matched_count = active.matched_count + scheduled.matched_count
+    modified_count = active.modified_count + scheduled.modified_count
     
-    if not products:
+    if matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy sản phẩm nào"
         )
     
-    # Update each product
-    updated_count = 0
-    for product in products:
-        # Calculate new offer price
-        offer_price = calculate_offer_price(product["price"], data.newDiscountPercent)
-        
-        # Update product
-        await products_collection.update_one(
-            {"_id": product["_id"]},
-            {"$set": {
-                "discountPercent": round(data.newDiscountPercent, 2),
-                "offerPrice": offer_price,
-                "hasDiscount": True,
-                "updatedAt": datetime.utcnow()
-            }}
-        )
-        updated_count += 1
+    # Báo catalog cache build lại snapshot (giá/trạng thái đã đổi)
+    await bump_version("products")
     
     return {
         "success": True,
-        "message": f"Updated discount to {data.newDiscountPercent}% for {updated_count} products",
-        "updatedCount": updated_count
+        "message": f"Updated discount to {data.newDiscountPercent}% for {matched_count} products",
+        "updatedCount": matched_count,
+        "matchedCount": matched_count,
+        "modifiedCount": modified_count
     }
 
 # ===== KẾT THÚC FILE =====
 # Tổng cộng 10 endpoints:
 # 1.  GET    /list                    → Lấy tất cả sản phẩm (có filter)
+# 1b. GET    /facets                  → Lọc sản phẩm + đếm facet (size, màu, giá, giảm giá, danh mục)
+# 1c. POST   /batch                   → Lấy nhiều sản phẩm (card) theo danh sách ID
 # 2.  GET    /{product_id}            → Lấy 1 sản phẩm
 # 3.  POST   /add                     → Thêm sản phẩm mới (Admin/Staff)
 # 4.  PUT    /{product_id}            → Cập nhật sản phẩm (Admin/Staff)
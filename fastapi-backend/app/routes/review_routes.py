@@ -3,6 +3,7 @@ from app.models.review import ReviewCreate, ReviewUpdate, ReviewResponse, Review
 from app.config.database import get_collection
 from app.middleware.auth_admin import auth_user
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from typing import List, Optional
 
@@ -82,7 +83,14 @@ async def create_review(
             "updatedAt": datetime.utcnow()
         }
 
-        result = await reviews_collection.insert_one(new_review)
+        try:
+            result = await reviews_collection.insert_one(new_review)
+        except DuplicateKeyError:
+            # 2 request cùng lúc đều qua bước kiểm tra ở trên → unique index chặn bản thứ 2
+            raise HTTPException(
+                status_code=400,
+                detail="Bạn đã đánh giá sản phẩm này rồi. Vui lòng chỉnh sửa đánh giá hiện tại."
+            )
 
         return {
             "success": True,
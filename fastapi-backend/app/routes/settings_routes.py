@@ -1,19 +1,25 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Request, Response
 from datetime import datetime
 from app.config.database import get_collection
 from app.models.settings import SettingsResponse
+from app.utils.http_cache import conditional_get
 from bson import ObjectId
 
 router = APIRouter()
 
 # GET /api/settings/current - Lấy settings của năm hiện tại (public, không cần auth)
 @router.get("/current", response_model=SettingsResponse)
-async def get_current_settings():
+async def get_current_settings(request: Request, response: Response):
     """
     Get current year's settings for shipping fee and tax rate.
     Frontend uses this endpoint to calculate order totals.
     No authentication required.
     """
+    # ETag theo version của settings + năm hiện tại → 304 nếu client đã có bản mới nhất
+    not_modified = await conditional_get(request, response, ["settings"], variant=str(datetime.now().year))
+    if not_modified:
+        return not_modified
+    
     try:
         settings_collection = await get_collection("settings")
         
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from app.middleware.auth_user import auth_user
 from app.middleware.auth_admin import auth_staff
 from app.models.testimonial import TestimonialCreate, TestimonialUpdate, TestimonialResponse
 from app.config.database import get_collection
+from app.utils.http_cache import conditional_get
+from app.utils.versioning import bump_version
 from datetime import datetime
 from bson import ObjectId
 from typing import List
@@ -178,8 +180,13 @@ async def delete_my_testimonial(user = Depends(auth_user)):
 # ============================================
 
 @router.get("/list")
-async def get_approved_testimonials():
+async def get_approved_testimonials(request: Request, response: Response):
     """Get all approved testimonials (public route)"""
+    # ETag theo version của testimonials → client đã có bản mới nhất thì trả 304
+    not_modified = await conditional_get(request, response, ["testimonials"])
+    if not_modified:
+        return not_modified
+    
     try:
         testimonials_collection = await get_collection("testimonials")
         
@@ -247,6 +254,9 @@ async def approve_testimonial(
                 detail="Không tìm thấy lời chứng thực"
             )
         
+        # Chỉ thay đổi trạng thái approved mới ảnh hưởng /list → đổi version để ETag đổi theo
+        await bump_version("testimonials")
+        
         return {"success": True, "message": "Testimonial approved successfully"}
     except HTTPException:
         raise
@@ -277,6 +287,9 @@ async def reject_testimonial(
                 detail="Không tìm thấy lời chứng thực"
             )
         
+        # Chỉ thay đổi trạng thái approved mới ảnh hưởng /list → đổi version để ETag đổi theo
+        await bump_version("testimonials")
+        
         return {"success": True, "message": "Testimonial rejected successfully"}
     except HTTPException:
         raise
@@ -306,6 +319,9 @@ async def admin_delete_testimonial(
                 detail="Không tìm thấy lời chứng thực"
             )
         
+        # Chỉ thay đổi trạng thái approved mới ảnh hưởng /list → đổi version để ETag đổi theo
+        await bump_version("testimonials")
+        
         return {"success": True, "message": "Xóa lời chứng thực thành công"}
     except HTTPException:
         raise
@@ -17,7 +17,8 @@ from fastapi.responses import RedirectResponse
 # UserResponse, Token: Models cho response data
 # VerifyCodeRequest: Model cho verify OTP code
 # ResendCodeRequest: Model cho resend OTP code
-from app.models.user import UserCreate, UserLogin, UserResponse, Token, VerifyCodeRequest, ResendCodeRequest
+# AUTH_USER_PROJECTION: Projection user đầy đủ cho profile / is-auth (không có password, OTP)
+from app.models.user import UserCreate, UserLogin, UserResponse, Token, VerifyCodeRequest, ResendCodeRequest, AUTH_USER_PROJECTION
 
 # get_collection: Hàm lấy collection từ MongoDB
 from app.config.database import get_collection
@@ -34,6 +35,12 @@ from app.utils.email import send_verification_email, send_welcome_email
 # auth_user: Middleware xác thực user từ JWT token
 from app.middleware.auth_user import auth_user
 
+# cart_store: Giỏ hàng của user (collection carts)
+from app.utils import cart_store
+
+# principal_cache: Cache user của auth_user (evict khi sửa user)
+from app.utils.principal_cache import principal_cache
+
 # ObjectId: Kiểu dữ liệu _id của MongoDB
 from bson import ObjectId
 
@@ -154,7 +161,6 @@ async def register_user(user: UserCreate, background_tasks: BackgroundTasks):
         "address": user.address,        # Địa chỉ (optional)
         "dateOfBirth": user.dateOfBirth.isoformat() if user.dateOfBirth else None,  # Ngày sinh (YYYY-MM-DD)
         "gender": user.gender,          # Giới tính (optional)
-        "cartData": {},                 # Giỏ hàng trống {}
         "role": "customer",             # Role mặc định là customer
         "emailVerified": False,         # 👈 Chưa xác thực email
         "isActive": False,              # 👈 Tài khoản chưa active (đợi xác thực email)
@@ -297,6 +303,12 @@ async def logout_user():
         "message": "Đăng xuất thành công"  # Thông báo
     }
 
+async def load_profile(principal: dict) -> dict:
+    """User đầy đủ (AUTH_USER_PROJECTION) cho profile / is-auth"""
+    users_collection = await get_collection("users")
+    user = await users_collection.find_one({"_id": principal["_id"]}, AUTH_USER_PROJECTION)
+    return user or principal
+
 # ============================================================================
 # CHECK AUTH ENDPOINT - API Kiểm tra trạng thái đăng nhập
 # ============================================================================
@@ -317,19 +329,23 @@ async def is_authenticated(request: Request):
         # 2. Decode JWT token
         # 3. Tìm user trong DB
         # 4. Return user document
-        print("🔍 /is-auth endpoint called - calling auth_user()...")
-        user = await auth_user(request)
-        print(f"✅ auth_user() returned user: {user.get('email')}")
+        principal = await auth_user(request)
         
         # ====================================================================
         # BƯỚC 2: Format user data
         # ====================================================================
+        # auth_user chỉ có các field gọn (principal cache) → lấy user đầy đủ để trả về
+        user = await load_profile(principal)
+        
         # Convert ObjectId → string để JSON serialize được
         user["_id"] = str(user["_id"])
         
         # Xóa field password khỏi response (bảo mật)
         user.pop("password", None)
         
+        # Giỏ hàng lưu ở collection carts (auth_user không lấy kèm nữa)
+        user["cartData"] = await cart_store.get_cart(user["_id"])
+        
         # ====================================================================
         # BƯỚC 3: Trả về user info
         # ====================================================================
@@ -353,7 +369,7 @@ async def is_authenticated(request: Request):
 # GET PROFILE ENDPOINT - API Lấy thông tin user (Protected)
 # ============================================================================
 @router.get("/profile", response_model=dict)  # GET /api/user/profile
-async def get_profile(request: Request, user: dict = Depends(auth_user)):
+async def get_profile(request: Request, principal: dict = Depends(auth_user)):
     """
     Lấy thông tin profile của user đang login
     - Route này PROTECTED (cần login)
@@ -364,12 +380,18 @@ async def get_profile(request: Request, user: dict = Depends(auth_user)):
     # Nếu token invalid → auth_user throw 401 error tự động
     # ========================================================================
     
+    # Lấy user đầy đủ (auth_user chỉ có các field gọn)
+    user = await load_profile(principal)
+    
     # Convert ObjectId → string
     user["_id"] = str(user["_id"])
     
     # Xóa password khỏi response
     user.pop("password", None)
     
+    # Giỏ hàng lưu ở collection carts
+    user["cartData"] = await cart_store.get_cart(user["_id"])
+    
     # Trả về user info
     return {
         "success": True,  # Thành công
@@ -428,6 +450,9 @@ async def verify_email(token: str, background_tasks: BackgroundTasks):
             }
         )
         
+        # isActive vừa đổi → bỏ user khỏi principal cache
+        principal_cache.evict(user_id)
+        
         # Kiểm tra xem có update được không
         if result.matched_count == 0:
             raise HTTPException(
@@ -575,6 +600,7 @@ async def verify_code(request: VerifyCodeRequest, background_tasks: BackgroundTa
             }
         }
     )
+    principal_cache.evict(user["_id"])  # isActive vừa đổi → bỏ khỏi principal cache
     
     # ========================================================================
     # BƯỚC 8: Gửi email chào mừng
@@ -823,6 +849,9 @@ async def update_profile(
         {"$set": update_data}
     )
     
+    # Tên mới → bỏ user khỏi principal cache (request sau đọc lại từ DB)
+    principal_cache.evict(current_user["_id"])
+    
     if result.modified_count == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,48 @@
+"""
+Background Periodic Tasks
+- Chạy job định kỳ trong event loop của worker (start lúc startup, cancel lúc shutdown)
+- Lỗi của 1 lần chạy chỉ được log, job vẫn tiếp tục ở chu kỳ sau
+- Job phải idempotent: mỗi worker chạy 1 bản, nhiều worker có thể chạy cùng lúc
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+# name -> task đang chạy
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[], Awaitable]) -> None:
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Background task '{name}' failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def start_periodic_task(name: str, interval: float, job: Callable[[], Awaitable]) -> asyncio.Task:
+    """
+    Chạy job ngay lập tức rồi lặp lại sau mỗi interval giây
+
+    Args:
+        name: Tên task (dùng để log, mỗi tên chỉ chạy 1 task)
+        interval: Số giây giữa 2 lần chạy
+        job: Coroutine function không tham số
+    """
+    if name in _tasks and not _tasks[name].done():
+        return _tasks[name]
+    _tasks[name] = asyncio.create_task(_run_periodically(name, interval, job))
+    print(f"⏱️ Background task '{name}' started (every {interval}s)")
+    return _tasks[name]
+
+
+async def stop_periodic_tasks() -> None:
+    """Cancel tất cả task và chờ chúng dừng hẳn (gọi lúc shutdown)"""
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,204 @@
+"""
+Cart Store - giỏ hàng lưu ở collection riêng "carts" (1 document / user, unique userId)
+- Tách khỏi users để auth_user không phải kéo theo cả giỏ hàng mỗi request
+- Mỗi thao tác là 1 update $inc / $set / $unset trên đúng field items.<itemId>.<size>,
+  không đọc cả giỏ về Python rồi ghi đè cả dict → 2 tab cùng thêm hàng không mất lượt nào
+- find_one_and_update trả về số lượng mới của dòng trong cùng 1 round trip
+- User chưa có giỏ → upsert tạo document ngay trong lần thêm đầu tiên
+- apply_operations: nhiều thao tác add / set / remove gộp thành 1 update duy nhất (POST /api/cart/batch)
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Tuple, Union
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.config.database import get_collection
+
+CARTS_COLLECTION = "carts"
+
+UserId = Union[str, ObjectId]
+
+
+def line_path(item_id: str, size: str) -> str:
+    """
+    Đường dẫn field của 1 dòng giỏ hàng: items.<itemId>.<size>
+
+    Raises:
+        HTTPException 400 nếu itemId / size không dùng làm tên field được
+    """
+    if not ObjectId.is_valid(item_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Mã sản phẩm không hợp lệ"
+        )
+    if not size or "." in size or size.startswith("$"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Kích cỡ không hợp lệ"
+        )
+    return f"items.{item_id}.{size}"
+
+
+def _line_quantity(cart: Dict, item_id: str, size: str) -> int:
+    return ((cart or {}).get("items") or {}).get(item_id, {}).get(size, 0)
+
+
+async def _upsert_line(user_id: UserId, update: Dict, path: str) -> Dict:
+    """Update 1 dòng, chưa có giỏ thì tạo (2 request đầu tiên cùng upsert → request thua retry 1 lần)"""
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    now = datetime.utcnow()
+    update = {
+        **update,
+        "$set": {**update.get("$set", {}), "updatedAt": now},
+        "$setOnInsert": {"createdAt": now},
+    }
+    for attempt in range(2):
+        try:
+            return await carts_collection.find_one_and_update(
+                {"userId": str(user_id)},
+                update,
+                projection={path: 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            if attempt:
+                raise
+
+
+async def get_cart(user_id: UserId) -> Dict[str, Dict[str, int]]:
+    """Giỏ hàng dạng {itemId: {size: quantity}} ({} nếu chưa có)"""
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    cart = await carts_collection.find_one({"userId": str(user_id)}, {"_id": 0, "items": 1})
+    return (cart or {}).get("items") or {}
+
+
+async def load_cart(user_id: UserId) -> Dict:
+    """Document giỏ hàng (items, updatedAt, quote đã lưu); chưa có giỏ → {}"""
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    cart = await carts_collection.find_one(
+        {"userId": str(user_id)},
+        {"_id": 0, "items": 1, "updatedAt": 1, "quote": 1}
+    )
+    return cart or {}
+
+
+async def save_quote(user_id: UserId, cart_updated_at, quote: Dict) -> None:
+    """
+    Lưu quote đã tính vào giỏ (không đổi updatedAt)
+    Chỉ lưu nếu giỏ chưa bị sửa kể từ lúc đọc → không gắn quote cũ vào giỏ mới
+    """
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    await carts_collection.update_one(
+        {"userId": str(user_id), "updatedAt": cart_updated_at},
+        {"$set": {"quote": quote}}
+    )
+
+
+async def increment_line(user_id: UserId, item_id: str, size: str, amount: int = 1) -> int:
+    """
+    Cộng thêm số lượng cho 1 dòng ($inc atomic, dòng chưa có thì tạo mới)
+
+    Returns:
+        Số lượng mới của dòng
+    """
+    path = line_path(item_id, size)
+    cart = await _upsert_line(user_id, {"$inc": {path: amount}}, path)
+    return _line_quantity(cart, item_id, size)
+
+
+async def set_line(user_id: UserId, item_id: str, size: str, quantity: int) -> int:
+    """
+    Đặt số lượng cho 1 dòng; quantity = 0 → xóa dòng
+
+    Returns:
+        Số lượng mới của dòng (0 nếu đã xóa)
+    """
+    path = line_path(item_id, size)
+    if quantity > 0:
+        cart = await _upsert_line(user_id, {"$set": {path: quantity}}, path)
+        return _line_quantity(cart, item_id, size)
+
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    await carts_collection.update_one(
+        {"userId": str(user_id)},
+        {"$unset": {path: ""}, "$set": {"updatedAt": datetime.utcnow()}}
+    )
+    # Sản phẩm không còn size nào → bỏ luôn key sản phẩm
+    # (điều kiện {} nên nếu tab khác vừa thêm size mới thì không xóa)
+    await carts_collection.update_one(
+        {"userId": str(user_id), f"items.{item_id}": {}},
+        {"$unset": {f"items.{item_id}": ""}}
+    )
+    return 0
+
+
+async def clear_cart(user_id: UserId) -> None:
+    """Xóa toàn bộ giỏ hàng"""
+    carts_collection = await get_collection(CARTS_COLLECTION)
+    await carts_collection.update_one(
+        {"userId": str(user_id)},
+        {"$set": {"items": {}, "updatedAt": datetime.utcnow()}}
+    )
+
+
+def fold_operations(operations: Iterable) -> Dict[Tuple[str, str], Tuple[str, int]]:
+    """
+    Gộp các thao tác theo thứ tự gửi lên thành kết quả cuối của từng dòng (itemId, size):
+        ("inc", n) - cộng thêm n | ("set", q) - đặt số lượng q (q = 0 → xóa dòng)
+    - add sau set → set với số lượng đã cộng; remove = set 0
+    - Mỗi dòng còn đúng 1 thao tác → không có 2 operator cùng 1 field trong update
+    """
+    lines: Dict[Tuple[str, str], Tuple[str, int]] = {}
+    for operation in operations:
+        key = (operation.itemId, operation.size)
+        if operation.op == "add":
+            amount = 1 if operation.quantity is None else operation.quantity
+            kind, current = lines.get(key, ("inc", 0))
+            lines[key] = (kind, current + amount)
+        elif operation.op == "set":
+            lines[key] = ("set", operation.quantity or 0)
+        else:
+            lines[key] = ("set", 0)
+    return lines
+
+
+async def apply_operations(user_id: UserId, lines: Dict[Tuple[str, str], Tuple[str, int]]) -> Dict[str, Dict[str, int]]:
+    """
+    Áp dụng các dòng đã gộp (fold_operations) trong 1 find_one_and_update:
+    $inc / $set / $unset trên từng field items.<itemId>.<size>
+
+    Returns:
+        Giỏ hàng sau khi cập nhật ({itemId: {size: quantity}})
+    """
+    update = {"$inc": {}, "$set": {}, "$unset": {}}
+    removed_items = set()
+    for (item_id, size), (kind, quantity) in lines.items():
+        path = line_path(item_id, size)
+        if kind == "inc":
+            if quantity:
+                update["$inc"][path] = quantity
+        elif quantity > 0:
+            update["$set"][path] = quantity
+        else:
+            update["$unset"][path] = ""
+            removed_items.add(item_id)
+    update = {operator: fields for operator, fields in update.items() if fields}
+
+    cart = await _upsert_line(user_id, update, "items")
+    items = (cart or {}).get("items") or {}
+
+    # Sản phẩm không còn size nào → bỏ luôn key sản phẩm (điều kiện {} như set_line)
+    emptied = [item_id for item_id in removed_items if items.get(item_id) == {}]
+    if emptied:
+        carts_collection = await get_collection(CARTS_COLLECTION)
+        await carts_collection.bulk_write([
+            UpdateOne({"userId": str(user_id), f"items.{item_id}": {}}, {"$unset": {f"items.{item_id}": ""}})
+            for item_id in emptied
+        ], ordered=False)
+
+    return {item_id: sizes for item_id, sizes in items.items() if sizes}
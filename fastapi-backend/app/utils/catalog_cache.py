@@ -0,0 +1,198 @@
+"""
+Catalog Snapshot Cache
+- Mỗi worker giữ 1 snapshot (bất biến) các sản phẩm đang inStock
+- Snapshot gắn với version "products" (app/utils/versioning.py); route ghi sản phẩm
+  gọi bump_version → lần đọc kế tiếp build lại snapshot
+- Snapshot cũng hết hạn sau CATALOG_MAX_AGE_SECONDS (tồn kho thay đổi do đặt hàng
+  không bump version)
+- Đọc từ snapshot: không query MongoDB, sắp xếp sẵn theo mọi kiểu sort,
+  keyset pagination bằng bisect
+"""
+
+import asyncio
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.models.product import PRODUCT_CARD_PROJECTION, PRODUCT_SORT_OPTIONS
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.versioning import get_version
+
+CARD_FIELDS = [field for field in PRODUCT_CARD_PROJECTION if field not in ("image", "description")]
+
+
+def _sort_number(value):
+    """Đổi giá trị sort thành số để so sánh (null/missing nhỏ nhất như MongoDB)"""
+    if value is None:
+        return float("-inf")
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, ObjectId):
+        # Giữ dạng int (96 bit) để không mất độ chính xác khi so sánh
+        return int(str(value), 16)
+    return float(value)
+
+
+def _sort_key(values: List, sort: List[Tuple[str, int]]) -> Tuple:
+    """Key tăng dần tương ứng với sort spec (đảo dấu cho field giảm dần)"""
+    return tuple(_sort_number(value) * direction for value, (_, direction) in zip(values, sort))
+
+
+def _card(product: Dict) -> Dict:
+    """Projection card giống PRODUCT_CARD_PROJECTION nhưng làm trong Python"""
+    card = {"_id": str(product["_id"])}
+    for field in CARD_FIELDS:
+        if field in product:
+            card[field] = product[field]
+    card["image"] = (product.get("image") or [])[:2]
+    card["description"] = (product.get("description") or "")[:160]
+    return card
+
+
+class CatalogSnapshot:
+    """Snapshot bất biến của catalog - KHÔNG sửa các dict trả ra"""
+
+    def __init__(self, products: List[Dict], version: int):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.size = len(products)
+
+        # Document trả về client (_id dạng string), dùng chung giữa các request
+        self.full_by_id: Dict[str, Dict] = {}
+        self.card_by_id: Dict[str, Dict] = {}
+        self._raw: Dict[str, Dict] = {}
+        for product in products:
+            product_id = str(product["_id"])
+            self._raw[product_id] = product
+            self.full_by_id[product_id] = {**product, "_id": product_id}
+            self.card_by_id[product_id] = _card(product)
+
+        # (sort, category) -> (danh sách id đã sắp xếp, danh sách key tương ứng)
+        # category None = tất cả sản phẩm
+        self._orders: Dict[Tuple[str, Optional[str]], Tuple[List[str], List[Tuple]]] = {}
+        categories = {product.get("category") for product in products} - {None}
+        for sort_name, sort_spec in PRODUCT_SORT_OPTIONS.items():
+            keyed = sorted(
+                (_sort_key([product.get(field) for field, _ in sort_spec], sort_spec), str(product["_id"]))
+                for product in products
+            )
+            self._orders[(sort_name, None)] = ([pid for _, pid in keyed], [key for key, _ in keyed])
+            for category in categories:
+                subset = [(key, pid) for key, pid in keyed if self._raw[pid].get("category") == category]
+                self._orders[(sort_name, category)] = ([pid for _, pid in subset], [key for key, _ in subset])
+
+    def get(self, product_id: str) -> Optional[Dict]:
+        """Lấy 1 sản phẩm (full) theo id"""
+        return self.full_by_id.get(product_id)
+
+    def page(
+        self,
+        category: Optional[str] = None,
+        popular: Optional[bool] = None,
+        sort: str = "newest",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        view: str = "full"
+    ) -> Dict:
+        """
+        Danh sách sản phẩm giống find_products_page nhưng đọc từ snapshot
+
+        Returns:
+            dict: {"products", "nextCursor", "hasMore"}
+        """
+        sort_spec = PRODUCT_SORT_OPTIONS[sort]
+        ids, keys = self._orders.get((sort, category), ([], []))
+
+        # Keyset: bắt đầu ngay sau vị trí của cursor
+        start = 0
+        if cursor:
+            start = bisect_right(keys, _sort_key(decode_cursor(cursor, sort_spec), sort_spec))
+
+        source = self.card_by_id if view == "card" else self.full_by_id
+        selected = []
+        has_more = False
+        for product_id in ids[start:]:
+            if popular is not None and bool(self._raw[product_id].get("popular")) != popular:
+                continue
+            if limit is not None and len(selected) == limit:
+                has_more = True
+                break
+            selected.append(product_id)
+
+        next_cursor = encode_cursor(self._raw[selected[-1]], sort_spec) if has_more else None
+        return {
+            "products": [source[pid] for pid in selected],
+            "nextCursor": next_cursor,
+            "hasMore": has_more
+        }
+
+    def hydrate(self, product_ids: List[str], view: str = "full") -> List[Dict]:
+        """Lấy nhiều sản phẩm theo thứ tự id (bỏ qua id không có trong snapshot)"""
+        source = self.card_by_id if view == "card" else self.full_by_id
+        return [source[pid] for pid in product_ids if pid in source]
+
+
+class CatalogCache:
+    """Giữ snapshot hiện tại và thống kê hit/miss"""
+
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.hits = 0
+        self.misses = 0
+        self.last_build_ms = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, version: int) -> bool:
+        snapshot = self.snapshot
+        return (
+            snapshot is not None
+            and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < settings.CATALOG_MAX_AGE_SECONDS
+        )
+
+    async def get_snapshot(self) -> CatalogSnapshot:
+        """Trả về snapshot hợp lệ, build lại nếu version đổi hoặc quá hạn"""
+        version, _ = await get_version("products")
+        if self._is_fresh(version):
+            self.hits += 1
+            return self.snapshot
+
+        async with self._lock:
+            # Request khác có thể đã build xong trong lúc chờ lock
+            if self._is_fresh(version):
+                self.hits += 1
+                return self.snapshot
+
+            self.misses += 1
+            start = time.perf_counter()
+            products_collection = await get_collection("products")
+            products = await products_collection.find({"inStock": True}).to_list(length=None)
+            self.snapshot = CatalogSnapshot(products, version)
+            self.last_build_ms = (time.perf_counter() - start) * 1000
+            return self.snapshot
+
+    def invalidate(self) -> None:
+        """Bỏ snapshot hiện tại (lần đọc sau sẽ build lại)"""
+        self.snapshot = None
+
+    def stats(self) -> Dict:
+        """Thống kê cho /api/admin/cache-stats"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 4) if total else 0.0,
+            "version": self.snapshot.version if self.snapshot else None,
+            "size": self.snapshot.size if self.snapshot else 0,
+            "ageSeconds": round(time.monotonic() - self.snapshot.built_at, 1) if self.snapshot else None,
+            "lastBuildMs": round(self.last_build_ms, 2)
+        }
+
+
+# Cache dùng chung trong worker
+catalog_cache = CatalogCache()
@@ -0,0 +1,88 @@
+"""
+Discount Scheduler
+- Bật discount khi tới discountStartDate, tắt khi tới discountEndDate
+- Mỗi lần chạy chỉ 2 lệnh update_many (update pipeline), không load sản phẩm về Python
+- Có thay đổi → bump_version("products") để catalog cache, ETag và giá checkout
+  (đọc offerPrice từ DB) thấy giá mới, route không cần tự kiểm tra ngày
+- Idempotent: filter chỉ khớp sản phẩm chưa ở đúng trạng thái, nhiều worker chạy cùng lúc vẫn an toàn
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config.database import get_collection
+from app.models.product import offer_price_expression
+from app.utils.versioning import bump_version
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Đổi datetime có timezone về UTC không timezone (cùng dạng với datetime.utcnow())"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def window_filter(now: datetime) -> Dict:
+    """Sản phẩm đang trong thời gian giảm giá (không có ngày bắt đầu / kết thúc = không giới hạn)"""
+    return {
+        "$and": [
+            {"$or": [{"discountStartDate": None}, {"discountStartDate": {"$lte": now}}]},
+            {"$or": [{"discountEndDate": None}, {"discountEndDate": {"$gt": now}}]},
+        ],
+    }
+
+
+def activation_filter(now: datetime) -> Dict:
+    """Sản phẩm đã tới ngày bắt đầu, chưa hết hạn, nhưng discount chưa bật"""
+    return {
+        **window_filter(now),
+        "discountStartDate": {"$lte": now},
+        "discountPercent": {"$gt": 0},
+        "hasDiscount": {"$ne": True},
+    }
+
+
+def expiry_filter(now: datetime) -> Dict:
+    """Sản phẩm đang giảm giá nhưng đã quá ngày kết thúc"""
+    return {"discountEndDate": {"$lte": now}, "hasDiscount": True}
+
+
+async def run_discount_schedule(now: Optional[datetime] = None) -> Dict:
+    """
+    Áp dụng các discount tới hạn và gỡ các discount hết hạn
+
+    Args:
+        now: Thời điểm so sánh (mặc định utcnow)
+
+    Returns:
+        dict: {"activated": số sản phẩm bật discount, "expired": số sản phẩm tắt discount}
+    """
+    now = now or datetime.utcnow()
+    products_collection = await get_collection("products")
+
+    # Bước 1: Gỡ discount hết hạn (giống /remove-discount: về giá gốc, xóa lịch)
+    expired = await products_collection.update_many(expiry_filter(now), [
+        {"$set": {
+            "hasDiscount": False,
+            "discountPercent": 0.0,
+            "offerPrice": "$price",
+            "updatedAt": now
+        }},
+        {"$unset": ["discountStartDate", "discountEndDate"]}
+    ])
+
+    # Bước 2: Bật discount đã tới ngày bắt đầu (offerPrice tính từ discountPercent của từng sản phẩm)
+    activated = await products_collection.update_many(activation_filter(now), [
+        {"$set": {
+            "hasDiscount": True,
+            "offerPrice": offer_price_expression("$discountPercent"),
+            "updatedAt": now
+        }}
+    ])
+
+    # Bước 3: Báo cache build lại snapshot nếu có thay đổi
+    if expired.modified_count or activated.modified_count:
+        await bump_version("products")
+        print(f"🏷️ Discount scheduler: {activated.modified_count} activated, {expired.modified_count} expired")
+
+    return {"activated": activated.modified_count, "expired": expired.modified_count}
@@ -0,0 +1,93 @@
+"""
+HTTP Conditional GET Helpers
+- ETag mạnh tính từ version của collection (app/utils/versioning.py) + tham số query
+- Last-Modified = updatedAt của lần ghi gần nhất
+- If-None-Match / If-Modified-Since khớp → trả 304, không query và không serialize body
+- Cache-Control có stale-while-revalidate cho browser và reverse proxy
+- refresh_seconds: dữ liệu đổi mà không bump version (tồn kho, soldCount do đặt hàng)
+  → ETag / Last-Modified đổi theo từng khoảng thời gian, 304 không giữ dữ liệu cũ mãi
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import Request, Response, status
+
+from app.config.settings import settings
+from app.utils.versioning import get_version
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """So khớp header If-None-Match (có thể là danh sách, '*' hoặc weak tag)"""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    collections: List[str],
+    variant: str = "",
+    refresh_seconds: Optional[float] = None
+) -> Optional[Response]:
+    """
+    Kiểm tra request có thể trả 304 không, đồng thời gắn header cache vào response
+
+    Args:
+        request: Request hiện tại (đọc If-None-Match / If-Modified-Since)
+        response: Response của route (được gắn ETag, Last-Modified, Cache-Control)
+        collections: Các collection mà body phụ thuộc vào
+        variant: Phần phân biệt response khác nhau trên cùng dữ liệu (vd: query string)
+        refresh_seconds: Đổi ETag sau mỗi khoảng này kể cả khi version không đổi
+
+    Returns:
+        Response 304 nếu client đã có bản mới nhất, None nếu route cần trả body
+    """
+    versions = [await get_version(name) for name in collections]
+    fingerprint = "|".join(f"{name}:{version}" for name, (version, _) in zip(collections, versions))
+    last_modified = max(updated_at for _, updated_at in versions).replace(microsecond=0)
+    if refresh_seconds:
+        # Khoảng thời gian hiện tại (giống nhau giữa các worker vì dùng giờ hệ thống)
+        bucket = int(time.time() // refresh_seconds)
+        fingerprint = f"{fingerprint}|t:{bucket}"
+        bucket_start = datetime.utcfromtimestamp(bucket * refresh_seconds).replace(microsecond=0)
+        last_modified = max(last_modified, bucket_start)
+    digest = hashlib.sha1(f"{fingerprint}|{variant}".encode("utf-8")).hexdigest()[:20]
+    etag = f'"{digest}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": (
+            f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+        ),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match có mặt thì bỏ qua If-Modified-Since (RFC 9110)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+                if last_modified <= since:
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            except (TypeError, ValueError):
+                pass
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,160 @@
+"""
+Idempotency Keys cho các endpoint đặt hàng
+- Client gửi header Idempotency-Key (mỗi lần bấm "Đặt hàng" 1 key, retry dùng lại key cũ)
+- Request đầu tiên được xử lý, response lưu vào collection idempotency_keys (TTL index)
+- Request lặp lại cùng key → trả lại đúng response đã lưu, không tạo đơn / session mới
+- Request trùng đang chạy song song → chờ request đầu xong rồi trả cùng kết quả
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+
+from app.config.database import get_collection
+from app.config.settings import settings
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+# Chờ request đang chạy: bắt đầu 50ms, tăng dần tới 500ms
+_POLL_START_SECONDS = 0.05
+_POLL_MAX_SECONDS = 0.5
+
+# Event để request trùng trong cùng worker được đánh thức ngay khi request đầu xong
+_local_events: Dict[str, asyncio.Event] = {}
+
+
+def _request_hash(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _replay(doc: Dict) -> Dict:
+    """Trả lại kết quả đã lưu (response thành công hoặc lỗi 4xx)"""
+    if doc.get("statusCode", 200) >= 400:
+        raise HTTPException(status_code=doc["statusCode"], detail=doc.get("detail"))
+    return doc["response"]
+
+
+async def _wait_for_result(collection, key_id: str, request_hash: str) -> Optional[Dict]:
+    """
+    Chờ request đầu tiên xử lý xong
+
+    Returns:
+        Document đã hoàn tất, hoặc None nếu request đầu đã bỏ key (lỗi 5xx / worker chết) → được chạy lại
+    """
+    deadline = asyncio.get_running_loop().time() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = _POLL_START_SECONDS
+    while True:
+        doc = await collection.find_one({"_id": key_id})
+        if doc is None:
+            return None
+        if doc["requestHash"] != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key đã được dùng cho một request khác"
+            )
+        if doc["status"] == "done":
+            return doc
+        # Worker xử lý request đầu đã chết giữa chừng → khóa hết hạn, cho phép chạy lại
+        if doc["lockedUntil"] <= datetime.utcnow():
+            result = await collection.delete_one({"_id": key_id, "status": "in_progress", "lockedUntil": doc["lockedUntil"]})
+            if result.deleted_count:
+                return None
+
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Request với Idempotency-Key này đang được xử lý, vui lòng thử lại sau"
+            )
+        event = _local_events.get(key_id)
+        try:
+            if event:
+                await asyncio.wait_for(event.wait(), timeout=min(delay, remaining))
+            else:
+                await asyncio.sleep(min(delay, remaining))
+        except asyncio.TimeoutError:
+            pass
+        delay = min(delay * 2, _POLL_MAX_SECONDS)
+
+
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    scope: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Dict]]
+) -> Dict:
+    """
+    Chạy handler đúng 1 lần cho mỗi (scope, Idempotency-Key)
+
+    Args:
+        idempotency_key: Giá trị header Idempotency-Key (None → chạy handler bình thường)
+        scope: Phạm vi của key, vd "order:cod:<userId>" (key của user khác / endpoint khác không đụng nhau)
+        payload: Body của request - cùng key nhưng body khác → 422
+        handler: Coroutine function xử lý request, trả về dict response
+
+    Returns:
+        Response của lần xử lý đầu tiên
+    """
+    if not idempotency_key:
+        return await handler()
+    if len(idempotency_key) > 255:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key tối đa 255 ký tự"
+        )
+
+    collection = await get_collection(IDEMPOTENCY_COLLECTION)
+    key_id = f"{scope}:{idempotency_key}"
+    request_hash = _request_hash(payload)
+
+    # Bước 1: Giành quyền xử lý bằng insert (_id unique) - request trùng sẽ DuplicateKeyError
+    while True:
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                "_id": key_id,
+                "requestHash": request_hash,
+                "status": "in_progress",
+                "lockedUntil": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+                "createdAt": now,
+                "expiresAt": now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+            })
+            break
+        except DuplicateKeyError:
+            # Bước 1b: Key đã có → chờ kết quả của request đầu rồi trả lại
+            doc = await _wait_for_result(collection, key_id, request_hash)
+            if doc is not None:
+                return _replay(doc)
+            # Request đầu đã bỏ key → thử giành lại quyền xử lý
+
+    # Bước 2: Xử lý request và lưu kết quả
+    event = _local_events.setdefault(key_id, asyncio.Event())
+    try:
+        response = await handler()
+        await collection.update_one(
+            {"_id": key_id},
+            {"$set": {"status": "done", "statusCode": 200, "response": response}}
+        )
+        return response
+    except HTTPException as e:
+        if e.status_code < 500:
+            # Lỗi nghiệp vụ (hết hàng, dữ liệu sai...) → lưu lại, retry nhận cùng lỗi
+            await collection.update_one(
+                {"_id": key_id},
+                {"$set": {"status": "done", "statusCode": e.status_code, "detail": e.detail}}
+            )
+        else:
+            await collection.delete_one({"_id": key_id})
+        raise
+    except BaseException:
+        # Lỗi hệ thống / request bị hủy → bỏ key để client retry được
+        await collection.delete_one({"_id": key_id})
+        raise
+    finally:
+        event.set()
+        _local_events.pop(key_id, None)
@@ -0,0 +1,105 @@
+"""
+Inventory Reservation
+- Trừ kho có điều kiện: find_one_and_update({"quantity": {"$gte": n}}) → không bao giờ âm kho
+- Đơn nhiều sản phẩm: sản phẩm nào không đủ hàng thì hoàn lại các sản phẩm đã trừ (compensation),
+  không cần transaction (MongoDB standalone không hỗ trợ multi-document transaction)
+- Các dòng cùng sản phẩm (khác size) được cộng dồn thành 1 lệnh trừ kho
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+
+from app.config.database import get_collection
+
+
+def aggregate_quantities(items: List) -> Dict[str, int]:
+    """
+    Cộng dồn số lượng theo product id
+
+    Args:
+        items: OrderItem (có .product, .quantity) hoặc item đã lưu trong order
+            ({"product": {"_id"}, "quantity"})
+    """
+    totals: Dict[str, int] = {}
+    for item in items:
+        if isinstance(item, dict):
+            product_id, quantity = item["product"]["_id"], item["quantity"]
+        else:
+            product_id, quantity = item.product, item.quantity
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+async def _take(products_collection, product_id: str, quantity: int) -> bool:
+    """Trừ kho 1 sản phẩm nếu còn đủ hàng (atomic)"""
+    result = await products_collection.find_one_and_update(
+        {"_id": ObjectId(product_id), "quantity": {"$gte": quantity}},
+        {
+            "$inc": {"quantity": -quantity, "soldCount": quantity},
+            "$set": {"updatedAt": datetime.utcnow()}
+        },
+        projection={"_id": 1}
+    )
+    return result is not None
+
+
+async def release_stock(reservations: Dict[str, int]) -> None:
+    """Hoàn kho các sản phẩm đã trừ (dùng khi hủy đơn / compensation) - 1 lệnh bulk_write"""
+    if not reservations:
+        return
+    products_collection = await get_collection("products")
+    now = datetime.utcnow()
+    await products_collection.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId(product_id)},
+            {"$inc": {"quantity": quantity, "soldCount": -quantity}, "$set": {"updatedAt": now}}
+        )
+        for product_id, quantity in reservations.items()
+    ], ordered=False)
+
+
+async def reserve_stock(items: List) -> Dict[str, int]:
+    """
+    Trừ kho cho cả đơn hàng: hoặc tất cả sản phẩm đều được trừ, hoặc không sản phẩm nào
+
+    Args:
+        items: Các dòng hàng của đơn
+
+    Returns:
+        dict: product_id -> số lượng đã trừ (truyền cho release_stock nếu cần hoàn lại)
+
+    Raises:
+        HTTPException 400 nếu có sản phẩm không đủ hàng (kho đã được hoàn nguyên)
+    """
+    products_collection = await get_collection("products")
+    requested = aggregate_quantities(items)
+
+    # Trừ kho song song các sản phẩm, mỗi lệnh là 1 update có điều kiện
+    product_ids = list(requested)
+    results: List[bool] = await asyncio.gather(*(
+        _take(products_collection, product_id, requested[product_id])
+        for product_id in product_ids
+    ))
+
+    reserved = {pid: requested[pid] for pid, ok in zip(product_ids, results) if ok}
+    failed: List[Tuple[str, int]] = [(pid, requested[pid]) for pid, ok in zip(product_ids, results) if not ok]
+    if not failed:
+        return reserved
+
+    # Compensation: hoàn lại phần đã trừ rồi báo lỗi sản phẩm hết hàng
+    if reserved:
+        await release_stock(reserved)
+
+    product_id, _ = failed[0]
+    product = await products_collection.find_one({"_id": ObjectId(product_id)}, {"name": 1, "quantity": 1})
+    name = product["name"] if product else product_id
+    available = max(product.get("quantity", 0), 0) if product else 0
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Sản phẩm '{name}' chỉ còn {available} sản phẩm trong kho"
+    )
@@ -0,0 +1,138 @@
+"""
+Order Export (CSV / NDJSON) cho kế toán
+- Đọc đơn hàng bằng Motor cursor theo batch (batch_size), không to_list cả collection
+- Mỗi dòng hàng (item) của đơn là 1 row, kèm thông tin đơn / khách / phí
+- Ghi từng chunk cho StreamingResponse → bộ nhớ không phụ thuộc số đơn
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+from app.config.database import get_collection
+from app.config.settings import settings
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Thứ tự cột của file export
+EXPORT_FIELDS = [
+    "orderId", "createdAt", "userId", "status", "paymentMethod", "isPaid", "paidAt",
+    "customerName", "email", "phone", "city", "country",
+    "productId", "productName", "size", "quantity", "unitPrice", "lineTotal",
+    "shippingFee", "taxRate", "orderAmount",
+]
+
+# Chỉ lấy field cần cho export (bỏ ảnh sản phẩm, thông tin thanh toán nội bộ)
+EXPORT_PROJECTION = {
+    "userId": 1,
+    "createdAt": 1,
+    "status": 1,
+    "paymentMethod": 1,
+    "isPaid": 1,
+    "paidAt": 1,
+    "address": 1,
+    "fees": 1,
+    "amount": 1,
+    "items.product._id": 1,
+    "items.product.name": 1,
+    "items.product.offerPrice": 1,
+    "items.quantity": 1,
+    "items.size": 1,
+}
+
+# Thứ tự export: cũ → mới (index orders_createdAt_id duyệt ngược)
+EXPORT_SORT = [("createdAt", 1), ("_id", 1)]
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def order_rows(order: Dict) -> List[Dict]:
+    """Tách 1 đơn hàng thành các row (1 row / dòng hàng)"""
+    address = order.get("address") or {}
+    fees = order.get("fees") or {}
+    base = {
+        "orderId": str(order["_id"]),
+        "createdAt": _format_value(order.get("createdAt")),
+        "userId": order.get("userId"),
+        "status": order.get("status"),
+        "paymentMethod": order.get("paymentMethod"),
+        "isPaid": bool(order.get("isPaid")),
+        "paidAt": _format_value(order.get("paidAt")),
+        "customerName": f"{address.get('firstName', '')} {address.get('lastName', '')}".strip(),
+        "email": address.get("email"),
+        "phone": address.get("phone"),
+        "city": address.get("city"),
+        "country": address.get("country"),
+        "shippingFee": fees.get("shippingFee"),
+        "taxRate": fees.get("taxRate"),
+        "orderAmount": order.get("amount"),
+    }
+
+    rows = []
+    for item in order.get("items") or []:
+        product = item.get("product") or {}
+        unit_price = product.get("offerPrice") or 0
+        quantity = item.get("quantity") or 0
+        rows.append({
+            **base,
+            "productId": product.get("_id"),
+            "productName": product.get("name"),
+            "size": item.get("size"),
+            "quantity": quantity,
+            "unitPrice": unit_price,
+            "lineTotal": unit_price * quantity,
+        })
+    return rows
+
+
+async def stream_orders_export(query: Dict, export_format: str) -> AsyncIterator[str]:
+    """
+    Sinh nội dung file export theo từng chunk (mỗi chunk ~ 1 batch đơn hàng)
+
+    Args:
+        query: Filter MongoDB (xem build_order_filter)
+        export_format: "csv" | "ndjson"
+    """
+    orders_collection = await get_collection("orders")
+    cursor = orders_collection.find(query, EXPORT_PROJECTION).sort(EXPORT_SORT)
+    cursor = cursor.batch_size(settings.ORDER_EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    if export_format == "csv":
+        # BOM để Excel đọc đúng tiếng Việt
+        buffer.write("\ufeff")
+        writer.writeheader()
+
+    pending = 0
+    try:
+        async for order in cursor:
+            for row in order_rows(order):
+                if export_format == "csv":
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(row, ensure_ascii=False))
+                    buffer.write("\n")
+            pending += 1
+
+            # Đủ 1 batch → đẩy chunk ra response, xóa buffer
+            if pending >= settings.ORDER_EXPORT_BATCH_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        # Client ngắt kết nối giữa chừng → đóng cursor trên server
+        await cursor.close()
@@ -0,0 +1,114 @@
+"""
+Bulk Order Status Transitions (kho đánh dấu hàng loạt đơn Shipped / Delivered / Cancelled)
+- Kiểm tra từng đơn theo state machine ORDER_TRANSITIONS
+- Tất cả thay đổi trạng thái ghi bằng 1 lệnh bulk_write (mỗi đơn 1 UpdateOne có điều kiện status cũ)
+- Mỗi lần chạy gắn lastBulkOpId vào các đơn được cập nhật → biết chính xác đơn nào đã đổi
+  (bulk_write chỉ trả về số lượng), đơn bị request khác đổi trạng thái trước sẽ báo "conflict"
+- Đơn bị hủy: hoàn kho cộng dồn theo sản phẩm, mỗi sản phẩm 1 $inc (release_stock)
+"""
+
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+
+from app.config.database import get_collection
+from app.models.order import ORDER_TRANSITIONS
+from app.utils.inventory import aggregate_quantities, release_stock
+from app.utils.stock_holds import order_holds_stock
+
+
+async def bulk_transition_orders(order_ids: List[str], new_status: str) -> Dict:
+    """
+    Chuyển trạng thái nhiều đơn hàng cùng lúc
+
+    Args:
+        order_ids: Danh sách id đơn hàng
+        new_status: Trạng thái mới
+
+    Returns:
+        dict: {"updated": số đơn đã đổi, "restockedProducts": số sản phẩm được hoàn kho,
+               "results": [{"orderId", "outcome", "from"}] theo thứ tự request}
+        outcome: updated | unchanged | invalid_transition | not_found | conflict
+    """
+    if new_status not in ORDER_TRANSITIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Trạng thái không hợp lệ"
+        )
+
+    orders_collection = await get_collection("orders")
+    order_ids = list(dict.fromkeys(order_ids))
+    valid_ids = [ObjectId(oid) for oid in order_ids if ObjectId.is_valid(oid)]
+
+    # Bước 1: 1 query lấy trạng thái hiện tại của tất cả đơn
+    docs = await orders_collection.find(
+        {"_id": {"$in": valid_ids}},
+        {"status": 1, "items": 1, "stockHeld": 1, "isPaid": 1, "paymentMethod": 1}
+    ).to_list(length=len(valid_ids))
+    orders = {str(doc["_id"]): doc for doc in docs}
+
+    # Bước 2: Kiểm tra state machine, build các UpdateOne
+    now = datetime.utcnow()
+    op_id = ObjectId()
+    results: Dict[str, Dict] = {}
+    candidates: List[str] = []
+    operations = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if order is None:
+            results[order_id] = {"orderId": order_id, "outcome": "not_found", "from": None}
+            continue
+
+        current = order.get("status")
+        results[order_id] = {"orderId": order_id, "outcome": "unchanged", "from": current}
+        if current == new_status:
+            continue
+        if new_status not in ORDER_TRANSITIONS.get(current, set()):
+            results[order_id]["outcome"] = "invalid_transition"
+            continue
+
+        fields = {"status": new_status, "updatedAt": now, "lastBulkOpId": op_id}
+        query = {"_id": order["_id"], "status": current}
+        if new_status == "Cancelled":
+            # Điều kiện stockHeld: đơn vừa được hoàn kho ở request khác thì không hoàn lần 2
+            query["stockHeld"] = order.get("stockHeld")
+            fields["stockHeld"] = False
+            fields["stockReleased"] = order_holds_stock(order)
+        candidates.append(order_id)
+        operations.append(UpdateOne(query, {"$set": fields}))
+
+    # Bước 3: Ghi tất cả bằng 1 bulk_write, rồi đọc lại marker để biết đơn nào đã đổi
+    applied = set()
+    if operations:
+        await orders_collection.bulk_write(operations, ordered=False)
+        applied = {
+            str(doc["_id"])
+            async for doc in orders_collection.find(
+                {"_id": {"$in": [ObjectId(oid) for oid in candidates]}, "lastBulkOpId": op_id},
+                {"_id": 1}
+            )
+        }
+
+    to_release: Dict[str, int] = {}
+    for order_id in candidates:
+        if order_id not in applied:
+            # Đơn đã bị đổi trạng thái giữa lúc đọc và lúc ghi
+            results[order_id]["outcome"] = "conflict"
+            continue
+        results[order_id]["outcome"] = "updated"
+        order = orders[order_id]
+        if new_status == "Cancelled" and order_holds_stock(order):
+            for product_id, quantity in aggregate_quantities(order["items"]).items():
+                to_release[product_id] = to_release.get(product_id, 0) + quantity
+
+    # Bước 4: Hoàn kho các đơn bị hủy - mỗi sản phẩm 1 $inc, cùng 1 bulk_write
+    await release_stock(to_release)
+
+    return {
+        "updated": len(applied),
+        "restockedProducts": len(to_release),
+        "results": [results[order_id] for order_id in order_ids]
+    }
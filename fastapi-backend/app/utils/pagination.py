@@ -0,0 +1,164 @@
+"""
+Keyset Pagination Utilities
+- Encode/decode cursor (opaque string cho client)
+- Build filter "sau cursor" cho một sort spec [(field, direction), ("_id", direction)]
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+
+def _encode_value(value: Any) -> Dict:
+    """Chuyển giá trị sort thành dạng JSON được (giữ lại kiểu dữ liệu)"""
+    if isinstance(value, datetime):
+        return {"t": "dt", "v": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"t": "oid", "v": str(value)}
+    return {"t": "raw", "v": value}
+
+
+def _decode_value(data: Dict) -> Any:
+    """Ngược lại với _encode_value"""
+    if data["t"] == "dt":
+        return datetime.fromisoformat(data["v"])
+    if data["t"] == "oid":
+        return ObjectId(data["v"])
+    return data["v"]
+
+
+def _get_field(doc: Dict, field: str) -> Any:
+    """Lấy giá trị field (hỗ trợ dotted path như 'product._id')"""
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def encode_cursor(doc: Dict, sort: List[Tuple[str, int]]) -> str:
+    """
+    Tạo cursor từ document cuối cùng của trang hiện tại
+
+    Args:
+        doc: Document cuối trang (raw từ MongoDB, _id còn là ObjectId)
+        sort: Sort spec đã dùng cho query
+
+    Returns:
+        Cursor string (base64 url-safe)
+    """
+    values = [_encode_value(_get_field(doc, field)) for field, _ in sort]
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    """
+    Giải mã cursor thành list giá trị sort
+
+    Raises:
+        HTTPException 400 nếu cursor không hợp lệ
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        decoded = [_decode_value(v) for v in values]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor không hợp lệ"
+        )
+
+    if len(decoded) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor không khớp với kiểu sắp xếp"
+        )
+    return decoded
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict:
+    """
+    Build filter lấy các document đứng SAU cursor theo sort spec
+
+    Sort spec có dạng [(field, direction), ("_id", direction)].
+    MongoDB xếp null/missing nhỏ nhất, nên:
+    - Sort giảm dần: null nằm cuối cùng
+    - Sort tăng dần: null nằm đầu tiên
+
+    Args:
+        sort: Sort spec, phần tử cuối là _id
+        values: Giá trị decode từ cursor
+
+    Returns:
+        Filter dict để $and với query chính
+    """
+    (field, direction), (id_field, _) = sort[0], sort[-1]
+    value, last_id = values[0], values[-1]
+    id_op = "$lt" if direction == -1 else "$gt"
+
+    if field == id_field:
+        return {id_field: {id_op: last_id}}
+
+    if value is None:
+        if direction == -1:
+            # Đã vào vùng null (cuối cùng) → chỉ còn các null có _id nhỏ hơn
+            return {field: None, id_field: {id_op: last_id}}
+        # Tăng dần: sau vùng null là tất cả giá trị khác null
+        return {"$or": [
+            {field: None, id_field: {id_op: last_id}},
+            {field: {"$ne": None}},
+        ]}
+
+    value_op = "$lt" if direction == -1 else "$gt"
+    branches = [
+        {field: {value_op: value}},
+        {field: value, id_field: {id_op: last_id}},
+    ]
+    if direction == -1:
+        # Giảm dần: các document null/missing nằm sau mọi giá trị khác
+        branches.append({field: None})
+    return {"$or": branches}
+
+
+def apply_cursor(query: Dict, sort: List[Tuple[str, int]], cursor: Optional[str]) -> Dict:
+    """
+    Gộp keyset filter vào query (không ghi đè $or sẵn có của query)
+
+    Returns:
+        Query mới
+    """
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, sort)
+    return {"$and": [query, keyset_filter(sort, values)]}
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor dạng offset (dùng khi kết quả xếp theo điểm relevance, không keyset được)"""
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """
+    Giải mã cursor offset (None → 0)
+
+    Raises:
+        HTTPException 400 nếu cursor không hợp lệ
+    """
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["o"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor không hợp lệ"
+        )
+    return max(offset, 0)
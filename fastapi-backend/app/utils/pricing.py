@@ -0,0 +1,320 @@
+"""
+Pricing / Quote Service
+- Tính giá đơn hàng 1 lần cho COD, Stripe, VNPay và POST /api/order/quote
+- Toàn bộ sản phẩm của giỏ lấy bằng 1 query $in (có projection), không find_one từng dòng
+- Phí vận chuyển / thuế lấy từ settings trên server (giống /api/settings/current),
+  không tin giá trị client gửi lên; cache theo version "settings"
+- Công thức giống CartTotal ở client: total = subtotal + shippingFee + subtotal * taxRate
+- Giỏ hàng đã tính giá (GET /api/cart/priced): quote lưu vào document giỏ, dùng lại trong
+  CART_QUOTE_TTL_SECONDS nếu giỏ / sản phẩm / settings chưa đổi; checkout gửi quoteHash
+  thì dùng luôn quote đó, không tính lại
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.models.product import PURCHASABLE_FILTER, is_purchasable
+from app.utils import cart_store
+from app.utils.versioning import get_version
+
+# Field cần cho tính giá + snapshot sản phẩm trong đơn hàng
+QUOTE_PROJECTION = {"name": 1, "image": 1, "offerPrice": 1, "quantity": 1}
+
+# Field cần cho giỏ hàng đã tính giá (thêm trạng thái bán + size để gắn cờ từng dòng)
+CART_PRICING_PROJECTION = {**QUOTE_PROJECTION, "price": 1, "sizes": 1, "isActive": 1, "inStock": 1}
+
+# Giá trị mặc định khi chưa có settings nào (giống /api/settings/current)
+DEFAULT_SHIPPING_FEE = 10.0
+DEFAULT_TAX_RATE = 0.02
+
+# (version settings, năm, fees) của lần đọc gần nhất
+_fees_cache: Optional[Tuple[int, int, Dict]] = None
+
+
+async def get_current_fees() -> Dict:
+    """
+    Phí vận chuyển + thuế đang áp dụng: settings active của năm hiện tại,
+    không có thì settings active gần nhất, không có nữa thì mặc định
+
+    Returns:
+        dict: {"shippingFee", "taxRate", "year"}
+    """
+    global _fees_cache
+    version, _ = await get_version("settings")
+    current_year = datetime.now().year
+    if _fees_cache and _fees_cache[0] == version and _fees_cache[1] == current_year:
+        return _fees_cache[2]
+
+    settings_collection = await get_collection("settings")
+    doc = await settings_collection.find_one({"year": current_year, "isActive": True})
+    if not doc:
+        doc = await settings_collection.find_one({"isActive": True}, sort=[("year", -1)])
+
+    fees = {
+        "shippingFee": float(doc["shippingFee"]) if doc else DEFAULT_SHIPPING_FEE,
+        "taxRate": float(doc["taxRate"]) if doc else DEFAULT_TAX_RATE,
+        "year": doc["year"] if doc else current_year,
+    }
+    _fees_cache = (version, current_year, fees)
+    return fees
+
+
+async def build_quote(items: List, fees: Optional[Dict] = None) -> Dict:
+    """
+    Tính giá cho danh sách dòng hàng (OrderItem: product, quantity, size)
+
+    Args:
+        items: Các dòng hàng
+        fees: Phí áp dụng (None → get_current_fees())
+
+    Returns:
+        dict: {"items": snapshot từng dòng để lưu vào order, "subtotal", "shippingFee",
+               "taxRate", "tax", "total", "fees"}
+
+    Raises:
+        HTTPException 400 nếu giỏ trống / không đủ tồn kho, 404 nếu sản phẩm không tồn tại
+    """
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Giỏ hàng trống"
+        )
+
+    # Bước 1: 1 query $in cho tất cả sản phẩm trong giỏ
+    for item in items:
+        if not ObjectId.is_valid(item.product):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Sản phẩm {item.product} không tồn tại"
+            )
+    product_ids = list(dict.fromkeys(item.product for item in items))
+
+    products_collection = await get_collection("products")
+    docs = await products_collection.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}, **PURCHASABLE_FILTER},
+        QUOTE_PROJECTION
+    ).to_list(length=len(product_ids))
+    products = {str(doc["_id"]): doc for doc in docs}
+
+    # Bước 2: Kiểm tra tồn tại + tồn kho (cộng dồn các dòng cùng sản phẩm khác size)
+    requested: Dict[str, int] = {}
+    for item in items:
+        if item.product not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Sản phẩm {item.product} không tồn tại"
+            )
+        requested[item.product] = requested.get(item.product, 0) + item.quantity
+
+    for product_id, quantity in requested.items():
+        product = products[product_id]
+        if product.get("quantity", 0) < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Sản phẩm '{product['name']}' chỉ còn {product.get('quantity', 0)} sản phẩm trong kho"
+            )
+
+    # Bước 3: Snapshot từng dòng + tổng tiền
+    order_items = []
+    subtotal = 0
+    for item in items:
+        product = products[item.product]
+        subtotal += product["offerPrice"] * item.quantity
+        order_items.append({
+            "product": {
+                "_id": item.product,
+                "name": product["name"],
+                "image": product["image"],
+                "offerPrice": product["offerPrice"]
+            },
+            "quantity": item.quantity,
+            "size": item.size
+        })
+
+    # Bước 4: Phí vận chuyển + thuế
+    fees = dict(fees or await get_current_fees())
+    return {"items": order_items, **_totals(subtotal, fees)}
+
+
+def _totals(subtotal: float, fees: Dict) -> Dict:
+    tax = subtotal * fees["taxRate"]
+    return {
+        "subtotal": subtotal,
+        "shippingFee": fees["shippingFee"],
+        "taxRate": fees["taxRate"],
+        "tax": tax,
+        "total": subtotal + fees["shippingFee"] + tax,
+        "fees": fees
+    }
+
+
+def _line_status(product: Optional[Dict], size: str) -> str:
+    """Trạng thái 1 dòng giỏ hàng (chưa xét tồn kho cộng dồn)"""
+    if not product:
+        return "not_found"
+    if not is_purchasable(product):
+        return "inactive"
+    if size not in product.get("sizes", []):
+        return "invalid_size"
+    if not product.get("inStock", True) or product.get("quantity", 0) <= 0:
+        return "out_of_stock"
+    return "ok"
+
+
+async def _price_cart_items(cart_items: Dict[str, Dict[str, int]]) -> Dict:
+    """
+    Tính giá giỏ hàng {itemId: {size: quantity}}: 1 query $in cho mọi sản phẩm, không raise
+    mà gắn cờ từng dòng (not_found / inactive / invalid_size / out_of_stock / insufficient_stock)
+    Tổng tiền chỉ tính các dòng "ok"
+    """
+    product_ids = [item_id for item_id in cart_items if ObjectId.is_valid(item_id)]
+    products = {}
+    if product_ids:
+        products_collection = await get_collection("products")
+        docs = await products_collection.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}},
+            CART_PRICING_PROJECTION
+        ).to_list(length=len(product_ids))
+        products = {str(doc["_id"]): doc for doc in docs}
+
+    lines = []
+    requested: Dict[str, int] = {}
+    for item_id, sizes in cart_items.items():
+        product = products.get(item_id)
+        for size, quantity in sizes.items():
+            if quantity <= 0:
+                continue
+            line_status = _line_status(product, size)
+            if line_status == "ok":
+                requested[item_id] = requested.get(item_id, 0) + quantity
+            lines.append({
+                "itemId": item_id,
+                "size": size,
+                "quantity": quantity,
+                "status": line_status,
+                "available": product.get("quantity", 0) if product else 0,
+                "product": {
+                    "_id": item_id,
+                    "name": product["name"],
+                    "image": product["image"],
+                    "offerPrice": product["offerPrice"],
+                    "price": product.get("price", product["offerPrice"])
+                } if product else None,
+            })
+
+    # Tồn kho cộng dồn các size của cùng 1 sản phẩm (giống build_quote)
+    subtotal = 0
+    for line in lines:
+        if line["status"] != "ok":
+            line["lineTotal"] = 0
+            continue
+        if requested[line["itemId"]] > line["available"]:
+            line["status"] = "insufficient_stock"
+            line["lineTotal"] = 0
+            continue
+        line["lineTotal"] = line["product"]["offerPrice"] * line["quantity"]
+        subtotal += line["lineTotal"]
+
+    ok_lines = [line for line in lines if line["status"] == "ok"]
+    fees = dict(await get_current_fees())
+    # Giỏ trống / không còn dòng nào mua được → không tính phí vận chuyển (giống CartTotal ở client)
+    totals = _totals(subtotal, fees if ok_lines else {**fees, "shippingFee": 0.0})
+    totals["fees"] = fees
+    return {
+        "lines": lines,
+        "itemCount": sum(line["quantity"] for line in ok_lines),
+        "purchasable": bool(lines) and len(ok_lines) == len(lines),
+        **totals,
+    }
+
+
+def _quote_hash(priced: Dict) -> str:
+    payload = json.dumps(priced, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+async def _pricing_versions() -> Dict:
+    products_version, _ = await get_version("products")
+    settings_version, _ = await get_version("settings")
+    return {"products": products_version, "settings": settings_version}
+
+
+async def price_cart(user_id) -> Dict:
+    """
+    Giỏ hàng đã tính giá cho GET /api/cart/priced
+
+    Dùng lại quote đã lưu trong giỏ nếu: chưa hết CART_QUOTE_TTL_SECONDS, giỏ chưa sửa
+    (updatedAt) và version products / settings chưa đổi. Tồn kho thay đổi do đặt hàng không
+    bump version → trạng thái tồn kho có thể cũ tối đa CART_QUOTE_TTL_SECONDS
+    (checkout vẫn trừ kho có điều kiện nên không bán vượt)
+
+    Returns:
+        dict: {"quoteHash", "expiresAt", "lines", "itemCount", "purchasable", "subtotal",
+               "shippingFee", "taxRate", "tax", "total", "fees"}
+    """
+    cart = await cart_store.load_cart(user_id)
+    versions = await _pricing_versions()
+    now = datetime.utcnow()
+
+    stored = cart.get("quote")
+    if (
+        stored
+        and stored["expiresAt"] > now
+        and stored["cartUpdatedAt"] == cart.get("updatedAt")
+        and stored["versions"] == versions
+    ):
+        return {"quoteHash": stored["hash"], "expiresAt": stored["expiresAt"], **stored["data"]}
+
+    priced = await _price_cart_items(cart.get("items") or {})
+    quote_hash = _quote_hash(priced)
+    expires_at = now + timedelta(seconds=settings.CART_QUOTE_TTL_SECONDS)
+    if cart:
+        await cart_store.save_quote(user_id, cart.get("updatedAt"), {
+            "hash": quote_hash,
+            "cartUpdatedAt": cart.get("updatedAt"),
+            "versions": versions,
+            "expiresAt": expires_at,
+            "data": priced
+        })
+    return {"quoteHash": quote_hash, "expiresAt": expires_at, **priced}
+
+
+async def checkout_quote(user_id, items: List, quote_hash: Optional[str] = None) -> Dict:
+    """
+    Quote cho lúc đặt hàng: dùng lại quote của /api/cart/priced nếu quoteHash còn hiệu lực
+    (chưa hết hạn, sản phẩm / settings chưa đổi, đúng các dòng đang đặt), ngược lại build_quote
+
+    Returns:
+        dict cùng format với build_quote
+    """
+    if quote_hash:
+        stored = (await cart_store.load_cart(user_id)).get("quote")
+        if (
+            stored
+            and stored["hash"] == quote_hash
+            and stored["expiresAt"] > datetime.utcnow()
+            and stored["data"]["purchasable"]
+            and stored["versions"] == await _pricing_versions()
+        ):
+            data = stored["data"]
+            quoted = sorted((line["itemId"], line["size"], line["quantity"]) for line in data["lines"])
+            ordered = sorted((item.product, item.size, item.quantity) for item in items)
+            if quoted == ordered:
+                order_items = [
+                    {
+                        "product": {key: line["product"][key] for key in ("_id", "name", "image", "offerPrice")},
+                        "quantity": line["quantity"],
+                        "size": line["size"]
+                    }
+                    for line in data["lines"]
+                ]
+                return {"items": order_items, **_totals(data["subtotal"], data["fees"])}
+
+    return await build_quote(items)
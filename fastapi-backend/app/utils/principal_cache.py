@@ -0,0 +1,101 @@
+"""
+Principal Cache - user đang đăng nhập, cache theo user id trong mỗi worker
+- auth_user / auth_admin / auth_admin_only gọi load_principal thay vì find_one users mỗi request
+- Chỉ giữ projection gọn PRINCIPAL_PROJECTION (_id, email, name, role, isActive)
+- LRU giới hạn PRINCIPAL_CACHE_MAX_SIZE entry, mỗi entry sống PRINCIPAL_CACHE_TTL_SECONDS
+- Route đổi role / isActive / name hoặc xóa user gọi principal_cache.evict(user_id);
+  worker khác không nhận được evict → dữ liệu cũ tối đa bằng TTL
+- Trả về bản copy: route sửa dict user (vd. _id → str) không làm hỏng entry trong cache
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from bson import ObjectId
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.models.user import PRINCIPAL_PROJECTION
+
+
+class PrincipalCache:
+    """LRU {user_id: (thời điểm hết hạn, user)} và thống kê hit/miss"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.epoch = 0  # Tăng mỗi lần evict → bỏ kết quả query bắt đầu trước lúc evict
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        """Bản copy của user trong cache (None nếu chưa có / đã hết hạn)"""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() >= entry[0]:
+            del self._entries[user_id]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(user_id)
+        return dict(entry[1])
+
+    def put(self, user_id: str, user: Dict, epoch: int) -> None:
+        """Lưu user đọc từ MongoDB; có evict xảy ra trong lúc query (epoch đổi) → không lưu"""
+        if epoch != self.epoch:
+            return
+        self._entries[user_id] = (time.monotonic() + settings.PRINCIPAL_CACHE_TTL_SECONDS, dict(user))
+        self._entries.move_to_end(user_id)
+        # Vượt giới hạn → bỏ entry ít dùng gần đây nhất
+        while len(self._entries) > settings.PRINCIPAL_CACHE_MAX_SIZE:
+            self._entries.popitem(last=False)
+
+    def evict(self, user_id) -> None:
+        """Bỏ user khỏi cache (gọi sau khi sửa / xóa user)"""
+        self.epoch += 1
+        if self._entries.pop(str(user_id), None) is not None:
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Thống kê cho /api/admin/cache-stats"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxSize": settings.PRINCIPAL_CACHE_MAX_SIZE,
+            "ttlSeconds": settings.PRINCIPAL_CACHE_TTL_SECONDS
+        }
+
+
+# Cache dùng chung trong worker
+principal_cache = PrincipalCache()
+
+
+async def load_principal(user_id: str) -> Optional[Dict]:
+    """
+    User (PRINCIPAL_PROJECTION) theo id trong token: đọc cache trước, miss thì query MongoDB
+
+    Returns:
+        Bản copy của user, None nếu không tồn tại (không cache kết quả None)
+    """
+    epoch = principal_cache.epoch
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        user = principal_cache.get(user_id)
+        if user is not None:
+            return user
+
+    if not ObjectId.is_valid(user_id):
+        return None
+    users_collection = await get_collection("users")
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, PRINCIPAL_PROJECTION)
+    if user and settings.PRINCIPAL_CACHE_ENABLED:
+        principal_cache.put(user_id, user, epoch)
+    return user
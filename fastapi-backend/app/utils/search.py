@@ -0,0 +1,272 @@
+"""
+Product Search Engine
+- Inverted index in-process cho collection products (mỗi worker một bản)
+- Bỏ dấu tiếng Việt ("ao thun" khớp "Áo Thun"), tokenize, prefix cho từ cuối (search-as-you-type)
+- Xếp hạng BM25 theo field (name > category > description) kết hợp độ phổ biến
+- Cập nhật incremental: route ghi sản phẩm gọi upsert/remove, các worker khác
+  đồng bộ qua watermark updatedAt (chỉ đọc sản phẩm thay đổi; xóa mềm inStock=False cũng đổi updatedAt)
+- Document bị xóa hẳn khỏi DB không có updatedAt mới → build lại toàn bộ mỗi SEARCH_REBUILD_SECONDS
+  (build vào index mới rồi mới thay, request đang tìm kiếm không thấy index dở dang)
+"""
+
+import asyncio
+import math
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.config.database import get_collection
+from app.config.settings import settings
+
+# Trọng số field khi tính điểm
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0}
+
+# Tham số BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Mức ảnh hưởng của độ phổ biến lên điểm relevance (0 = bỏ qua)
+POPULARITY_WEIGHT = 0.3
+
+# Số từ tối đa mà 1 prefix được mở rộng thành
+MAX_PREFIX_EXPANSIONS = 50
+
+# Field cần đọc từ MongoDB để index
+SEARCH_PROJECTION = {
+    "name": 1, "description": 1, "category": 1,
+    "popular": 1, "soldCount": 1, "inStock": 1, "updatedAt": 1,
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_text(text: str) -> str:
+    """
+    Chuẩn hóa text để so khớp: chữ thường, bỏ dấu tiếng Việt
+
+    Examples:
+        >>> fold_text("Áo Thun Đen")
+        'ao thun den'
+    """
+    if not text:
+        return ""
+    # "đ" không phải ký tự có dấu trong Unicode nên phải thay thủ công
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách text (đã bỏ dấu) thành danh sách token chữ/số"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class ProductSearchIndex:
+    """Inverted index cho sản phẩm đang inStock"""
+
+    def __init__(self):
+        # token -> {product_id: weighted term frequency}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        # product_id -> {"tokens", "length", "category", "popular", "soldCount"}
+        self.docs: Dict[str, Dict] = {}
+        self.total_length = 0.0
+        self.max_sold = 0
+        self._vocabulary: Optional[List[str]] = None  # sorted, build lại khi cần
+        self.built = False
+        self.watermark: Optional[datetime] = None
+        self.last_refresh = 0.0
+        self.last_rebuild = 0.0
+        self._lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Ghi vào index
+    # ------------------------------------------------------------------
+    def upsert(self, product: Dict) -> None:
+        """Thêm hoặc cập nhật 1 sản phẩm (xóa khỏi index nếu không còn inStock)"""
+        product_id = str(product["_id"])
+        self.remove(product_id)
+        if not product.get("inStock", True):
+            return
+
+        weighted = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field) or ""):
+                weighted[token] += weight
+
+        length = sum(weighted.values())
+        for token, tf in weighted.items():
+            if token not in self.postings:
+                self._vocabulary = None
+            self.postings.setdefault(token, {})[product_id] = tf
+
+        sold = product.get("soldCount") or 0
+        self.max_sold = max(self.max_sold, sold)
+        self.docs[product_id] = {
+            "tokens": list(weighted),
+            "length": length,
+            "category": product.get("category"),
+            "popular": bool(product.get("popular")),
+            "soldCount": sold,
+        }
+        self.total_length += length
+
+    def remove(self, product_id: str) -> None:
+        """Xóa 1 sản phẩm khỏi index"""
+        doc = self.docs.pop(product_id, None)
+        if not doc:
+            return
+        self.total_length -= doc["length"]
+        for token in doc["tokens"]:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            if not posting:
+                del self.postings[token]
+                self._vocabulary = None
+
+    # ------------------------------------------------------------------
+    # Đồng bộ với MongoDB
+    # ------------------------------------------------------------------
+    async def ensure_fresh(self) -> None:
+        """
+        Build index lần đầu (và mỗi SEARCH_REBUILD_SECONDS), giữa các lần build chỉ đọc
+        các sản phẩm có updatedAt >= watermark (tối đa 1 lần mỗi SEARCH_REFRESH_SECONDS)
+        """
+        if self.built and time.monotonic() - self.last_refresh < settings.SEARCH_REFRESH_SECONDS:
+            return
+
+        async with self._lock:
+            if self.built and time.monotonic() - self.last_refresh < settings.SEARCH_REFRESH_SECONDS:
+                return
+
+            if not self.built or time.monotonic() - self.last_rebuild >= settings.SEARCH_REBUILD_SECONDS:
+                await self._rebuild()
+                return
+
+            products_collection = await get_collection("products")
+            # Dùng $gte để không bỏ sót update cùng millisecond (upsert là idempotent)
+            query = {"updatedAt": {"$gte": self.watermark}} if self.watermark else {"inStock": True}
+            async for product in products_collection.find(query, SEARCH_PROJECTION):
+                self._upsert_tracked(product)
+
+            self.last_refresh = time.monotonic()
+
+    async def _rebuild(self) -> None:
+        """Build index mới từ toàn bộ sản phẩm inStock rồi thay state hiện tại"""
+        started_at = datetime.utcnow()
+        fresh = ProductSearchIndex()
+        products_collection = await get_collection("products")
+        async for product in products_collection.find({"inStock": True}, SEARCH_PROJECTION):
+            fresh.upsert(product)
+
+        now = time.monotonic()
+        self.postings = fresh.postings
+        self.docs = fresh.docs
+        self.total_length = fresh.total_length
+        self.max_sold = fresh.max_sold
+        self._vocabulary = None
+        # Sản phẩm ghi trong lúc build (kể cả upsert/remove của worker này bị state mới ghi đè)
+        # có updatedAt >= started_at → lần refresh kế tiếp đọc lại
+        self.watermark = started_at
+        self.built = True
+        self.last_refresh = now
+        self.last_rebuild = now
+
+    def _upsert_tracked(self, product: Dict) -> None:
+        """upsert + đẩy watermark theo updatedAt của sản phẩm"""
+        self.upsert(product)
+        updated_at = product.get("updatedAt")
+        if updated_at and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Các token trong vocabulary bắt đầu bằng prefix"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, prefix)
+        matches = []
+        for token in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def _term_scores(self, terms: List[str]) -> Dict[str, float]:
+        """Điểm BM25 của mỗi sản phẩm khớp ít nhất 1 term (gộp theo max giữa các term)"""
+        n_docs = len(self.docs)
+        avg_length = (self.total_length / n_docs) if n_docs else 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            posting = self.postings.get(term, {})
+            df = len(posting)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for product_id, tf in posting.items():
+                length = self.docs[product_id]["length"]
+                norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                score = idf * norm
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def _popularity(self, product_id: str) -> float:
+        """Độ phổ biến chuẩn hóa về [0, 1]"""
+        doc = self.docs[product_id]
+        sold_score = math.log1p(doc["soldCount"]) / math.log1p(self.max_sold) if self.max_sold else 0.0
+        return 0.7 * sold_score + 0.3 * (1.0 if doc["popular"] else 0.0)
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        popular: Optional[bool] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Tìm sản phẩm khớp TẤT CẢ từ trong query (từ cuối khớp theo prefix)
+
+        Returns:
+            List (product_id, score) đã sắp xếp giảm dần theo score
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        combined: Optional[Dict[str, float]] = None
+        for position, token in enumerate(tokens):
+            is_last = position == len(tokens) - 1
+            terms = self._expand_prefix(token) if is_last else [token]
+            scores = self._term_scores(terms)
+            if combined is None:
+                combined = scores
+            else:
+                combined = {pid: combined[pid] + s for pid, s in scores.items() if pid in combined}
+            if not combined:
+                return []
+
+        results = []
+        for product_id, relevance in combined.items():
+            doc = self.docs[product_id]
+            if category is not None and doc["category"] != category:
+                continue
+            if popular is not None and doc["popular"] != popular:
+                continue
+            score = relevance * (1 + POPULARITY_WEIGHT * self._popularity(product_id))
+            results.append((product_id, score))
+
+        # Sắp xếp theo score, hòa thì theo id để thứ tự ổn định giữa các trang
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+
+# Index dùng chung trong worker
+product_search = ProductSearchIndex()
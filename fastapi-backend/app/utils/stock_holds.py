@@ -0,0 +1,196 @@
+"""
+Stock Holds cho đơn thanh toán online (Stripe / VNPay)
+- Kho được trừ ngay lúc tạo đơn "Pending Payment" (stockHeld=True), giữ trong STOCK_HOLD_MINUTES
+- Thanh toán thành công → chỉ chuyển trạng thái, KHÔNG trừ kho lần 2
+- Reaper chạy nền: hủy đơn quá hạn chưa thanh toán và hoàn kho theo batch
+- stockHeld là "khóa" hoàn kho: chỉ update nào lật được stockHeld True → False mới được hoàn kho,
+  nên hủy đơn / reaper / thanh toán chạy đua nhau cũng không hoàn kho 2 lần
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.utils.inventory import aggregate_quantities, release_stock, reserve_stock
+
+PENDING_STATUS = "Pending Payment"
+
+
+def order_holds_stock(order: Dict) -> bool:
+    """
+    Đơn có đang giữ kho không
+    Đơn tạo trước khi có stockHeld: COD và đơn đã thanh toán đã trừ kho, đơn online chờ thanh toán thì chưa
+    """
+    if "stockHeld" in order:
+        return bool(order["stockHeld"])
+    return order.get("paymentMethod") == "COD" or bool(order.get("isPaid"))
+
+
+def hold_expires_at(created_at: datetime) -> datetime:
+    """Thời điểm đơn chờ thanh toán hết hạn giữ kho (reaper hủy đơn sau mốc này)"""
+    return created_at + timedelta(minutes=settings.STOCK_HOLD_MINUTES)
+
+
+def hold_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Đơn chờ thanh toán tạo trước thời điểm này đã hết hạn giữ kho"""
+    return (now or datetime.utcnow()) - timedelta(minutes=settings.STOCK_HOLD_MINUTES)
+
+
+async def release_order_stock(order: Dict) -> bool:
+    """
+    Hoàn kho của 1 đơn đúng 1 lần (dùng khi hủy đơn)
+
+    Returns:
+        True nếu lần gọi này đã hoàn kho
+    """
+    if not order_holds_stock(order):
+        return False
+
+    orders_collection = await get_collection("orders")
+    result = await orders_collection.update_one(
+        {"_id": order["_id"], "$or": [{"stockHeld": True}, {"stockHeld": {"$exists": False}}]},
+        {"$set": {"stockHeld": False, "stockReleased": True, "updatedAt": datetime.utcnow()}}
+    )
+    if result.modified_count == 0:
+        return False
+
+    await release_stock(aggregate_quantities(order["items"]))
+    return True
+
+
+async def cancel_unpaid_order(order: Dict, reason: str) -> bool:
+    """
+    Hủy đơn chờ thanh toán (thanh toán thất bại / session hết hạn) và hoàn kho
+
+    Returns:
+        True nếu lần gọi này đã hủy đơn (đơn đã thanh toán / đã hủy thì bỏ qua)
+    """
+    orders_collection = await get_collection("orders")
+    result = await orders_collection.update_one(
+        {"_id": order["_id"], "isPaid": False, "status": PENDING_STATUS},
+        {"$set": {"status": "Cancelled", "cancelReason": reason, "updatedAt": datetime.utcnow()}}
+    )
+    if result.modified_count == 0:
+        return False
+    await release_order_stock(order)
+    return True
+
+
+async def confirm_order_payment(order: Dict, payment_fields: Dict) -> str:
+    """
+    Đánh dấu đơn đã thanh toán (idempotent, không trừ kho lần 2)
+
+    Args:
+        order: Document order
+        payment_fields: Field lưu thêm (vd: {"vnpayTransactionNo": ...})
+
+    Returns:
+        "paid" | "already_paid" | "out_of_stock" (đã thanh toán nhưng hết hàng → cần hoàn tiền)
+    """
+    orders_collection = await get_collection("orders")
+    now = datetime.utcnow()
+    paid_fields = {
+        **payment_fields,
+        "isPaid": True,
+        "paidAt": now,
+        "status": "Order Placed",
+        "updatedAt": now
+    }
+
+    # Bước 1: Đơn còn đang giữ kho → chỉ chuyển trạng thái
+    result = await orders_collection.update_one(
+        {"_id": order["_id"], "isPaid": False, "stockHeld": True, "status": PENDING_STATUS},
+        {"$set": paid_fields}
+    )
+    if result.modified_count:
+        return "paid"
+
+    order = await orders_collection.find_one({"_id": order["_id"]})
+    if order.get("isPaid"):
+        return "already_paid"
+
+    # Bước 2: Hold đã hết hạn (reaper đã hủy + hoàn kho) hoặc đơn cũ chưa giữ kho → trừ kho lại
+    try:
+        reserved = await reserve_stock(order["items"])
+    except HTTPException:
+        await orders_collection.update_one(
+            {"_id": order["_id"], "isPaid": False},
+            {"$set": {
+                **payment_fields,
+                "isPaid": True,
+                "paidAt": now,
+                "paymentIssue": "out_of_stock",
+                "updatedAt": now
+            }}
+        )
+        print(f"⚠️ Order {order['_id']} paid after stock hold expired and is out of stock - refund needed")
+        return "out_of_stock"
+
+    result = await orders_collection.update_one(
+        {"_id": order["_id"], "isPaid": False},
+        {"$set": {**paid_fields, "stockHeld": True, "stockReleased": False}}
+    )
+    if result.modified_count == 0:
+        # Request khác đã xác nhận thanh toán trong lúc này → trả lại phần vừa trừ
+        await release_stock(reserved)
+        return "already_paid"
+    return "paid"
+
+
+async def release_expired_holds(now: Optional[datetime] = None) -> Dict:
+    """
+    Hủy các đơn chờ thanh toán quá hạn và hoàn kho (chạy định kỳ)
+
+    Returns:
+        dict: {"cancelled": số đơn đã hủy, "released": số đơn được hoàn kho}
+    """
+    now = now or datetime.utcnow()
+    orders_collection = await get_collection("orders")
+    batch_size = settings.STOCK_HOLD_REAPER_BATCH_SIZE
+    cancelled = 0
+    released = 0
+
+    while True:
+        # Query nóng: index orders_status_createdAt_id
+        orders = await orders_collection.find(
+            {"status": PENDING_STATUS, "createdAt": {"$lte": hold_cutoff(now)}},
+            {"items": 1, "stockHeld": 1, "isPaid": 1, "paymentMethod": 1}
+        ).sort("createdAt", 1).limit(batch_size).to_list(length=batch_size)
+
+        to_release: Dict[str, int] = {}
+        batch_cancelled = 0
+        for order in orders:
+            held = order_holds_stock(order)
+            # Điều kiện status + isPaid + stockHeld: không hủy đơn vừa được thanh toán / vừa hoàn kho
+            result = await orders_collection.update_one(
+                {"_id": order["_id"], "status": PENDING_STATUS, "isPaid": False, "stockHeld": order.get("stockHeld")},
+                {"$set": {
+                    "status": "Cancelled",
+                    "cancelReason": "payment_timeout",
+                    "stockHeld": False,
+                    "stockReleased": held,
+                    "updatedAt": now
+                }}
+            )
+            if result.modified_count == 0:
+                continue
+            batch_cancelled += 1
+            if held:
+                released += 1
+                for product_id, quantity in aggregate_quantities(order["items"]).items():
+                    to_release[product_id] = to_release.get(product_id, 0) + quantity
+
+        # Hoàn kho cả batch bằng 1 lệnh bulk_write
+        await release_stock(to_release)
+        cancelled += batch_cancelled
+
+        # Hết đơn quá hạn, hoặc cả batch không hủy được đơn nào (tránh lặp vô hạn)
+        if len(orders) < batch_size or batch_cancelled == 0:
+            break
+
+    if cancelled:
+        print(f"⏳ Stock hold reaper: cancelled {cancelled} expired orders, released stock of {released}")
+    return {"cancelled": cancelled, "released": released}
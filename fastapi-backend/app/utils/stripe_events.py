@@ -0,0 +1,165 @@
+"""
+Stripe Webhook Events
+- Mỗi event được lưu vào collection stripe_events với _id = event id (unique)
+  → Stripe gửi lại cùng event nhiều lần cũng chỉ xử lý 1 lần
+- Route webhook chỉ verify chữ ký + lưu event rồi trả 200 ngay; xử lý (xác nhận thanh toán,
+  hủy đơn, xóa giỏ hàng) chạy nền sau khi trả response
+- Event xử lý lỗi / worker chết giữa chừng được job nền xử lý lại (tối đa STRIPE_EVENT_MAX_ATTEMPTS lần)
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config.database import get_collection
+from app.utils import cart_store
+from app.config.settings import settings
+from app.utils.stock_holds import cancel_unpaid_order, confirm_order_payment
+
+STRIPE_EVENTS_COLLECTION = "stripe_events"
+
+# Event type → thanh toán thành công / thất bại
+PAID_EVENT_TYPES = {"checkout.session.completed", "checkout.session.async_payment_succeeded"}
+FAILED_EVENT_TYPES = {"checkout.session.expired", "checkout.session.async_payment_failed"}
+HANDLED_EVENT_TYPES = PAID_EVENT_TYPES | FAILED_EVENT_TYPES
+
+# Event đang "processing" quá lâu (worker chết giữa chừng) → cho xử lý lại
+_STALE_PROCESSING_SECONDS = 300
+
+
+async def record_event(event) -> bool:
+    """
+    Lưu event (chỉ các field cần để xử lý)
+
+    Returns:
+        True nếu là event mới, False nếu đã nhận rồi (Stripe gửi lại)
+    """
+    session = event["data"]["object"]
+    now = datetime.utcnow()
+    events_collection = await get_collection(STRIPE_EVENTS_COLLECTION)
+    try:
+        await events_collection.insert_one({
+            "_id": event["id"],
+            "type": event["type"],
+            "session": {
+                "id": session.get("id"),
+                "paymentStatus": session.get("payment_status"),
+                "paymentIntent": session.get("payment_intent"),
+                "orderId": (session.get("metadata") or {}).get("orderId"),
+            },
+            "status": "pending",
+            "attempts": 0,
+            "createdAt": now,
+            "updatedAt": now,
+            "expiresAt": now + timedelta(days=settings.STRIPE_EVENT_TTL_DAYS)
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def _find_order(session: Dict) -> Optional[Dict]:
+    orders_collection = await get_collection("orders")
+    order_id = session.get("orderId")
+    if order_id and ObjectId.is_valid(order_id):
+        order = await orders_collection.find_one({"_id": ObjectId(order_id)})
+        if order:
+            return order
+    if session.get("id"):
+        return await orders_collection.find_one({"stripeSessionId": session["id"]})
+    return None
+
+
+async def _apply_event(event: Dict) -> str:
+    """Side effect của 1 event; trả về kết quả để lưu lại"""
+    session = event["session"]
+    order = await _find_order(session)
+    if not order:
+        return "order_not_found"
+
+    if event["type"] in FAILED_EVENT_TYPES:
+        reason = "payment_timeout" if event["type"] == "checkout.session.expired" else "payment_failed"
+        cancelled = await cancel_unpaid_order(order, reason)
+        return "cancelled" if cancelled else "ignored"
+
+    # checkout.session.completed với phương thức thanh toán chậm: chờ async_payment_succeeded
+    if session.get("paymentStatus") != "paid":
+        return "awaiting_payment"
+
+    payment_fields = {"stripeSessionId": session.get("id")}
+    if session.get("paymentIntent"):
+        payment_fields["stripePaymentIntent"] = session["paymentIntent"]
+    outcome = await confirm_order_payment(order, payment_fields)
+
+    if outcome == "paid" and order.get("userId"):
+        await cart_store.clear_cart(order["userId"])
+    return outcome
+
+
+async def process_event(event_id: str) -> Optional[str]:
+    """
+    Xử lý 1 event đã lưu (idempotent: claim bằng update có điều kiện, chỉ 1 worker xử lý)
+
+    Returns:
+        Kết quả xử lý, None nếu event không cần / không được xử lý
+    """
+    events_collection = await get_collection(STRIPE_EVENTS_COLLECTION)
+    now = datetime.utcnow()
+    event = await events_collection.find_one_and_update(
+        {
+            "_id": event_id,
+            "attempts": {"$lt": settings.STRIPE_EVENT_MAX_ATTEMPTS},
+            "$or": [
+                {"status": {"$in": ["pending", "failed"]}},
+                {"status": "processing", "updatedAt": {"$lt": now - timedelta(seconds=_STALE_PROCESSING_SECONDS)}},
+            ]
+        },
+        {"$set": {"status": "processing", "updatedAt": now}, "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not event:
+        return None
+
+    try:
+        result = await _apply_event(event)
+    except Exception as e:
+        await events_collection.update_one(
+            {"_id": event_id},
+            {"$set": {"status": "failed", "error": str(e), "updatedAt": datetime.utcnow()}}
+        )
+        print(f"❌ Stripe event {event_id} ({event['type']}) failed: {str(e)}")
+        return None
+
+    await events_collection.update_one(
+        {"_id": event_id},
+        {"$set": {"status": "processed", "result": result, "processedAt": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
+    )
+    return result
+
+
+async def retry_pending_events() -> int:
+    """
+    Xử lý lại các event lỗi / bị bỏ dở (chạy định kỳ)
+
+    Returns:
+        Số event đã thử xử lý lại
+    """
+    events_collection = await get_collection(STRIPE_EVENTS_COLLECTION)
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.STRIPE_EVENT_RETRY_INTERVAL_SECONDS)
+    retried = 0
+    async for event in events_collection.find(
+        {
+            "status": {"$in": ["pending", "failed", "processing"]},
+            "updatedAt": {"$lt": cutoff},
+            "attempts": {"$lt": settings.STRIPE_EVENT_MAX_ATTEMPTS}
+        },
+        {"_id": 1}
+    ).limit(100):
+        if await process_event(event["_id"]) is not None:
+            retried += 1
+    if retried:
+        print(f"🔁 Stripe events: reprocessed {retried} pending events")
+    return retried
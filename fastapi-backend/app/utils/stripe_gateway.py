@@ -0,0 +1,192 @@
+"""
+Stripe Payment Gateway Adapter
+- SDK của Stripe là blocking → chạy trong thread pool riêng (giới hạn số thread) để không chặn event loop
+- Timeout cho cả HTTP request (giải phóng thread) và phía asyncio (wait_for)
+- Retry lỗi tạm thời (mất kết nối, timeout, 429, 5xx) với exponential backoff + full jitter
+- Circuit breaker: Stripe lỗi liên tục → từ chối ngay (503) trong STRIPE_BREAKER_RESET_SECONDS
+  thay vì để mọi request treo chờ timeout
+- Tạo checkout session luôn kèm idempotency_key → retry không tạo session trùng
+- session_expires_at: session hết hạn cùng lúc với hạn giữ kho của đơn
+- STRIPE_API_BASE trỏ sang server giả lập (scripts/stripe_stub_server.py) khi test
+"""
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Optional
+
+import stripe
+from stripe._http_client import new_default_http_client
+
+from app.config.settings import settings
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
+# Retry do adapter tự làm (có jitter + circuit breaker), SDK không retry thêm
+stripe.max_network_retries = 0
+stripe.default_http_client = new_default_http_client(timeout=settings.STRIPE_TIMEOUT_SECONDS)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.STRIPE_MAX_WORKERS,
+    thread_name_prefix="stripe"
+)
+
+# Lỗi tạm thời, retry được (lỗi dữ liệu / xác thực thì retry cũng không khác)
+RETRYABLE_ERRORS = (
+    stripe.APIConnectionError,
+    stripe.RateLimitError,
+    stripe.APIError,
+    asyncio.TimeoutError,
+)
+
+
+# Giới hạn expires_at của Checkout Session (tính từ lúc tạo session)
+SESSION_MIN_LIFETIME = timedelta(minutes=30)
+SESSION_MAX_LIFETIME = timedelta(hours=24)
+SESSION_CLOCK_MARGIN = timedelta(minutes=1)  # Lệch giờ giữa server và Stripe
+
+
+def session_expires_at(hold_until: datetime, now: Optional[datetime] = None) -> int:
+    """
+    Unix timestamp cho expires_at của Checkout Session: hết hạn cùng lúc với hạn giữ kho,
+    kẹp trong khoảng Stripe cho phép (tối thiểu 30 phút, tối đa 24 giờ kể từ lúc tạo)
+
+    Args:
+        hold_until: Hạn giữ kho của đơn (UTC không timezone)
+    """
+    now = now or datetime.utcnow()
+    expires = min(
+        max(hold_until, now + SESSION_MIN_LIFETIME + SESSION_CLOCK_MARGIN),
+        now + SESSION_MAX_LIFETIME - SESSION_CLOCK_MARGIN
+    )
+    return int(expires.replace(tzinfo=timezone.utc).timestamp())
+
+
+class PaymentGatewayUnavailable(Exception):
+    """Circuit breaker đang mở: tạm thời không gọi Stripe"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker đơn giản (mỗi worker 1 instance)
+    - closed: gọi bình thường, đếm số lần lỗi liên tiếp
+    - open: đủ failure_threshold lần lỗi → từ chối ngay trong reset_seconds
+    - half-open: hết reset_seconds → cho 1 request thử, thành công thì đóng lại, lỗi thì mở tiếp
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            raise PaymentGatewayUnavailable("Stripe circuit breaker is open")
+        if state == "half_open":
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"⚠️ Stripe circuit breaker opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutiveFailures": self.failures}
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.STRIPE_BREAKER_FAILURES,
+    reset_seconds=settings.STRIPE_BREAKER_RESET_SECONDS
+)
+
+
+async def _call(func, *args, **kwargs):
+    """
+    Gọi 1 hàm của Stripe SDK: thread pool + timeout + retry có jitter + circuit breaker
+
+    Raises:
+        PaymentGatewayUnavailable nếu circuit breaker đang mở
+        Lỗi của Stripe (hoặc asyncio.TimeoutError) nếu hết lượt retry / lỗi không retry được
+    """
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(_executor, partial(func, *args, **kwargs)),
+                timeout=settings.STRIPE_TIMEOUT_SECONDS
+            )
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            if attempt >= settings.STRIPE_MAX_RETRIES:
+                raise
+            # Exponential backoff + full jitter: tránh mọi worker retry cùng lúc
+            delay = random.uniform(0, settings.STRIPE_RETRY_BASE_SECONDS * (2 ** attempt))
+            attempt += 1
+            print(f"⚠️ Stripe call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        except stripe.StripeError:
+            # Lỗi phía request (card, tham số...) - Stripe vẫn phản hồi bình thường
+            breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            # Request bị hủy giữa chừng → không giữ lượt thử của half-open
+            breaker.trial_in_flight = False
+            raise
+        breaker.record_success()
+        return result
+
+
+async def create_checkout_session(idempotency_key: str, **params):
+    """
+    Tạo Stripe Checkout Session
+
+    Args:
+        idempotency_key: Key gửi kèm cho Stripe (retry cùng key → cùng session)
+        **params: Tham số của stripe.checkout.Session.create
+    """
+    return await _call(stripe.checkout.Session.create, idempotency_key=idempotency_key, **params)
+
+
+async def retrieve_checkout_session(session_id: str):
+    """Lấy Stripe Checkout Session theo id"""
+    return await _call(stripe.checkout.Session.retrieve, session_id)
+
+
+def construct_webhook_event(payload: bytes, signature: Optional[str]):
+    """
+    Verify chữ ký Stripe-Signature và parse event (không gọi mạng)
+
+    Raises:
+        ValueError nếu payload không hợp lệ, stripe.SignatureVerificationError nếu sai chữ ký
+    """
+    return stripe.Webhook.construct_event(payload, signature or "", settings.STRIPE_WEBHOOK_SECRET)
+
+
+# Lỗi verify webhook (route trả 400)
+WEBHOOK_ERRORS = (ValueError, stripe.SignatureVerificationError)
@@ -0,0 +1,65 @@
+"""
+Collection Version Counters
+- Mỗi collection "public" có 1 bộ đếm version trong app_meta, tăng mỗi khi ghi
+- Cache trong worker đọc version (tối đa 1 query mỗi VERSION_CHECK_SECONDS)
+  để biết khi nào cần build lại, không cần quét collection
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+from pymongo import ReturnDocument
+
+from app.config.database import get_collection
+from app.config.indexes import META_COLLECTION
+from app.config.settings import settings
+
+# name -> (version, updatedAt, thời điểm đọc theo time.monotonic())
+_local_versions: Dict[str, Tuple[int, datetime, float]] = {}
+
+
+def _meta_id(name: str) -> str:
+    return f"version:{name}"
+
+
+async def bump_version(name: str) -> int:
+    """
+    Tăng version của collection sau khi ghi (gọi từ các route thay đổi dữ liệu)
+
+    Args:
+        name: Tên collection (vd: "products")
+
+    Returns:
+        Version mới
+    """
+    meta_collection = await get_collection(META_COLLECTION)
+    now = datetime.utcnow()
+    doc = await meta_collection.find_one_and_update(
+        {"_id": _meta_id(name)},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    # Worker hiện tại thấy version mới ngay, worker khác thấy sau tối đa VERSION_CHECK_SECONDS
+    _local_versions[name] = (doc["version"], doc["updatedAt"], time.monotonic())
+    return doc["version"]
+
+
+async def get_version(name: str) -> Tuple[int, datetime]:
+    """
+    Lấy (version, updatedAt) của collection, cache trong worker
+
+    Returns:
+        Tuple (version, updatedAt). Collection chưa từng ghi → (0, epoch)
+    """
+    cached = _local_versions.get(name)
+    if cached and time.monotonic() - cached[2] < settings.VERSION_CHECK_SECONDS:
+        return cached[0], cached[1]
+
+    meta_collection = await get_collection(META_COLLECTION)
+    doc = await meta_collection.find_one({"_id": _meta_id(name)})
+    version = doc["version"] if doc else 0
+    updated_at = doc["updatedAt"] if doc else datetime(1970, 1, 1)
+    _local_versions[name] = (version, updated_at, time.monotonic())
+    return version, updated_at
@@ -6,10 +6,22 @@ import hashlib
 import hmac
 import urllib.parse
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 from app.config.settings import settings
 
 
+# HMAC đã nạp sẵn secret key: mỗi lần ký chỉ copy() thay vì khởi tạo lại key
+_hmac_base = hmac.new(settings.VNPAY_HASH_SECRET.encode('utf-8'), digestmod=hashlib.sha512)
+
+
+def _encode_value(value) -> str:
+    """URL encode kiểu quote_plus; giá trị chỉ gồm chữ/số ASCII (đa số field VNPay) giữ nguyên"""
+    value = str(value)
+    if value.isascii() and value.isalnum():
+        return value
+    return urllib.parse.quote_plus(value)
+
+
 def sort_params(params: Dict) -> Dict:
     """
     Sắp xếp params theo alphabet (yêu cầu của VNPay)
@@ -17,44 +29,26 @@ def sort_params(params: Dict) -> Dict:
     return dict(sorted(params.items()))
 
 
-def create_secure_hash(params: Dict, secret_key: str) -> str:
+def create_secure_hash(params: Dict, secret_key: Optional[str] = None) -> str:
     """
     Tạo HMAC SHA512 hash từ params và secret key
     
     Args:
         params: Dictionary chứa các params cần hash
-        secret_key: VNPay secret key
+        secret_key: VNPay secret key (None = VNPAY_HASH_SECRET, dùng HMAC đã nạp sẵn key)
     
     Returns:
         Hex string của HMAC SHA512 hash
     """
-    # Sort params theo alphabet
-    sorted_params = sort_params(params)
-    
-    # Tạo query string - VNPay yêu cầu URL encode các giá trị
-    hash_data_parts = []
-    for key, value in sorted_params.items():
-        # URL encode value theo chuẩn VNPay
-        encoded_value = urllib.parse.quote_plus(str(value))
-        hash_data_parts.append(f"{key}={encoded_value}")
-    
-    hash_data = "&".join(hash_data_parts)
-    
-    # Debug logging
-    print(f"🔐 Creating secure hash:")
-    print(f"   Hash data: {hash_data}")
-    print(f"   Secret key: {secret_key}")
-    
-    # HMAC SHA512
-    secure_hash = hmac.new(
-        secret_key.encode('utf-8'),
-        hash_data.encode('utf-8'),
-        hashlib.sha512
-    ).hexdigest()
-    
-    print(f"   Generated hash: {secure_hash}")
-    
-    return secure_hash
+    # Query string sort theo alphabet, value URL encode kiểu quote_plus (chuẩn VNPay)
+    hash_data = '&'.join([f"{key}={_encode_value(value)}" for key, value in sorted(params.items())])
+    
+    if secret_key is None or secret_key == settings.VNPAY_HASH_SECRET:
+        mac = _hmac_base.copy()
+    else:
+        mac = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha512)
+    mac.update(hash_data.encode('utf-8'))
+    return mac.hexdigest()
 
 
 def create_payment_url(
@@ -91,15 +85,8 @@ def create_payment_url(
         'vnp_CreateDate': datetime.now().strftime('%Y%m%d%H%M%S')
     }
     
-    print(f"🔍 VNPay Payment URL Creation:")
-    print(f"   Order ID: {order_id}")
-    print(f"   Amount: {amount} VND")
-    print(f"   Amount for VNPay (x100): {int(amount * 100)}")
-    print(f"   TMN Code: {settings.VNPAY_TMN_CODE}")
-    print(f"   Return URL: {settings.VNPAY_RETURN_URL}")
-    
     # Tạo secure hash
-    secure_hash = create_secure_hash(params, settings.VNPAY_HASH_SECRET)
+    secure_hash = create_secure_hash(params)
     params['vnp_SecureHash'] = secure_hash
     
     # Build URL với query string
@@ -122,7 +109,6 @@ def verify_payment_signature(params: Dict) -> bool:
     # Lấy signature từ params
     vnp_secure_hash = params.get('vnp_SecureHash')
     if not vnp_secure_hash:
-        print("❌ No vnp_SecureHash in params")
         return False
     
     # Loại bỏ vnp_SecureHash và vnp_SecureHashType khỏi params
@@ -130,16 +116,10 @@ def verify_payment_signature(params: Dict) -> bool:
                      if k not in ['vnp_SecureHash', 'vnp_SecureHashType']}
     
     # Tạo hash từ params còn lại
-    calculated_hash = create_secure_hash(verify_params, settings.VNPAY_HASH_SECRET)
-    
-    # Debug logging
-    print(f"🔍 VNPay Signature Verification:")
-    print(f"   Received hash: {vnp_secure_hash}")
-    print(f"   Calculated hash: {calculated_hash}")
-    print(f"   Match: {calculated_hash == vnp_secure_hash}")
+    calculated_hash = create_secure_hash(verify_params)
     
-    # So sánh hash
-    return calculated_hash == vnp_secure_hash
+    # So sánh constant-time (không lộ số ký tự khớp qua thời gian phản hồi)
+    return hmac.compare_digest(calculated_hash, vnp_secure_hash.lower())
 
 
 def get_client_ip(request) -> str:
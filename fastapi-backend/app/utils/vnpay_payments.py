@@ -0,0 +1,80 @@
+"""
+VNPay IPN (Instant Payment Notification)
+- VNPay gọi server-to-server tới /api/order/vnpay-ipn sau mỗi giao dịch → xác nhận / hủy đơn tại đây,
+  không phụ thuộc vào việc trình duyệt của khách có quay về vnpay-return hay không
+- Idempotent theo vnp_TxnRef (= order id): VNPay gửi lại IPN nhiều lần, đơn đã xử lý thì trả "02"
+  và không làm gì thêm; update có điều kiện trong stock_holds chặn các lần gọi chạy đua
+- Kết quả trả về theo mã RspCode VNPay yêu cầu (VNPay chỉ ngừng gửi lại khi nhận "00" hoặc "02")
+"""
+
+from typing import Dict, Tuple
+
+from bson import ObjectId
+
+from app.config.database import get_collection
+from app.utils import cart_store
+from app.utils.stock_holds import PENDING_STATUS, cancel_unpaid_order, confirm_order_payment
+
+# RspCode → Message theo tài liệu VNPay
+IPN_RESPONSES = {
+    "00": "Confirm Success",
+    "01": "Order not found",
+    "02": "Order already confirmed",
+    "04": "Invalid amount",
+    "97": "Invalid Checksum",
+    "99": "Unknow error",
+}
+
+
+def ipn_response(code: str) -> Dict:
+    """Body JSON trả về cho VNPay"""
+    return {"RspCode": code, "Message": IPN_RESPONSES[code]}
+
+
+def is_successful_payment(params: Dict) -> bool:
+    """Giao dịch thành công: cả vnp_ResponseCode và vnp_TransactionStatus đều là "00" """
+    return params.get("vnp_ResponseCode") == "00" and params.get("vnp_TransactionStatus", "00") == "00"
+
+
+async def apply_payment_result(params: Dict) -> Tuple[str, str]:
+    """
+    Xác nhận / hủy đơn theo kết quả giao dịch VNPay (params đã verify chữ ký)
+
+    Returns:
+        (RspCode, kết quả xử lý) - kết quả: "paid" | "out_of_stock" | "cancelled" | "already_processed" | ...
+    """
+    order_id = params.get("vnp_TxnRef")
+    if not order_id or not ObjectId.is_valid(order_id):
+        return "01", "order_not_found"
+
+    orders_collection = await get_collection("orders")
+    order = await orders_collection.find_one({"_id": ObjectId(order_id)})
+    if not order or order.get("paymentMethod") != "VNPay":
+        return "01", "order_not_found"
+
+    # Số tiền VNPay gửi về = số tiền lúc tạo URL thanh toán (VND x 100)
+    try:
+        amount = int(params.get("vnp_Amount", ""))
+    except ValueError:
+        return "04", "invalid_amount"
+    if amount != int(order["amount"]) * 100:
+        return "04", "invalid_amount"
+
+    # Đơn đã thanh toán / đã hủy → lần gửi lại của VNPay, không xử lý lần 2
+    if order.get("isPaid"):
+        return "02", "already_processed"
+
+    if not is_successful_payment(params):
+        if order.get("status") != PENDING_STATUS:
+            return "02", "already_processed"
+        cancelled = await cancel_unpaid_order(order, "payment_failed")
+        return ("00", "cancelled") if cancelled else ("02", "already_processed")
+
+    # Thành công: đơn bị reaper hủy do hết hạn giữ kho vẫn được xác nhận (confirm_order_payment trừ kho lại)
+    outcome = await confirm_order_payment(order, {"vnpayTransactionNo": params.get("vnp_TransactionNo")})
+    if outcome == "already_paid":
+        return "02", "already_processed"
+
+    if order.get("userId"):
+        await cart_store.clear_cart(order["userId"])
+    return "00", outcome
@@ -4,14 +4,25 @@ from contextlib import asynccontextmanager
 import uvicorn
 
 from app.config.database import connect_to_mongo, close_mongo_connection
+from app.config.settings import settings
+from app.utils.background import start_periodic_task, stop_periodic_tasks
+from app.utils.discount_scheduler import run_discount_schedule
+from app.utils.stock_holds import release_expired_holds
+from app.utils.stripe_events import retry_pending_events
 from app.routes import user_routes, product_routes, cart_routes, order_routes, admin_routes, category_routes, blog_routes, testimonial_routes, report_routes, contact_routes, review_routes, wishlist_routes, settings_routes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    if settings.DISCOUNT_SCHEDULER_ENABLED:
+        start_periodic_task("discount-scheduler", settings.DISCOUNT_SCHEDULER_INTERVAL_SECONDS, run_discount_schedule)
+    start_periodic_task("stock-hold-reaper", settings.STOCK_HOLD_REAPER_INTERVAL_SECONDS, release_expired_holds)
+    if settings.STRIPE_WEBHOOK_SECRET:
+        start_periodic_task("stripe-event-retry", settings.STRIPE_EVENT_RETRY_INTERVAL_SECONDS, retry_pending_events)
     yield
     # Shutdown
+    await stop_periodic_tasks()
     await close_mongo_connection()
 
 app = FastAPI(
@@ -0,0 +1,132 @@
+"""
+Benchmark: Áp dụng discount cho cả danh mục
+
+Chạy script:
+    python scripts/benchmark_bulk_discount.py [số_sản_phẩm]
+
+So sánh:
+    1. find() + update_one() từng sản phẩm (cách cũ của /apply-discount)
+    2. bulk_write() unordered với offerPrice tính sẵn trong Python
+    3. update_many() với update pipeline, offerPrice tính trên server (cách hiện tại)
+
+Script tạo dữ liệu giả trong database riêng "<DATABASE_NAME>_bench" và xóa sau khi chạy.
+Sau mỗi cách, offerPrice được kiểm tra lại với calculate_offer_price().
+"""
+
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.config.settings import settings
+from app.models.product import offer_price_expression
+from app.routes.product_routes import calculate_offer_price
+
+CATEGORY = "Men"
+DISCOUNT_PERCENT = 17.5
+
+
+def make_product(i: int) -> dict:
+    """Tạo 1 sản phẩm giả (giá lẻ đến 100 VND để kiểm tra làm tròn)"""
+    price = float(random.randint(500, 20000) * 100)
+    return {
+        "name": f"Sản phẩm {i}",
+        "category": CATEGORY,
+        "price": price,
+        "offerPrice": price,
+        "hasDiscount": False,
+        "discountPercent": 0.0,
+        "inStock": True,
+    }
+
+
+async def loop_update(collection) -> None:
+    products = await collection.find({"category": CATEGORY, "inStock": True}).to_list(length=None)
+    for product in products:
+        await collection.update_one(
+            {"_id": product["_id"]},
+            {"$set": {
+                "hasDiscount": True,
+                "discountPercent": DISCOUNT_PERCENT,
+                "offerPrice": calculate_offer_price(product["price"], DISCOUNT_PERCENT),
+                "updatedAt": datetime.utcnow()
+            }}
+        )
+
+
+async def bulk_write_update(collection) -> None:
+    now = datetime.utcnow()
+    operations = []
+    async for product in collection.find({"category": CATEGORY, "inStock": True}, {"price": 1}):
+        operations.append(UpdateOne(
+            {"_id": product["_id"]},
+            {"$set": {
+                "hasDiscount": True,
+                "discountPercent": DISCOUNT_PERCENT,
+                "offerPrice": calculate_offer_price(product["price"], DISCOUNT_PERCENT),
+                "updatedAt": now
+            }}
+        ))
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+
+async def pipeline_update(collection) -> None:
+    await collection.update_many({"category": CATEGORY, "inStock": True}, [{"$set": {
+        "hasDiscount": True,
+        "discountPercent": DISCOUNT_PERCENT,
+        "offerPrice": offer_price_expression(DISCOUNT_PERCENT),
+        "updatedAt": datetime.utcnow()
+    }}])
+
+
+async def verify(collection) -> int:
+    """Đếm số sản phẩm có offerPrice khác với calculate_offer_price()"""
+    mismatches = 0
+    async for product in collection.find({}, {"price": 1, "offerPrice": 1}):
+        if product["offerPrice"] != calculate_offer_price(product["price"], DISCOUNT_PERCENT):
+            mismatches += 1
+    return mismatches
+
+
+async def benchmark(count: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[f"{settings.DATABASE_NAME}_bench"]
+    collection = database["products_discount_bench"]
+    products = [make_product(i) for i in range(count)]
+
+    try:
+        print(f"🚀 Áp dụng {DISCOUNT_PERCENT}% discount cho {count} sản phẩm:")
+        for label, fn in [
+            ("find + update_one (cũ)", loop_update),
+            ("bulk_write unordered", bulk_write_update),
+            ("update_many pipeline", pipeline_update),
+        ]:
+            # Mỗi cách chạy trên dữ liệu mới (chưa có discount)
+            await collection.drop()
+            await collection.insert_many([dict(product) for product in products])
+            await collection.create_index([("category", 1)])
+
+            start = time.perf_counter()
+            await fn(collection)
+            elapsed = time.perf_counter() - start
+
+            mismatches = await verify(collection)
+            status_icon = "✅" if mismatches == 0 else f"❌ {mismatches} offerPrice sai"
+            print(f"   {label:<26} {elapsed * 1000:10.1f} ms   {status_icon}")
+
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    asyncio.run(benchmark(product_count))
@@ -0,0 +1,112 @@
+"""
+Benchmark: So sánh 3 cách tìm kiếm sản phẩm
+
+Chạy script:
+    python scripts/benchmark_search.py [số_sản_phẩm]
+
+So sánh:
+    1. $regex không anchor trên name/description (cách cũ của /api/product/list?search=)
+    2. MongoDB text index ($text)
+    3. Inverted index in-process (app/utils/search.py)
+
+Script tạo dữ liệu giả trong database riêng "<DATABASE_NAME>_bench" và xóa sau khi chạy.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config.settings import settings
+from app.utils.search import ProductSearchIndex, SEARCH_PROJECTION
+
+PRODUCT_TYPES = ["Áo Thun", "Áo Sơ Mi", "Quần Jean", "Quần Short", "Váy", "Đầm", "Áo Khoác", "Hoodie"]
+ADJECTIVES = ["Cổ Điển", "Basic", "Oversize", "Thể Thao", "Công Sở", "Dạo Phố", "Cao Cấp", "Mùa Hè"]
+COLORS = ["Đen", "Trắng", "Xanh Navy", "Đỏ", "Be", "Xám", "Hồng", "Nâu"]
+CATEGORIES = ["Men", "Women", "Kids"]
+QUERIES = ["ao thun", "Áo Thun", "quan jean den", "hoodie", "vay hong", "ao kho", "cao cap"]
+ROUNDS = 20
+
+
+def make_product(i: int) -> dict:
+    """Tạo 1 sản phẩm giả"""
+    name = f"{random.choice(PRODUCT_TYPES)} {random.choice(ADJECTIVES)} {random.choice(COLORS)}"
+    return {
+        "name": name,
+        "description": f"{name} chất liệu cotton thoáng mát, form chuẩn, mã {i}. " * 4,
+        "category": random.choice(CATEGORIES),
+        "popular": random.random() < 0.1,
+        "soldCount": random.randint(0, 500),
+        "inStock": True,
+    }
+
+
+async def timed(label: str, fn) -> None:
+    """Chạy fn ROUNDS lần cho mỗi query và in latency trung bình"""
+    start = time.perf_counter()
+    hits = 0
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            hits += await fn(query)
+    elapsed = (time.perf_counter() - start) / (ROUNDS * len(QUERIES))
+    print(f"   {label:<28} {elapsed * 1000:8.3f} ms/query   ({hits // ROUNDS} hits/round)")
+
+
+async def benchmark(count: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[f"{settings.DATABASE_NAME}_bench"]
+    collection = database["products_search_bench"]
+
+    try:
+        print(f"🚀 Seeding {count} products...")
+        await collection.drop()
+        await collection.insert_many([make_product(i) for i in range(count)])
+        await collection.create_index(
+            [("name", "text"), ("description", "text")],
+            weights={"name": 10, "description": 1},
+            default_language="none"
+        )
+
+        async def regex_search(query: str) -> int:
+            docs = await collection.find({"inStock": True, "$or": [
+                {"name": {"$regex": query, "$options": "i"}},
+                {"description": {"$regex": query, "$options": "i"}},
+            ]}).to_list(length=None)
+            return len(docs)
+
+        async def text_search(query: str) -> int:
+            docs = await collection.find(
+                {"$text": {"$search": query}, "inStock": True},
+                {"score": {"$meta": "textScore"}, "name": 1}
+            ).sort([("score", {"$meta": "textScore"})]).to_list(length=None)
+            return len(docs)
+
+        index = ProductSearchIndex()
+        build_start = time.perf_counter()
+        async for product in collection.find({"inStock": True}, SEARCH_PROJECTION):
+            index.upsert(product)
+        print(f"   In-process index build: {(time.perf_counter() - build_start) * 1000:.1f} ms")
+
+        async def inverted_search(query: str) -> int:
+            return len(index.search(query))
+
+        print(f"📊 {len(QUERIES)} queries x {ROUNDS} rounds:")
+        await timed("$regex (current)", regex_search)
+        await timed("$text index", text_search)
+        await timed("in-process inverted index", inverted_search)
+        print("   Lưu ý: $regex không bỏ dấu ('ao thun' không khớp 'Áo Thun'),")
+        print("   $text bỏ dấu nhưng không đổi 'đ' → 'd' và không khớp prefix ('ao kho')")
+
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    asyncio.run(benchmark(product_count))
@@ -0,0 +1,123 @@
+"""
+Benchmark ký / verify chữ ký VNPay (app/utils/vnpay_helper.py)
+
+So sánh:
+    legacy   : nối chuỗi từng param + hmac.new(secret) mỗi lần + print hash data / secret / kết quả
+    current  : giá trị chữ/số ASCII không qua quote_plus + copy() HMAC đã nạp sẵn key,
+               so sánh constant-time, không I/O
+
+Chạy script (không cần MongoDB, không gọi mạng):
+    python scripts/benchmark_vnpay_hash.py [số lần lặp]
+
+Output của print ở bản legacy được ghi vào buffer trong bộ nhớ (chi phí format chuỗi vẫn tính,
+chi phí ghi ra terminal / log thật còn lớn hơn).
+"""
+
+import contextlib
+import hashlib
+import hmac
+import io
+import sys
+import time
+import urllib.parse
+from datetime import datetime
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config.settings import settings
+from app.utils.vnpay_helper import create_secure_hash, verify_payment_signature
+
+DEFAULT_ITERATIONS = 50000
+
+
+def legacy_create_secure_hash(params: dict, secret_key: str) -> str:
+    """Bản cũ của create_secure_hash (giữ lại để so sánh)"""
+    sorted_params = dict(sorted(params.items()))
+    hash_data = '&'.join([f"{key}={urllib.parse.quote_plus(str(value))}" for key, value in sorted_params.items()])
+    print(f"🔐 Hash data: {hash_data}")
+    print(f"🔑 Secret key: {secret_key}")
+    secure_hash = hmac.new(
+        secret_key.encode('utf-8'),
+        hash_data.encode('utf-8'),
+        hashlib.sha512
+    ).hexdigest()
+    print(f"✅ Secure hash: {secure_hash}")
+    return secure_hash
+
+
+def legacy_verify_payment_signature(params: dict) -> bool:
+    """Bản cũ của verify_payment_signature (so sánh == thường)"""
+    vnp_secure_hash = params.get('vnp_SecureHash')
+    if not vnp_secure_hash:
+        return False
+    verify_params = {k: v for k, v in params.items() if k not in ['vnp_SecureHash', 'vnp_SecureHashType']}
+    calculated_hash = legacy_create_secure_hash(verify_params, settings.VNPAY_HASH_SECRET)
+    print(f"Received hash: {vnp_secure_hash}")
+    print(f"Calculated hash: {calculated_hash}")
+    return calculated_hash == vnp_secure_hash
+
+
+def sample_params() -> dict:
+    """Params giống callback VNPay thật (13 field)"""
+    return {
+        'vnp_Amount': '45000000',
+        'vnp_BankCode': 'NCB',
+        'vnp_BankTranNo': 'VNP14512345',
+        'vnp_CardType': 'ATM',
+        'vnp_OrderInfo': 'Thanh toan don hang #6650f1c2a4b8e3d2c1f0a9b8',
+        'vnp_PayDate': datetime(2024, 5, 24, 10, 30).strftime('%Y%m%d%H%M%S'),
+        'vnp_ResponseCode': '00',
+        'vnp_TmnCode': settings.VNPAY_TMN_CODE,
+        'vnp_TransactionNo': '14512345',
+        'vnp_TransactionStatus': '00',
+        'vnp_TxnRef': '6650f1c2a4b8e3d2c1f0a9b8',
+        'vnp_IpAddr': '113.161.1.1',
+        'vnp_CreateDate': '20240524102500',
+    }
+
+
+def measure(func, iterations: int) -> float:
+    """Số lần gọi / giây"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - start)
+
+
+def report(label: str, rate: float) -> None:
+    print(f"   {label:<8} {rate:>12,.0f} ops/s   {1e6 / rate:>8.2f} µs/op")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS
+    params = sample_params()
+    signed = {**params, 'vnp_SecureHash': create_secure_hash(params)}
+    sink = io.StringIO()
+
+    # Cả 2 bản phải cho cùng chữ ký trước khi so tốc độ
+    with contextlib.redirect_stdout(sink):
+        assert legacy_create_secure_hash(params, settings.VNPAY_HASH_SECRET) == create_secure_hash(params)
+        assert legacy_verify_payment_signature(signed) and verify_payment_signature(signed)
+
+    print(f"🔬 VNPay HMAC-SHA512, {len(params)} params, {iterations:,} lần lặp")
+    for name, legacy, current in (
+        ("Sign", lambda: legacy_create_secure_hash(params, settings.VNPAY_HASH_SECRET), lambda: create_secure_hash(params)),
+        ("Verify", lambda: legacy_verify_payment_signature(signed), lambda: verify_payment_signature(signed)),
+    ):
+        # print của bản legacy ghi vào buffer, xóa sau mỗi lượt đo
+        with contextlib.redirect_stdout(sink):
+            legacy_rate = measure(legacy, iterations)
+        sink.seek(0)
+        sink.truncate()
+        current_rate = measure(current, iterations)
+
+        print(f"{name}:")
+        report("legacy", legacy_rate)
+        report("current", current_rate)
+        print(f"   → x{current_rate / legacy_rate:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Kiểm tra Stripe gateway (app/utils/stripe_gateway.py) với Stripe stub server chạy local
+
+Chạy script (không cần tài khoản Stripe, không gọi mạng ra ngoài):
+    python scripts/check_stripe_gateway.py
+
+Kịch bản:
+    1. Tạo + lấy session, cùng idempotency_key → cùng session
+    2. Stripe chậm hơn timeout → TimeoutError, event loop vẫn chạy bình thường trong lúc chờ
+    3. Stripe lỗi 50% → retry có jitter, request vẫn thành công
+    4. Stripe lỗi liên tục → circuit breaker mở, request bị từ chối ngay
+    5. Stripe hồi phục → sau STRIPE_BREAKER_RESET_SECONDS breaker cho 1 request thử rồi đóng lại
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+import uvicorn
+
+from app.config.settings import settings
+
+PORT = 12112
+STUB_URL = f"http://127.0.0.1:{PORT}"
+
+# Cấu hình gateway cho test (phải set trước khi import stripe_gateway)
+settings.STRIPE_API_BASE = STUB_URL
+settings.STRIPE_TIMEOUT_SECONDS = 0.5
+settings.STRIPE_MAX_RETRIES = 2
+settings.STRIPE_RETRY_BASE_SECONDS = 0.05
+settings.STRIPE_BREAKER_FAILURES = 3
+settings.STRIPE_BREAKER_RESET_SECONDS = 1.0
+
+from app.utils import stripe_gateway
+from app.utils.stripe_gateway import PaymentGatewayUnavailable
+from stripe_stub_server import create_stub_app  # cùng thư mục scripts/
+
+
+def start_stub() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(create_stub_app(), host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def stub_request(path: str, payload: dict = None) -> dict:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(f"{STUB_URL}{path}", data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def configure(**config):
+    stub_request("/_stub/config", config)
+
+
+def check(label: str, ok: bool, detail: str = "") -> bool:
+    print(f"   {'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+    return ok
+
+
+async def create(order_id: str):
+    return await stripe_gateway.create_checkout_session(
+        idempotency_key=f"checkout-session-{order_id}",
+        mode="payment",
+        success_url="http://localhost/success",
+        metadata={"orderId": order_id},
+    )
+
+
+async def run_checks() -> bool:
+    results = []
+
+    print("1. Tạo / lấy session, idempotency")
+    first = await create("order-1")
+    again = await create("order-1")
+    fetched = await stripe_gateway.retrieve_checkout_session(first.id)
+    results.append(check("cùng idempotency_key → cùng session", first.id == again.id))
+    results.append(check("retrieve trả về đúng session", fetched.id == first.id and fetched.metadata["orderId"] == "order-1"))
+
+    print("2. Stripe chậm hơn timeout")
+    configure(latency=1.0, failRate=0.0)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    try:
+        await create("order-slow")
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    elapsed = time.perf_counter() - start
+    tick_task.cancel()
+    results.append(check("hết retry → TimeoutError", timed_out, f"{elapsed:.2f}s"))
+    results.append(check("event loop không bị chặn", ticks > elapsed / 0.01 * 0.5, f"{ticks} ticks"))
+    stripe_gateway.breaker.record_success()
+
+    print("3. Stripe lỗi 50%")
+    configure(latency=0.0, failRate=0.5, failStatus=500)
+    succeeded = 0
+    for i in range(20):
+        try:
+            await create(f"order-flaky-{i}")
+            succeeded += 1
+        except Exception:
+            pass
+        stripe_gateway.breaker.record_success()
+    results.append(check("retry giúp phần lớn request thành công", succeeded >= 15, f"{succeeded}/20"))
+
+    print("4. Stripe lỗi liên tục")
+    configure(failRate=1.0, failStatus=500)
+    try:
+        await create("order-down")
+    except Exception:
+        pass
+    start = time.perf_counter()
+    try:
+        await create("order-down-2")
+        rejected = False
+    except PaymentGatewayUnavailable:
+        rejected = True
+    results.append(check("breaker mở → từ chối ngay", rejected and time.perf_counter() - start < 0.05,
+                         stripe_gateway.breaker.state))
+
+    print("5. Stripe hồi phục")
+    configure(failRate=0.0)
+    await asyncio.sleep(settings.STRIPE_BREAKER_RESET_SECONDS)
+    recovered = await create("order-recovered")
+    results.append(check("half-open → request thử thành công, breaker đóng",
+                         recovered.id.startswith("cs_test_") and stripe_gateway.breaker.state == "closed"))
+
+    stats = stub_request("/_stub/stats")
+    print(f"📊 Stub: {stats['requests']} requests, {stats['created']} sessions")
+    return all(results)
+
+
+if __name__ == "__main__":
+    server = start_stub()
+    try:
+        ok = asyncio.run(run_checks())
+    finally:
+        server.should_exit = True
+    sys.exit(0 if ok else 1)
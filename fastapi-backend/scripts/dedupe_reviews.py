@@ -0,0 +1,71 @@
+"""
+Migration Script: Xóa review trùng (cùng userId + productId) trước khi build unique index
+
+Chạy script:
+    python scripts/dedupe_reviews.py [--dry-run]
+
+Mục đích:
+    - Index reviews_userId_productId_unique (app/config/indexes.py) build lỗi nếu còn review trùng
+    - Mỗi cặp (userId, productId) giữ lại review sửa gần nhất (updatedAt, rồi createdAt), xóa các review còn lại
+    - --dry-run: chỉ in số review sẽ bị xóa
+    - Chạy xong, lần khởi động kế tiếp sẽ build được unique index
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config.database import close_mongo_connection, connect_to_mongo, get_collection
+
+
+async def dedupe_reviews(dry_run: bool = False):
+    """Giữ 1 review cho mỗi (userId, productId)"""
+
+    print("🚀 Bắt đầu tìm review trùng...")
+
+    try:
+        # Kết nối database (index unique có thể báo lỗi build ở bước này nếu còn dữ liệu trùng)
+        await connect_to_mongo()
+
+        reviews_collection = await get_collection("reviews")
+
+        # Gom review theo cặp (userId, productId), mới nhất đứng đầu
+        duplicates = reviews_collection.aggregate([
+            {"$sort": {"updatedAt": -1, "createdAt": -1, "_id": -1}},
+            {"$group": {
+                "_id": {"userId": "$userId", "productId": "$productId"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ], allowDiskUse=True)
+
+        pairs = 0
+        to_delete = []
+        async for group in duplicates:
+            pairs += 1
+            to_delete.extend(group["ids"][1:])
+
+        print(f"📊 {pairs} cặp user/sản phẩm có review trùng, {len(to_delete)} review sẽ bị xóa")
+
+        if dry_run:
+            print("ℹ️  --dry-run: không xóa gì")
+        elif to_delete:
+            result = await reviews_collection.delete_many({"_id": {"$in": to_delete}})
+            print(f"🧹 Đã xóa {result.deleted_count} review trùng")
+
+        print("🎉 Hoàn tất!")
+
+    except Exception as e:
+        print(f"❌ Lỗi: {str(e)}")
+        raise
+    finally:
+        # Ngắt kết nối
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(dedupe_reviews(dry_run="--dry-run" in sys.argv))
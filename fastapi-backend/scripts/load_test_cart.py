@@ -0,0 +1,114 @@
+"""
+Load test: Nhiều tab cùng thêm sản phẩm vào giỏ của 1 user - kiểm tra không mất lượt thêm
+
+Chạy script:
+    python scripts/load_test_cart.py [số_lượt_thêm] [số_sản_phẩm]
+
+Kịch bản:
+    1. Cách cũ: đọc cả cartData → cộng trong Python → $set ghi đè cả dict
+    2. cart_store.increment_line() (app/utils/cart_store.py): $inc đúng field items.<itemId>.<size>
+       trong collection carts
+    3. Vừa thêm vừa xóa: cart_store.set_line(..., 0) xóa size S trong lúc các tab khác thêm size M
+       → các lượt thêm size M không được mất
+
+Mỗi kịch bản bắn tất cả lượt thêm cùng lúc bằng asyncio.gather và kiểm tra:
+    - tổng số lượng trong giỏ = số lượt thêm
+
+Script dùng database riêng "<DATABASE_NAME>_bench" và xóa sau khi chạy.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import database
+from app.config.settings import settings
+from app.utils import cart_store
+
+SIZES = ["S", "M", "L"]
+
+
+async def naive_add(users, user_id: ObjectId, item_id: str, size: str) -> None:
+    """Cách cũ: đọc cả giỏ, sửa trong Python rồi ghi đè (có race condition)"""
+    user = await users.find_one({"_id": user_id})
+    cart_data = user.get("cartData", {})
+    cart_data.setdefault(item_id, {})
+    cart_data[item_id][size] = cart_data[item_id].get(size, 0) + 1
+    await asyncio.sleep(0)  # Giả lập thời gian xử lý giữa lúc đọc và lúc ghi
+    await users.update_one({"_id": user_id}, {"$set": {"cartData": cart_data}})
+
+
+def cart_total(cart_data: dict) -> int:
+    return sum(quantity for sizes in cart_data.values() for quantity in sizes.values())
+
+
+async def run_scenario(label: str, read_cart, expected: int, calls) -> None:
+    start = time.perf_counter()
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+
+    total = cart_total(await read_cart())
+    status_icon = "✅" if total == expected else f"❌ MẤT {expected - total} LƯỢT"
+    print(f"   {label:<28} giỏ có {total:5d}/{expected} sản phẩm  {elapsed * 1000:8.1f} ms  {status_icon}")
+
+
+async def load_test(add_count: int, product_count: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    bench_name = f"{settings.DATABASE_NAME}_bench"
+
+    # cart_store dùng get_collection() → trỏ sang database bench
+    database.db.client = client
+    settings.DATABASE_NAME = bench_name
+    users = client[bench_name]["users"]
+
+    try:
+        await users.drop()
+        await client[bench_name][cart_store.CARTS_COLLECTION].create_index("userId", unique=True)
+        item_ids = [str(ObjectId()) for _ in range(product_count)]
+        picks = [(random.choice(item_ids), random.choice(SIZES)) for _ in range(add_count)]
+        print(f"🚀 {add_count} lượt thêm đồng thời vào 1 giỏ ({product_count} sản phẩm x {len(SIZES)} size):")
+
+        # 1. Cách cũ
+        naive_user = (await users.insert_one({"cartData": {}})).inserted_id
+
+        async def read_naive_cart():
+            return (await users.find_one({"_id": naive_user}))["cartData"]
+
+        await run_scenario(
+            "read-modify-$set (cũ)", read_naive_cart, add_count,
+            [naive_add(users, naive_user, item_id, size) for item_id, size in picks]
+        )
+
+        # 2. $inc từng dòng
+        user_id = str(ObjectId())
+        await run_scenario(
+            "cart_store.increment_line", lambda: cart_store.get_cart(user_id), add_count,
+            [cart_store.increment_line(user_id, item_id, size) for item_id, size in picks]
+        )
+
+        # 3. Xóa size S của 1 sản phẩm trong lúc các tab khác thêm size M cùng sản phẩm
+        item_id = item_ids[0]
+        mixed_user = str(ObjectId())
+        await cart_store.set_line(mixed_user, item_id, "S", 5)
+        await run_scenario(
+            "increment_line + set_line(0)", lambda: cart_store.get_cart(mixed_user), add_count,
+            [cart_store.set_line(mixed_user, item_id, "S", 0)]
+            + [cart_store.increment_line(mixed_user, item_id, "M") for _ in range(add_count)]
+        )
+
+    finally:
+        await client.drop_database(bench_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    adds = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(load_test(adds, products))
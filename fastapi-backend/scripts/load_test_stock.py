@@ -0,0 +1,128 @@
+"""
+Load test: Đặt hàng đồng thời cho 1 sản phẩm "hot" - kiểm tra không bán vượt tồn kho
+
+Chạy script:
+    python scripts/load_test_stock.py [số_đơn] [tồn_kho]
+
+Kịch bản:
+    1. Cách cũ: đọc quantity → kiểm tra trong Python → $inc không điều kiện
+    2. reserve_stock() (app/utils/inventory.py): $inc có điều kiện quantity >= n
+    3. reserve_stock() với đơn 2 sản phẩm, sản phẩm thứ 2 hết hàng trước
+       → sản phẩm hot phải được hoàn kho (compensation)
+
+Mỗi kịch bản bắn tất cả đơn cùng lúc bằng asyncio.gather và kiểm tra:
+    - quantity cuối cùng không âm
+    - tồn kho ban đầu - tồn kho cuối = tổng số lượng của các đơn thành công
+
+Script dùng database riêng "<DATABASE_NAME>_bench" và xóa sau khi chạy.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import HTTPException
+from app.config import database
+from app.config.settings import settings
+from app.models.order import OrderItem
+from app.utils.inventory import reserve_stock
+
+
+async def create_product(products, name: str, quantity: int) -> str:
+    result = await products.insert_one({"name": name, "quantity": quantity, "soldCount": 0, "isActive": True})
+    return str(result.inserted_id)
+
+
+async def naive_order(products, product_id: str, quantity: int) -> bool:
+    """Cách cũ: kiểm tra tồn kho trong Python rồi mới trừ (có race condition)"""
+    product = await products.find_one({"_id": ObjectId(product_id)})
+    if product.get("quantity", 0) < quantity:
+        return False
+    await asyncio.sleep(0)  # Giả lập thời gian insert order giữa lúc đọc và lúc trừ kho
+    await products.update_one({"_id": product["_id"]}, {"$inc": {"quantity": -quantity}})
+    return True
+
+
+async def reserved_order(items) -> bool:
+    try:
+        await reserve_stock(items)
+        return True
+    except HTTPException:
+        return False
+
+
+async def run_scenario(label: str, products, product_id: str, stock: int, calls, quantities) -> None:
+    start = time.perf_counter()
+    results = await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+
+    sold = sum(quantity for ok, quantity in zip(results, quantities) if ok)
+    final = (await products.find_one({"_id": ObjectId(product_id)}))["quantity"]
+    consistent = final >= 0 and stock - final == sold
+    status_icon = "✅" if consistent else "❌ OVERSELL"
+    print(f"   {label:<34} {sum(results):4d} đơn OK, đã bán {sold:4d}/{stock}, "
+          f"tồn kho cuối {final:5d}  {elapsed * 1000:8.1f} ms  {status_icon}")
+
+
+async def load_test(order_count: int, stock: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    bench_name = f"{settings.DATABASE_NAME}_bench"
+
+    # reserve_stock() dùng get_collection() → trỏ sang database bench
+    database.db.client = client
+    settings.DATABASE_NAME = bench_name
+    products = client[bench_name]["products"]
+
+    try:
+        await products.drop()
+        quantities = [random.randint(1, 3) for _ in range(order_count)]
+        print(f"🚀 {order_count} đơn đồng thời (1-3 sản phẩm/đơn), tồn kho {stock}:")
+
+        # 1. Cách cũ
+        naive_id = await create_product(products, "hot-naive", stock)
+        await run_scenario(
+            "read-check-$inc (cũ)", products, naive_id, stock,
+            [naive_order(products, naive_id, q) for q in quantities], quantities
+        )
+
+        # 2. Trừ kho có điều kiện
+        hot_id = await create_product(products, "hot", stock)
+        await run_scenario(
+            "reserve_stock", products, hot_id, stock,
+            [reserved_order([OrderItem(product=hot_id, quantity=q, size="M")]) for q in quantities],
+            quantities
+        )
+
+        # 3. Đơn 2 sản phẩm, sản phẩm phụ chỉ còn ít hàng → phần lớn đơn phải được hoàn kho
+        hot2_id = await create_product(products, "hot-2", stock)
+        side_id = await create_product(products, "side", max(order_count // 10, 1))
+        await run_scenario(
+            "reserve_stock + compensation", products, hot2_id, stock,
+            [
+                reserved_order([
+                    OrderItem(product=hot2_id, quantity=q, size="M"),
+                    OrderItem(product=side_id, quantity=1, size="M"),
+                ])
+                for q in quantities
+            ],
+            quantities
+        )
+        side = await products.find_one({"_id": ObjectId(side_id)})
+        print(f"   Sản phẩm phụ còn {side['quantity']} (phải >= 0)")
+
+    finally:
+        await client.drop_database(bench_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    initial_stock = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(load_test(orders, initial_stock))
@@ -0,0 +1,113 @@
+"""
+Migration Script: Chuyển giỏ hàng từ users.cartData sang collection carts
+
+Chạy script:
+    python scripts/migrate_cart_data.py [--drop-legacy]
+
+Mục đích:
+    - Mỗi user có cartData khác rỗng → 1 document trong carts ({userId, items})
+    - Gộp theo từng dòng bằng $max: chạy lại nhiều lần không bị cộng dồn, giỏ user vừa tạo
+      sau khi deploy (trước khi chạy migration) vẫn được giữ
+    - Bỏ các dòng không hợp lệ (số lượng <= 0, itemId / size không dùng làm tên field được)
+    - --drop-legacy: xóa field cartData khỏi users sau khi đã copy
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc vào sys.path để import được config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from app.config.database import close_mongo_connection, connect_to_mongo, get_collection
+from app.utils.cart_store import CARTS_COLLECTION, line_path
+from datetime import datetime
+
+BATCH_SIZE = 500
+
+
+def cart_lines(cart_data: dict) -> dict:
+    """{items.<itemId>.<size>: quantity} của các dòng hợp lệ"""
+    lines = {}
+    for item_id, sizes in (cart_data or {}).items():
+        if not isinstance(sizes, dict):
+            continue
+        for size, quantity in sizes.items():
+            if not isinstance(quantity, int) or quantity <= 0:
+                continue
+            try:
+                lines[line_path(item_id, size)] = quantity
+            except HTTPException:
+                continue
+    return lines
+
+
+async def migrate_cart_data(drop_legacy: bool = False):
+    """Migration: users.cartData → carts"""
+
+    print("🚀 Bắt đầu migration giỏ hàng sang collection carts...")
+
+    try:
+        # Kết nối database (build luôn index, gồm unique index carts.userId)
+        await connect_to_mongo()
+
+        users_collection = await get_collection("users")
+        carts_collection = await get_collection(CARTS_COLLECTION)
+
+        legacy_filter = {"cartData": {"$exists": True}}
+        total = await users_collection.count_documents(legacy_filter)
+        print(f"📊 Tìm thấy {total} user còn field cartData")
+
+        migrated = 0
+        skipped = 0
+        operations = []
+        now = datetime.utcnow()
+
+        async for user in users_collection.find(legacy_filter, {"cartData": 1}).batch_size(BATCH_SIZE):
+            lines = cart_lines(user.get("cartData"))
+            if not lines:
+                skipped += 1
+                continue
+
+            operations.append(UpdateOne(
+                {"userId": str(user["_id"])},
+                {
+                    "$max": lines,
+                    "$set": {"updatedAt": now},
+                    "$setOnInsert": {"createdAt": now}
+                },
+                upsert=True
+            ))
+            if len(operations) >= BATCH_SIZE:
+                await carts_collection.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+                operations = []
+
+        if operations:
+            await carts_collection.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+
+        print(f"✅ Đã chuyển {migrated} giỏ hàng ({skipped} user giỏ trống / không hợp lệ)")
+
+        if drop_legacy:
+            result = await users_collection.update_many(legacy_filter, {"$unset": {"cartData": ""}})
+            print(f"🧹 Đã xóa cartData khỏi {result.modified_count} user")
+        else:
+            print("ℹ️  Giữ nguyên users.cartData (chạy lại với --drop-legacy để xóa)")
+
+        print("🎉 Migration hoàn tất!")
+
+    except Exception as e:
+        print(f"❌ Lỗi migration: {str(e)}")
+        raise
+    finally:
+        # Ngắt kết nối
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    # Chạy migration
+    asyncio.run(migrate_cart_data(drop_legacy="--drop-legacy" in sys.argv))
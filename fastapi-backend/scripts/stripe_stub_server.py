@@ -0,0 +1,120 @@
+"""
+Stripe stub server - giả lập Stripe Checkout API để test gateway (app/utils/stripe_gateway.py)
+
+Chạy script:
+    python scripts/stripe_stub_server.py [port]
+
+Rồi chạy backend với:
+    STRIPE_API_BASE=http://localhost:12111
+
+Endpoint giả lập:
+    POST /v1/checkout/sessions          Tạo session (cùng Idempotency-Key → trả lại session cũ)
+    GET  /v1/checkout/sessions/{id}     Lấy session
+
+Endpoint điều khiển (dùng trong scripts/check_stripe_gateway.py):
+    POST /_stub/config                  {"latency": giây, "failRate": 0..1, "failStatus": 500|429}
+    POST /_stub/pay/{id}                Đánh dấu session đã thanh toán
+    GET  /_stub/stats                   Số request / số session đã tạo
+"""
+
+import asyncio
+import random
+import sys
+import uuid
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+# Thêm thư mục gốc vào sys.path (giống các script khác)
+sys.path.append(str(Path(__file__).parent.parent))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DEFAULT_PORT = 12111
+
+
+def create_stub_app() -> FastAPI:
+    app = FastAPI(title="Stripe stub")
+    config = {"latency": 0.0, "failRate": 0.0, "failStatus": 500}
+    sessions = {}
+    idempotency = {}
+    stats = {"requests": 0, "created": 0}
+
+    async def simulate():
+        """Độ trễ + lỗi ngẫu nhiên theo config; trả về response lỗi hoặc None"""
+        stats["requests"] += 1
+        if config["latency"]:
+            await asyncio.sleep(config["latency"])
+        if random.random() < config["failRate"]:
+            status_code = config["failStatus"]
+            error_type = "rate_limit_error" if status_code == 429 else "api_error"
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": {"type": error_type, "message": "Stub failure"}}
+            )
+        return None
+
+    @app.post("/v1/checkout/sessions")
+    async def create_session(request: Request):
+        # Đọc body trước khi giả lập độ trễ (client timeout sẽ ngắt kết nối giữa chừng)
+        form = dict(parse_qsl((await request.body()).decode("utf-8")))
+        failure = await simulate()
+        if failure:
+            return failure
+
+        key = request.headers.get("Idempotency-Key")
+        if key and key in idempotency:
+            return sessions[idempotency[key]]
+
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        sessions[session_id] = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/pay/{session_id}",
+            "payment_status": "unpaid",
+            "status": "open",
+            "mode": form.get("mode"),
+            "success_url": form.get("success_url"),
+            "metadata": {
+                k[len("metadata["):-1]: v for k, v in form.items() if k.startswith("metadata[")
+            },
+        }
+        if key:
+            idempotency[key] = session_id
+        stats["created"] += 1
+        return sessions[session_id]
+
+    @app.get("/v1/checkout/sessions/{session_id}")
+    async def retrieve_session(session_id: str):
+        failure = await simulate()
+        if failure:
+            return failure
+        if session_id not in sessions:
+            return JSONResponse(
+                status_code=404,
+                content={"error": {"type": "invalid_request_error", "message": f"No such checkout.session: '{session_id}'"}}
+            )
+        return sessions[session_id]
+
+    @app.post("/_stub/config")
+    async def set_config(request: Request):
+        config.update(await request.json())
+        return config
+
+    @app.post("/_stub/pay/{session_id}")
+    async def pay_session(session_id: str):
+        sessions[session_id].update({"payment_status": "paid", "status": "complete"})
+        return sessions[session_id]
+
+    @app.get("/_stub/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    print(f"🧪 Stripe stub listening on http://localhost:{port}")
+    uvicorn.run(create_stub_app(), host="127.0.0.1", port=port, log_level="warning")